@@ -0,0 +1,195 @@
+from datetime import date, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, delete, event, func, insert, inspect, select, union_all
+from sqlalchemy.orm import Session, aliased
+
+from extensions import db
+from models import Site, IspLink, ProblemReport, ArchivedReport, SiteStatus, DailyOutage
+
+# site_status and daily_outage are derived from problem_report. Every flush
+# that writes reports recomputes just the sites and issue dates it touched,
+# each through an index (ix_problem_report_site_id_issue_date,
+# ix_problem_report_issue_date_id), so the dashboard reads a few small tables
+# instead of scanning the report history. daily_outage also counts archived
+# reports (see archive.py); site_status never points at one.
+
+dashboard_cli = AppGroup('dashboard', help='Maintain the dashboard aggregate tables.')
+
+_status_table = SiteStatus.__table__
+_outage_table = DailyOutage.__table__
+_STATUS_COLUMNS = ['site_id', 'report_id', 'ticket_id', 'status', 'issue_date']
+
+
+def latest_report_per_site():
+    """One row per site with its most recent report: (site_id, report_id,
+    ticket_id, status, issue_date).
+
+    Uses ROW_NUMBER() over each site's reports, newest issue date first.
+    """
+    ranked = select(
+        ProblemReport.site_id, ProblemReport.id.label('report_id'), ProblemReport.ticket_id,
+        ProblemReport.status, ProblemReport.issue_date,
+        func.row_number().over(
+            partition_by=ProblemReport.site_id,
+            order_by=(ProblemReport.issue_date.desc(), ProblemReport.id.desc()),
+        ).label('rn'),
+    ).subquery('ranked')
+    return select(*(ranked.c[name] for name in _STATUS_COLUMNS)).where(ranked.c.rn == 1)
+
+
+def _latest_for_sites(site_ids):
+    # For a handful of sites: one index probe each rather than a window over their history
+    newest = aliased(ProblemReport)
+    latest_id = select(newest.id).where(newest.site_id == Site.id) \
+        .order_by(newest.issue_date.desc(), newest.id.desc()).limit(1).correlate(Site).scalar_subquery()
+    return select(ProblemReport.site_id, ProblemReport.id, ProblemReport.ticket_id,
+                  ProblemReport.status, ProblemReport.issue_date) \
+        .select_from(Site).join(ProblemReport, ProblemReport.id == latest_id).where(Site.id.in_(site_ids))
+
+
+def _daily_counts(days=None):
+    # Live and archived reports alike; archiving a report leaves its day's counts unchanged
+    parts = []
+    for model in (ProblemReport, ArchivedReport):
+        part = select(model.issue_date.label('day'), model.status)
+        if days is not None:
+            part = part.where(model.issue_date.in_(days))
+        parts.append(part)
+    reports = union_all(*parts).subquery('reports')
+    return select(reports.c.day, func.count(), func.sum(case((reports.c.status == 'DOWN', 1), else_=0))) \
+        .group_by(reports.c.day)
+
+
+def refresh(conn, site_ids=(), days=()):
+    """Recompute the aggregate rows for these sites and issue dates."""
+    site_ids, days = sorted(set(site_ids) - {None}), sorted(set(days) - {None})
+    if site_ids:
+        conn.execute(delete(_status_table).where(_status_table.c.site_id.in_(site_ids)))
+        conn.execute(insert(_status_table).from_select(_STATUS_COLUMNS, _latest_for_sites(site_ids)))
+    if days:
+        conn.execute(delete(_outage_table).where(_outage_table.c.day.in_(days)))
+        conn.execute(insert(_outage_table).from_select(
+            ['day', 'reports', 'down'], _daily_counts(days)
+        ))
+
+
+def rebuild(conn):
+    conn.execute(delete(_status_table))
+    conn.execute(insert(_status_table).from_select(_STATUS_COLUMNS, latest_report_per_site()))
+    conn.execute(delete(_outage_table))
+    conn.execute(insert(_outage_table).from_select(['day', 'reports', 'down'], _daily_counts()))
+
+
+def reports_footprint(report_ids):
+    # (site ids, issue dates) of these reports; bulk statements call this
+    # before they change or delete the rows
+    rows = db.session.execute(
+        select(ProblemReport.site_id, ProblemReport.issue_date).where(ProblemReport.id.in_(report_ids))
+    ).all()
+    return {site_id for site_id, _ in rows}, {day for _, day in rows}
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_flushed(session, flush_context):
+    site_ids, days = set(), set()
+    for obj in session.new | session.dirty | session.deleted:
+        if not isinstance(obj, ProblemReport):
+            continue
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        # Old and new values, so a report moved to another site or date
+        # refreshes both
+        state = inspect(obj)
+        for attr, found in (('site_id', site_ids), ('issue_date', days)):
+            found.update(state.attrs[attr].history.sum())
+            found.add(state.dict.get(attr))
+    if site_ids or days:
+        refresh(session.connection(), site_ids, days)
+
+
+# ===== CURRENT STATUS =====
+# site_status is the denormalized answer to "what is each site's status now";
+# latest_report_per_site() computes the same thing from problem_report.
+
+# Values accepted by the status filters; NONE means no report yet
+STATUS_FILTERS = ('UP', 'DOWN', 'NONE')
+
+
+def current_status(site_id):
+    # Primary-key lookup on site_status
+    return db.session.get(SiteStatus, site_id)
+
+
+def filter_sites_by_status(query, status):
+    if status == 'NONE':
+        return query.filter(~select(SiteStatus.site_id).where(SiteStatus.site_id == Site.id).exists())
+    return query.join(SiteStatus, SiteStatus.site_id == Site.id).filter(SiteStatus.status == status)
+
+
+def latest_reports_only(query):
+    # Narrow a ProblemReport query to each site's latest report
+    return query.join(SiteStatus, SiteStatus.report_id == ProblemReport.id)
+
+
+# ===== DASHBOARD QUERIES =====
+
+def status_counts():
+    rows = db.session.execute(select(SiteStatus.status, func.count()).group_by(SiteStatus.status)).all()
+    counts = dict(rows)
+    total_sites = db.session.query(func.count(Site.id)).scalar()
+    counts['NONE'] = total_sites - sum(counts.values())
+    return counts
+
+
+def average_down_age(today=None):
+    # Mean age in days of the open DOWN tickets, from one row per issue date
+    today = today or date.today()
+    rows = db.session.execute(
+        select(SiteStatus.issue_date, func.count()).where(SiteStatus.status == 'DOWN')
+        .group_by(SiteStatus.issue_date)
+    ).all()
+    total = sum(n for _, n in rows)
+    if not total:
+        return None
+    return sum((today - day).days * n for day, n in rows) / total
+
+
+def down_by_provider():
+    rows = db.session.execute(
+        select(IspLink.provider, func.count(IspLink.site_id.distinct()))
+        .join(SiteStatus, SiteStatus.site_id == IspLink.site_id)
+        .where(SiteStatus.status == 'DOWN').group_by(IspLink.provider)
+    ).all()
+    return dict(rows)
+
+
+def down_sites(limit=50):
+    # Longest-running open DOWN tickets first
+    return db.session.execute(
+        select(Site.id, Site.site_location, SiteStatus.ticket_id, SiteStatus.issue_date)
+        .join(SiteStatus, SiteStatus.site_id == Site.id).where(SiteStatus.status == 'DOWN')
+        .order_by(SiteStatus.issue_date, Site.site_location).limit(limit)
+    ).all()
+
+
+def daily_outages(days=30, today=None):
+    # [(day, reports, down)] for the last `days` days, zero-filled
+    today = today or date.today()
+    start = today - timedelta(days=days - 1)
+    rows = db.session.execute(
+        select(DailyOutage.day, DailyOutage.reports, DailyOutage.down)
+        .where(DailyOutage.day.between(start, today))
+    ).all()
+    found = {day: (reports, down) for day, reports, down in rows}
+    return [(day,) + found.get(day, (0, 0)) for day in (start + timedelta(days=n) for n in range(days))]
+
+
+@dashboard_cli.command('rebuild')
+def rebuild_command():
+    """Recompute site_status and daily_outage from all problem reports."""
+    rebuild(db.session.connection())
+    db.session.commit()
+    click.echo(f'{db.session.query(func.count(SiteStatus.site_id)).scalar()} site statuses, '
+               f'{db.session.query(func.count(DailyOutage.day)).scalar()} days.')
@@ -0,0 +1,255 @@
+import hashlib
+import json
+from datetime import date, datetime
+from functools import wraps
+
+from flask import Blueprint, abort, current_app, request
+from flask_login import current_user
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from werkzeug.exceptions import HTTPException
+
+import aggregates
+import archive
+from filters import ReportFilter
+from models import Site, IspLink, ProblemReport, ArchivedReport, ISP_PROVIDERS
+from pagination import keyset_paginate, per_page_arg
+from search import search_sites
+from versioning import version_stamp
+
+# Versioned JSON API for scripts and wallboards; the HTML pages stay on main_bp
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Public field name -> column; 'status' and 'isp' are built from related rows
+SITE_FIELDS = {
+    'id': Site.id,
+    'site_location': Site.site_location,
+    'device_name': Site.device_name,
+    'sdwan_site_id': Site.sdwan_site_id,
+    'lan_ip': Site.lan_ip,
+    'atm_port': Site.atm_port,
+    'status': None,
+    'isp': None,
+}
+
+REPORT_FIELDS = {
+    'id': ProblemReport.id,
+    'site_id': ProblemReport.site_id,
+    'site_location': None,
+    'ticket_id': ProblemReport.ticket_id,
+    'status': ProblemReport.status,
+    'reason': ProblemReport.reason,
+    'last_update': ProblemReport.last_update,
+    'issue_date': ProblemReport.issue_date,
+    'last_follow_up': ProblemReport.last_follow_up,
+    'archived': None,
+}
+
+# Data versions each collection depends on; a site's status comes from its reports
+SITE_VERSIONS = ('site', 'problem_report')
+REPORT_VERSIONS = ('problem_report', 'problem_report_archive', 'site')
+
+
+def api_login_required(*roles):
+    # Like login_required + roles_required, but answering with JSON errors instead of redirects
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_user.is_authenticated:
+                abort(401)
+            if roles and current_user.group not in roles:
+                abort(403)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+@api_bp.errorhandler(HTTPException)
+def _json_error(e):
+    return _json({'error': {'code': e.code, 'message': e.description}}, e.code)
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _json(payload, status=200):
+    body = json.dumps(payload, separators=(',', ':'), default=_json_default)
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+
+def _fields(available):
+    requested = request.args.get('fields')
+    if not requested:
+        return list(available)
+    fields = [f.strip() for f in requested.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        abort(400, 'Unknown field(s): ' + ', '.join(unknown))
+    return fields
+
+
+def conditional(*names):
+    """Answer If-None-Match from the data version stamp.
+
+    The ETag covers the version counters of the tables the response reads,
+    the full request URL and the caller's group, so a 304 is decided from one
+    data_version lookup, before the view queries or serializes anything.
+    There is no Last-Modified: two writes within the same second would look
+    unchanged to If-Modified-Since, while every write bumps the ETag.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = f'{version_stamp(*names)}|{request.full_path}|{current_user.group}'
+            etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+            not_modified = etag in request.if_none_match
+            response = current_app.response_class(status=304) if not_modified else f(*args, **kwargs)
+            response.set_etag(etag)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
+
+
+# ===== SERIALIZERS =====
+
+def _site_dict(site, fields):
+    item = {}
+    for field in fields:
+        if field == 'status':
+            latest = site.latest
+            item['status'] = None if latest is None else {
+                'status': latest.status, 'since': latest.issue_date, 'ticket_id': latest.ticket_id,
+            }
+        elif field == 'isp':
+            item['isp'] = [
+                {'provider': link.provider, 'details': link.details,
+                 'capacity_mbps': link.capacity_mbps, 'l2_ip': link.l2_ip}
+                for provider, link in sorted(site.isp_links.items())
+            ]
+        else:
+            item[field] = getattr(site, field)
+    return item
+
+
+def _report_dict(report, fields):
+    return {f: (report.site.site_location if f == 'site_location' else getattr(report, f)) for f in fields}
+
+
+def _site_query(fields):
+    columns = [SITE_FIELDS[f] for f in fields if SITE_FIELDS[f] is not None]
+    options = [load_only(*columns)] if columns else [load_only(Site.id)]
+    if 'status' in fields:
+        options.append(selectinload(Site.latest))
+    if 'isp' in fields:
+        options.append(selectinload(Site.isp_links))
+    return Site.query.options(*options)
+
+
+def _report_query(fields, model=ProblemReport):
+    # The same columns of ProblemReport or ArchivedReport
+    columns = [getattr(model, REPORT_FIELDS[f].key) for f in fields if REPORT_FIELDS[f] is not None]
+    options = [load_only(*columns)] if columns else [load_only(model.id)]
+    if 'site_location' in fields:
+        options.append(joinedload(model.site, innerjoin=True).load_only(Site.site_location))
+    return model.query.options(*options)
+
+
+# ===== SITES =====
+
+@api_bp.route('/sites')
+@api_login_required()
+@conditional(*SITE_VERSIONS)
+def sites():
+    """Sites, ordered by location.
+
+    ?fields=a,b  ?search=  ?status=UP|DOWN|NONE  ?provider=el|ilevant|horizon
+    ?per_page=  ?cursor=
+    """
+    fields = _fields(SITE_FIELDS)
+    query = _site_query(fields)
+    keys = [Site.site_location, Site.id]
+
+    status = request.args.get('status', '').upper()
+    if status:
+        if status not in aggregates.STATUS_FILTERS:
+            abort(400, 'status must be one of ' + ', '.join(aggregates.STATUS_FILTERS))
+        query = aggregates.filter_sites_by_status(query, status)
+    provider = request.args.get('provider')
+    if provider:
+        if provider not in ISP_PROVIDERS:
+            abort(400, 'provider must be one of ' + ', '.join(ISP_PROVIDERS))
+        query = query.filter(Site.isp_links.any(IspLink.provider == provider))
+    search = request.args.get('search')
+    if search:
+        query, rank = search_sites(query, search)
+        if rank is not None:
+            keys = [rank, Site.id]
+
+    page = keyset_paginate(query, keys, cursor=request.args.get('cursor'), per_page=per_page_arg('SITES_PER_PAGE'))
+    return _json({'data': [_site_dict(s, fields) for s in page.items], 'next': page.next_url})
+
+
+@api_bp.route('/sites/<int:id>')
+@api_login_required()
+@conditional(*SITE_VERSIONS)
+def site(id):
+    fields = _fields(SITE_FIELDS)
+    item = _site_query(fields).filter(Site.id == id).first()
+    if item is None:
+        abort(404)
+    return _json({'data': _site_dict(item, fields)})
+
+
+# ===== REPORTS =====
+
+@api_bp.route('/reports')
+@api_login_required('Admin', 'Network Team', 'NOC Team')
+@conditional(*REPORT_VERSIONS)
+def reports():
+    """Problem reports, newest issue date first.
+
+    ?fields=a,b  ?site_id=  ?status=UP|DOWN  ?ticket_id=  ?ticket= (prefix)  ?reason=
+    ?since=  ?until=  ?follow_up_since=  ?follow_up_until=
+    ?latest=1 (each site's latest report only)  ?per_page=  ?cursor=
+
+    Archived reports are included once the page reaches their issue dates,
+    except with ?reason=, which only matches live reports; the answer then
+    says so in "archive_skipped" (the newest archived issue date).
+    """
+    fields = _fields(REPORT_FIELDS)
+    filters = ReportFilter.from_args(request.args)
+
+    def build(model):
+        return filters.apply(_report_query(fields, model), model)
+
+    cursor, per_page = request.args.get('cursor'), per_page_arg('REPORTS_PER_PAGE')
+    if request.args.get('latest'):
+        # Latest reports are never archived
+        page = keyset_paginate(aggregates.latest_reports_only(build(ProblemReport)),
+                               [ProblemReport.issue_date, ProblemReport.id],
+                               cursor=cursor, per_page=per_page, descending=True)
+    else:
+        page = archive.paginate_reports(build, cursor=cursor, per_page=per_page, since=filters.since,
+                                        include_archive=filters.covers_archive)
+    answer = {'data': [_report_dict(r, fields) for r in page.items], 'next': page.next_url}
+    skipped = None if request.args.get('latest') else archive.archive_skipped(filters)
+    if skipped is not None:
+        answer['archive_skipped'] = skipped
+    return _json(answer)
+
+
+@api_bp.route('/reports/<int:id>')
+@api_login_required('Admin', 'Network Team', 'NOC Team')
+@conditional(*REPORT_VERSIONS)
+def report(id):
+    fields = _fields(REPORT_FIELDS)
+    item = _report_query(fields).filter(ProblemReport.id == id).first()
+    if item is None:
+        item = _report_query(fields, ArchivedReport).filter(ArchivedReport.id == id).first()
+    if item is None:
+        abort(404)
+    return _json({'data': _report_dict(item, fields)})
@@ -1,34 +1,77 @@
 from flask import Flask
-from config import Config
+from config import config
 from extensions import db
-from flask_migrate import Migrate
 from flask_login import LoginManager
+from sqlalchemy import event
+import click
 import logging
+import os
 
-def create_app():
+
+def _apply_sqlite_pragmas(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def create_app(config_name=None):
     app = Flask(__name__)
-    app.config.from_object(Config)
-    import logging
-    logging.basicConfig (level=logging.DEBUG)
-    app.logger.setLevel (logging.DEBUG)
+    app.config.from_object(config[config_name or os.environ.get('FLASK_ENV') or 'default'])
+
+    # Level-gated: below LOG_LEVEL, logger calls return before formatting
+    level = getattr(logging, str(app.config['LOG_LEVEL']).upper(), logging.INFO)
+    logging.basicConfig (level=level)
+    app.logger.setLevel (level)
 
     db.init_app(app)
-    migrate = Migrate(app, db)
+    if click.get_current_context(silent=True) is not None:
+        # Only the flask CLI needs the migration commands ("flask db ..."); web
+        # workers skip importing alembic, the largest part of their boot time
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite' and app.config['SQLITE_PRAGMAS']:
+            _apply_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+
+    import instrumentation
+    instrumentation.init_app(app)
 
     login_manager = LoginManager()
     login_manager.init_app(app)
     login_manager.login_view = 'main.login'
 
-    from models import User
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
+    import versioning  # registers the data version flush hooks
+    import aggregates  # keeps the dashboard tables in step with problem reports
+    import events  # records change events for the live /events stream
+    from identity import load_identity
+    login_manager.user_loader(load_identity)
+
+    from fragments import render_row
+    app.add_template_global(render_row)
 
     from routes import main_bp
     app.register_blueprint(main_bp)
 
+    from api import api_bp
+    app.register_blueprint(api_bp)
+
+    from search import search_cli
+    from importer import sites_cli
+    from aggregates import dashboard_cli
+    from fragments import fragments_cli
+    from archive import reports_cli
+    app.cli.add_command(search_cli)
+    app.cli.add_command(sites_cli)
+    app.cli.add_command(dashboard_cli)
+    app.cli.add_command(fragments_cli)
+    app.cli.add_command(reports_cli)
+
     return app
 
 if __name__ == '__main__':
-    app = create_app()
+    app = create_app('development')
     app.run(debug=True)
\ No newline at end of file
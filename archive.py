@@ -0,0 +1,210 @@
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, or_, select
+
+import aggregates
+from caching import VersionedCache
+from extensions import db
+from models import ProblemReport, ArchivedReport, SiteStatus
+from pagination import KeysetPage, encode_cursor, keyset_paginate
+from versioning import bump_version, on_change
+
+# Old reports move from problem_report to problem_report_archive, keeping
+# their ids, with reason and last_update stored compressed. problem_report
+# then holds the recent and still-open history every page and export reads;
+# listings read the archive only once they page back to (or are filtered
+# down to) dates it covers, and the "history" export streams both tables.
+#
+# A site's latest report is never archived, since site_status points at it,
+# and neither is the newest report overall: SQLite gives a new row
+# max(id) + 1, so keeping the newest row live keeps new ids above the
+# archived ones. daily_outage counts both tables.
+
+reports_cli = AppGroup('reports', help='Archive and restore problem reports.')
+
+_COLUMNS = ['id', 'site_id', 'ticket_id', 'status', 'reason', 'last_update', 'issue_date', 'last_follow_up',
+            'row_version']
+
+
+def archivable(before, up_before=None):
+    """Ids of the live reports due for the archive, oldest first."""
+    due = ProblemReport.issue_date < before
+    if up_before is not None:
+        due = or_(due, (ProblemReport.status == 'UP') & (ProblemReport.issue_date < up_before))
+    return select(ProblemReport.id).where(
+        due,
+        ProblemReport.id != select(func.max(ProblemReport.id)).scalar_subquery(),
+        ProblemReport.id.not_in(select(SiteStatus.report_id)),
+        # An id reused after its first report was archived stays live
+        ProblemReport.id.not_in(select(ArchivedReport.id)),
+    ).order_by(ProblemReport.issue_date, ProblemReport.id)
+
+
+def _move(source, target, ids, keep_ids=True):
+    # Copy these rows through the ORM column types (which (de)compress the
+    # free-text columns) and delete the originals
+    rows = db.session.execute(
+        select(*(getattr(source, name) for name in _COLUMNS)).where(source.id.in_(ids))
+    ).mappings().all()
+    values = [dict(row) for row in rows]
+    for row in values:
+        if not keep_ids:
+            del row['id']
+        if target is ArchivedReport:
+            row['archived_at'] = datetime.utcnow()
+    db.session.execute(insert(target), values)
+    db.session.execute(delete(source).where(source.id.in_(ids)), execution_options={'synchronize_session': False})
+    return rows
+
+
+def archive_reports(before, up_before=None, batch_size=1000):
+    # One transaction per batch, so a long run never holds the write lock for long
+    moved = 0
+    while True:
+        ids = db.session.execute(archivable(before, up_before).limit(batch_size)).scalars().all()
+        if not ids:
+            return moved
+        _move(ProblemReport, ArchivedReport, ids)
+        # Days keep their counts and site_status is untouched, so no aggregate refresh
+        bump_version('problem_report', 'problem_report_archive')
+        db.session.commit()
+        moved += len(ids)
+
+
+def restore_reports(since=None, until=None, batch_size=1000):
+    # Back to problem_report; a report whose id was taken by a newer one gets a new id
+    moved = 0
+    while True:
+        query = select(ArchivedReport.id)
+        if since:
+            query = query.where(ArchivedReport.issue_date >= since)
+        if until:
+            query = query.where(ArchivedReport.issue_date <= until)
+        ids = db.session.execute(query.order_by(ArchivedReport.id).limit(batch_size)).scalars().all()
+        if not ids:
+            return moved
+        taken = set(db.session.execute(select(ProblemReport.id).where(ProblemReport.id.in_(ids))).scalars())
+        free = [i for i in ids if i not in taken]
+        rows = []
+        if free:
+            rows += _move(ArchivedReport, ProblemReport, free)
+        if taken:
+            rows += _move(ArchivedReport, ProblemReport, sorted(taken), keep_ids=False)
+        # A restored report may be its site's latest again
+        aggregates.refresh(db.session.connection(), {row['site_id'] for row in rows})
+        bump_version('problem_report', 'problem_report_archive')
+        db.session.commit()
+        moved += len(ids)
+
+
+# ===== READING ACROSS BOTH TABLES =====
+
+def _load_newest_archived():
+    return db.session.execute(select(func.max(ArchivedReport.issue_date))).scalar()
+
+
+_newest_archived = VersionedCache(('problem_report_archive',), _load_newest_archived)
+
+
+def newest_archived():
+    # Latest issue date in the archive, or None while it is empty
+    return _newest_archived.get()
+
+
+def archive_skipped(filters):
+    """The newest archived issue date when these filters leave out archived
+    reports that could match (a reason match only sees live ones), else None."""
+    if filters.covers_archive:
+        return None
+    newest = newest_archived()
+    if newest is None or (filters.since is not None and filters.since > newest):
+        return None
+    return newest
+
+
+@on_change
+def _invalidate_archive_caches(names):
+    if 'problem_report_archive' in names:
+        _newest_archived.invalidate()
+
+
+def paginate_reports(build, cursor=None, per_page=50, since=None, include_archive=True):
+    """Newest-first keyset page of reports, live and archived.
+
+    build(model) returns the filtered query for ProblemReport or
+    ArchivedReport; both share the (issue_date, id) cursor. The archive is
+    only queried when ``since`` reaches its dates and this page gets back to
+    them, so recent pages cost what they did before archiving.
+    """
+    page = keyset_paginate(build(ProblemReport), [ProblemReport.issue_date, ProblemReport.id],
+                           cursor=cursor, per_page=per_page, descending=True)
+    if not include_archive:
+        return page
+    newest = newest_archived()
+    if newest is None or (since is not None and since > newest):
+        return page
+    if page.has_next and page.items[-1].issue_date > newest:
+        return page
+
+    archived = keyset_paginate(build(ArchivedReport), [ArchivedReport.issue_date, ArchivedReport.id],
+                               cursor=cursor, per_page=per_page, descending=True)
+    items = sorted(page.items + archived.items, key=lambda r: (r.issue_date, r.id), reverse=True)
+    more = len(items) > per_page or page.has_next or archived.has_next
+    items = items[:per_page]
+    next_cursor = encode_cursor([items[-1].issue_date, items[-1].id]) if more else None
+    return KeysetPage(items, next_cursor, per_page)
+
+
+# ===== COMMANDS =====
+
+def _days_ago(days):
+    return date.today() - timedelta(days=days)
+
+
+@reports_cli.command('archive')
+@click.option('--older-than', type=int, default=None,
+              help='Archive reports issued more than this many days ago (default ARCHIVE_AFTER_DAYS).')
+@click.option('--up-older-than', type=int, default=None,
+              help='Archive UP reports issued more than this many days ago (default ARCHIVE_UP_AFTER_DAYS, 0 to skip).')
+@click.option('--batch-size', type=int, default=None, help='Reports per transaction (default ARCHIVE_BATCH_SIZE).')
+@click.option('--dry-run', is_flag=True, help='Only count the reports that would be archived.')
+@click.option('--vacuum', is_flag=True, help='Compact the database file afterwards.')
+def archive_command(older_than, up_older_than, batch_size, dry_run, vacuum):
+    """Move old and closed problem reports to the archive table."""
+    config = current_app.config
+    older_than = config['ARCHIVE_AFTER_DAYS'] if older_than is None else older_than
+    up_older_than = config['ARCHIVE_UP_AFTER_DAYS'] if up_older_than is None else up_older_than
+    before = _days_ago(older_than)
+    up_before = _days_ago(up_older_than) if up_older_than else None
+
+    if dry_run:
+        count = db.session.execute(select(func.count()).select_from(archivable(before, up_before).subquery())).scalar()
+        click.echo(f'{count} report(s) would be archived.')
+        return
+    moved = archive_reports(before, up_before, batch_size or config['ARCHIVE_BATCH_SIZE'])
+    click.echo(f'{moved} report(s) archived.')
+    if vacuum:
+        # VACUUM cannot run inside a transaction
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.exec_driver_sql('VACUUM')
+    _echo_counts()
+
+
+@reports_cli.command('restore')
+@click.option('--since', type=click.DateTime(['%Y-%m-%d']), default=None, help='First issue date to restore.')
+@click.option('--until', type=click.DateTime(['%Y-%m-%d']), default=None, help='Last issue date to restore.')
+def restore_command(since, until):
+    """Move archived problem reports back to the live table."""
+    moved = restore_reports(since and since.date(), until and until.date(),
+                            current_app.config['ARCHIVE_BATCH_SIZE'])
+    click.echo(f'{moved} report(s) restored.')
+    _echo_counts()
+
+
+def _echo_counts():
+    live = db.session.query(func.count(ProblemReport.id)).scalar()
+    archived = db.session.query(func.count(ArchivedReport.id)).scalar()
+    click.echo(f'{live} live report(s), {archived} archived.')
@@ -0,0 +1,151 @@
+import asyncio
+import io
+import queue
+import threading
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask_login import current_user
+
+import events
+from app import create_app
+
+# The app over ASGI, for any ASGI server, e.g.
+#
+#     uvicorn --factory asgi:create_asgi_app --workers 4
+#     gunicorn -w 4 -k uvicorn.workers.UvicornWorker 'asgi:create_asgi_app()'
+#
+# Requests go to the Flask views through a2wsgi's WSGIMiddleware, which runs
+# them on a pool of ASGI_THREADS threads, so every route behaves as it does
+# under gunicorn's sync workers. Views and their database work stay
+# synchronous (sqlite3 has no async driver), and a streamed body holds its
+# thread until it is sent. What this entry point adds is /events: those
+# streams wait on an asyncio queue fed by the events poller thread, so an
+# open browser tab costs no thread at all, and EVENTS_STREAM is turned on.
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    }
+
+
+class _AsyncSubscription:
+    # An events.Broadcaster subscriber read from the event loop; the poller
+    # thread hands rows over with call_soon_threadsafe
+
+    def __init__(self, loop, maxsize):
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._maxsize = maxsize
+
+    def put_nowait(self, row):
+        with self._lock:
+            if self._pending >= self._maxsize:
+                raise queue.Full
+            self._pending += 1
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, row)
+        except RuntimeError:  # loop closed; drop the subscriber like a stalled one
+            raise queue.Full
+
+    def end(self):
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        except RuntimeError:
+            pass
+
+    async def get(self):
+        row = await self._queue.get()
+        with self._lock:
+            self._pending -= 1
+        return row
+
+
+class AsgiApp:
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        # Streams cost no thread here, so pages can use them
+        flask_app.config['EVENTS_STREAM'] = True
+        self.wsgi = WSGIMiddleware(flask_app, workers=flask_app.config['ASGI_THREADS'])
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'] == '/events':
+            if await self._event_stream(scope, receive, send):
+                return
+        await self.wsgi(scope, receive, send)
+
+    # ===== LIVE EVENTS =====
+
+    def _open_events(self, scope, last_id, subscription):
+        # Same access rule as the /events view; None sends the request there
+        with self.flask_app.request_context(build_environ(scope, io.BytesIO())):
+            if not current_user.is_authenticated:
+                return None
+            return events.open_stream(self.flask_app, last_id, subscription)
+
+    async def _event_stream(self, scope, receive, send):
+        """Serve /events without a thread per stream, as events.event_stream_response does.
+
+        Returns False, having sent nothing, if the request is not logged in.
+        """
+        config = self.flask_app.config
+        headers = dict(scope['headers'])
+        try:
+            last_id = int(headers.get(b'last-event-id', b''))
+        except ValueError:
+            last_id = None
+        subscription = _AsyncSubscription(asyncio.get_running_loop(), config['EVENTS_MAX_QUEUE'])
+        opened = await asyncio.to_thread(self._open_events, scope, last_id, subscription)
+        if opened is None:
+            return False
+
+        q, backlog = opened
+        disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+        try:
+            await send(_start_message('200 OK', [
+                ('Content-Type', 'text/event-stream; charset=utf-8'),
+                ('Cache-Control', 'no-cache'),
+                ('X-Accel-Buffering', 'no'),
+            ]))
+
+            async def emit(text):
+                await send({'type': 'http.response.body', 'body': text.encode('utf-8'), 'more_body': True})
+
+            await emit(events.sse_retry(self.flask_app))
+            replayed = {row[0] for row in backlog}
+            for row in backlog:
+                await emit(events.sse_message(row))
+            while True:
+                getter = asyncio.ensure_future(q.get())
+                finished, _ = await asyncio.wait({getter, disconnected}, timeout=config['EVENTS_HEARTBEAT_SECONDS'],
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                if getter not in finished:
+                    getter.cancel()
+                    if disconnected in finished:
+                        return True
+                    await emit(': keep-alive\n\n')
+                    continue
+                row = getter.result()
+                if row is None:
+                    await send({'type': 'http.response.body', 'body': b''})
+                    return True
+                if row[0] not in replayed:
+                    await emit(events.sse_message(row))
+        finally:
+            disconnected.cancel()
+            events.close_stream(q)
+
+
+def create_asgi_app(config_name=None):
+    return AsgiApp(create_app(config_name))
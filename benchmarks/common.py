@@ -0,0 +1,52 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def make_app(db_path):
+    # Config reads DATABASE_URL at import time, so point it at the benchmark
+    # database before the app modules are imported
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(db_path)
+    from app import create_app
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    return app
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(p):
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))], 3)
+
+    return {
+        'n': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'p50_ms': pick(50),
+        'p90_ms': pick(90),
+        'p99_ms': pick(99),
+        'max_ms': round(ordered[-1], 3),
+    }
@@ -0,0 +1,104 @@
+"""Query plans and latencies for the listing and export queries, with and
+without the indexes from migration 3f9b7c21e5d4.
+
+    python -m benchmarks.indexes --sites 2000 --reports 100000 --json out.json
+"""
+import argparse
+import json
+import os
+import tempfile
+from datetime import date
+
+from benchmarks.common import make_app, percentiles, timed
+from benchmarks.seed import seed
+
+NEW_INDEXES = [
+    'ix_site_site_location_id', 'ix_site_sdwan_site_id', 'ix_site_lan_ip',
+    'ix_problem_report_issue_date_id', 'ix_problem_report_site_id_issue_date',
+    'ix_problem_report_status_issue_date', 'ix_problem_report_ticket_id',
+]
+
+
+def queries():
+    # The statements the routes issue, with literal values for EXPLAIN
+    from sqlalchemy import func, select, tuple_
+    from exports import report_export_query, site_export_query
+    from aggregates import latest_report_per_site
+    from models import IspLink, ProblemReport, Site, SiteStatus
+
+    report_page = select(ProblemReport, Site.site_location).join(Site, ProblemReport.site_id == Site.id)
+    return {
+        'site_data first page': select(Site).order_by(Site.site_location, Site.id).limit(51),
+        'site_data deep page': select(Site).where(tuple_(Site.site_location, Site.id) > ('Luxor', 0))
+            .order_by(Site.site_location, Site.id).limit(51),
+        'daily_problem_report first page': report_page
+            .order_by(ProblemReport.issue_date.desc(), ProblemReport.id.desc()).limit(51),
+        'daily_problem_report deep page': report_page
+            .where(tuple_(ProblemReport.issue_date, ProblemReport.id) < (date(2020, 1, 1), 10 ** 9))
+            .order_by(ProblemReport.issue_date.desc(), ProblemReport.id.desc()).limit(51),
+        'export_sites': site_export_query(),
+        'export_reports': report_export_query(),
+        'reports for one site': select(ProblemReport).where(ProblemReport.site_id == 7)
+            .order_by(ProblemReport.issue_date.desc()),
+        'DOWN in date range': select(ProblemReport).where(
+            ProblemReport.status == 'DOWN', ProblemReport.issue_date >= date(2025, 10, 1)),
+        'ticket lookup': select(ProblemReport).where(ProblemReport.ticket_id == 'INC1050000'),
+        'import upsert lookup': select(Site.sdwan_site_id, Site.id)
+            .where(Site.sdwan_site_id.in_([f'SD-{100000 + i}' for i in range(0, 2000, 20)])),
+        'site by LAN IP': select(Site).where(Site.lan_ip == '10.0.3.7'),
+        'bandwidth by provider': select(IspLink.provider, func.count(IspLink.id), func.sum(IspLink.capacity_mbps))
+            .group_by(IspLink.provider),
+        'current status of one site': select(SiteStatus).where(SiteStatus.site_id == 7),
+        'latest report per site (window)': latest_report_per_site(),
+        'sites DOWN now': select(Site).join(SiteStatus, SiteStatus.site_id == Site.id)
+            .where(SiteStatus.status == 'DOWN').order_by(Site.site_location, Site.id).limit(51),
+        'sites below 50 Mbps': select(Site, IspLink).join(IspLink, IspLink.site_id == Site.id)
+            .where(IspLink.capacity_mbps < 50).order_by(IspLink.capacity_mbps),
+    }
+
+
+def measure(conn, statements, repeat):
+    results = {}
+    for name, stmt in statements.items():
+        sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+        plan = [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql)]
+        samples = timed(lambda: conn.exec_driver_sql(sql).fetchall(), repeat)
+        results[name] = {'plan': plan, **percentiles(samples)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sites', type=int, default=2000)
+    parser.add_argument('--reports', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='nbi-bench-'), 'bench.db')
+    app = make_app(db_path)
+    seed(app, args.sites, args.reports)
+
+    from extensions import db
+    with app.app_context():
+        statements = queries()
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('ANALYZE')
+            after = measure(conn, statements, args.repeat)
+            for name in NEW_INDEXES:
+                conn.exec_driver_sql(f'DROP INDEX {name}')
+            conn.exec_driver_sql('ANALYZE')
+            before = measure(conn, statements, args.repeat)
+
+    report = {'sites': args.sites, 'reports': args.reports, 'before': before, 'after': after}
+    for name in statements:
+        b, a = before[name], after[name]
+        print(f'{name}\n  before {b["p50_ms"]:>9.3f} ms  {" | ".join(b["plan"])}'
+              f'\n  after  {a["p50_ms"]:>9.3f} ms  {" | ".join(a["plan"])}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
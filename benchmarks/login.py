@@ -0,0 +1,92 @@
+"""Login latency and throughput under concurrent logins, per hashing policy.
+
+    python -m benchmarks.login --users 32 --concurrency 1 4 16 --json out.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import make_app, percentiles
+
+METHODS = ['scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:260000']
+
+
+def create_users(app, count, method):
+    from extensions import db
+    from models import User
+
+    with app.app_context():
+        app.config['PASSWORD_HASH_METHOD'] = method
+        db.session.query(User).delete()
+        for i in range(count):
+            user = User(username=f'user{i}', group='NOC Team')
+            user.set_password(f'pass{i}')
+            db.session.add(user)
+        db.session.commit()
+
+
+def login_burst(app, users, logins, concurrency):
+    # Each login uses its own client, like distinct browsers at shift change
+    def one(i):
+        n = i % users
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post('/login', data={'username': f'user{n}', 'password': f'pass{n}'})
+        elapsed = (time.perf_counter() - start) * 1000
+        assert response.status_code == 302, response.status_code
+        return elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, range(logins)))
+    wall = time.perf_counter() - start
+    return {**percentiles(samples), 'logins_per_s': round(logins / wall, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=32)
+    parser.add_argument('--logins', type=int, default=64, help='logins per measurement')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--workers', type=int, default=None, help='PASSWORD_HASH_WORKERS (default: config)')
+    parser.add_argument('--methods', nargs='+', default=METHODS)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='nbi-bench-'), 'bench.db')
+    app = make_app(db_path)
+    if args.workers:
+        app.config['PASSWORD_HASH_WORKERS'] = args.workers
+    from extensions import db
+    with app.app_context():
+        db.create_all()
+
+    report = {'users': args.users, 'logins': args.logins,
+              'hash_workers': app.config['PASSWORD_HASH_WORKERS'], 'methods': {}}
+    for method in args.methods:
+        create_users(app, args.users, method)
+        app.config['PASSWORD_HASH_METHOD'] = method
+        results = report['methods'][method] = {}
+        for concurrency in args.concurrency:
+            results[concurrency] = result = login_burst(app, args.users, args.logins, concurrency)
+            print(f'{method:<24} x{concurrency:<3} p50 {result["p50_ms"]:>8.1f} ms  '
+                  f'p99 {result["p99_ms"]:>8.1f} ms  {result["logins_per_s"]:>7.1f} logins/s')
+
+    # First login after a policy change pays for the rehash once per user
+    create_users(app, args.users, args.methods[0])
+    app.config['PASSWORD_HASH_METHOD'] = args.methods[-1]
+    report['rehash_first_login'] = login_burst(app, args.users, args.users, 1)
+    report['rehash_second_login'] = login_burst(app, args.users, args.users, 1)
+    print(f'rehash {args.methods[0]} -> {args.methods[-1]}: first login p50 '
+          f'{report["rehash_first_login"]["p50_ms"]:.1f} ms, next {report["rehash_second_login"]["p50_ms"]:.1f} ms')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
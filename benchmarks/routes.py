@@ -0,0 +1,192 @@
+"""Latency, SQL statements and memory per route, through the Flask test client.
+
+    python -m benchmarks.routes --sites 2000 --reports 100000 --json after.json
+    python -m benchmarks.routes --database bench.db --baseline before.json --fail-over 20
+
+Every scenario is requested once cold and then --repeat times; the JSON
+report carries the commit it ran on, so two runs can be compared with
+--baseline. Worker boot time and memory (benchmarks.startup) are included
+unless --no-startup is given.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import startup
+from benchmarks.common import git_commit, make_app, percentiles
+from benchmarks.seed import seed
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+# name -> (method, url, form data); login runs with its own client, without a session
+SCENARIOS = {
+    'site_data': ('GET', '/site_data', None),
+    'site_data search': ('GET', '/site_data?search=Cairo', None),
+    'site_data DOWN now': ('GET', '/site_data?status=DOWN', None),
+    'daily_problem_report': ('GET', '/daily_problem_report', None),
+    'daily_problem_report latest': ('GET', '/daily_problem_report?latest=1', None),
+    'dashboard': ('GET', '/dashboard', None),
+    'api sites': ('GET', '/api/v1/sites', None),
+    'api reports': ('GET', '/api/v1/reports', None),
+    'export_sites csv': ('GET', '/export_sites?format=csv', None),
+    'export_sites xlsx': ('GET', '/export_sites', None),
+    'export_reports csv': ('GET', '/export_reports?format=csv', None),
+    'export_reports history csv': ('GET', '/export_reports?format=csv&archive=1', None),
+    'login': ('POST', '/login', {'username': 'bench', 'password': 'benchpass'}),
+}
+
+
+def _logged_in_client(app):
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'bench', 'password': 'benchpass'})
+    assert response.status_code == 302, response.status_code
+    return client
+
+
+def run_scenario(app, name, repeat):
+    from instrumentation import count_queries
+
+    method, url, data = SCENARIOS[name]
+    session_client = _logged_in_client(app)
+
+    def request():
+        client = app.test_client() if name == 'login' else session_client
+        response = client.open(url, method=method, data=data)
+        body = response.get_data()  # drains streamed exports
+        assert response.status_code < 400, (name, response.status_code)
+        return len(body)
+
+    # Requests must run outside an app context: one pushed here would be
+    # shared by all of them, and so would flask.g (and the logged-in user)
+    from extensions import db
+    with app.app_context():
+        engine = db.engine
+
+    with count_queries(engine) as queries:
+        start = time.perf_counter()
+        size = request()
+        first_ms = (time.perf_counter() - start) * 1000
+    first_sql = queries.count
+
+    samples = []
+    with count_queries(engine) as queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            request()
+            samples.append((time.perf_counter() - start) * 1000)
+
+    # Peak Python allocations of one more request; traced separately since
+    # tracemalloc slows everything down
+    tracemalloc.start()
+    try:
+        request()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        **percentiles(samples),
+        'first_ms': round(first_ms, 3),
+        'sql_first': first_sql,
+        'sql_per_request': round(queries.count / repeat, 2),
+        'peak_kib': round(peak / 1024, 1),
+        'response_bytes': size,
+    }
+
+
+def compare(baseline, results, fail_over):
+    # Prints p50 / SQL / memory deltas; returns the scenarios whose p50 grew by more than fail_over percent
+    regressions = []
+    print(f'\nagainst {baseline.get("commit") or "baseline"}:')
+    if baseline.get('startup') and results.get('startup'):
+        before, now = baseline['startup'], results['startup']
+        print(f'  {"worker boot":<28} p50 {before["boot"]["p50_ms"]:>9.2f} -> {now["boot"]["p50_ms"]:>9.2f} ms  '
+              f'rss {before["rss_boot_kib"] / 1024:.1f} -> {now["rss_boot_kib"] / 1024:.1f} MiB')
+    for name, now in results['results'].items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        change = (now['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        print(f'  {name:<28} p50 {before["p50_ms"]:>9.2f} -> {now["p50_ms"]:>9.2f} ms ({change:+6.1f}%)  '
+              f'sql {before["sql_per_request"]:g} -> {now["sql_per_request"]:g}  '
+              f'peak {before["peak_kib"]:g} -> {now["peak_kib"]:g} KiB')
+        if fail_over is not None and change > fail_over:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help='existing benchmark database (see benchmarks.seed); seeded afresh if omitted')
+    parser.add_argument('--sites', type=int, default=2000)
+    parser.add_argument('--reports', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', nargs='+', choices=sorted(SCENARIOS), help='run only these scenarios')
+    parser.add_argument('--no-fragment-cache', action='store_true', help='render every row on every request')
+    parser.add_argument('--no-startup', action='store_true', help='skip the worker boot measurements')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results of an earlier run to compare against')
+    parser.add_argument('--fail-over', type=float, default=None,
+                        help='exit with status 1 if any p50 is this many percent above the baseline')
+    args = parser.parse_args()
+
+    if args.database:
+        app = make_app(args.database)
+    else:
+        app = make_app(os.path.join(tempfile.mkdtemp(prefix='nbi-bench-'), 'bench.db'))
+        seed(app, args.sites, args.reports)
+    if args.no_fragment_cache:
+        app.config['FRAGMENT_CACHE_SIZE'] = 0
+
+    from extensions import db
+    from models import Site, ProblemReport
+    with app.app_context():
+        sites = db.session.query(db.func.count(Site.id)).scalar()
+        reports = db.session.query(db.func.count(ProblemReport.id)).scalar()
+
+    results = {}
+    for name in args.only or SCENARIOS:
+        results[name] = result = run_scenario(app, name, args.repeat)
+        print(f'{name:<28} p50 {result["p50_ms"]:>9.2f} ms  p90 {result["p90_ms"]:>9.2f} ms  '
+              f'first {result["first_ms"]:>9.2f} ms  sql {result["sql_per_request"]:>6g}  '
+              f'peak {result["peak_kib"]:>9.1f} KiB')
+
+    report = {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sites': sites,
+        'reports': reports,
+        'repeat': args.repeat,
+        'fragment_cache': app.config['FRAGMENT_CACHE_SIZE'] > 0,
+        'max_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+        'startup': None if args.no_startup else startup.measure(),
+        'results': results,
+    }
+    if report['startup']:
+        boot = report['startup']
+        print(f'{"worker boot":<28} p50 {boot["boot"]["p50_ms"]:>9.2f} ms  '
+              f'rss {boot["rss_boot_kib"] / 1024:.1f} MiB, {boot["rss_first_request_kib"] / 1024:.1f} MiB after one request')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), report, args.fail_over)
+        if regressions:
+            print(f'p50 regressed by more than {args.fail_over:g}%: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Fill a database with a synthetic site inventory and report history.
+
+    python -m benchmarks.seed bench.db --sites 2000 --reports 100000
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from benchmarks.common import make_app
+
+PROVIDERS = ['EL', 'ILevant', 'Horizon']
+CITIES = ['Cairo', 'Giza', 'Alexandria', 'Mansoura', 'Tanta', 'Aswan', 'Luxor', 'Suez', 'Ismailia', 'Zagazig']
+KINDS = ['Branch', 'ATM Room', 'Data Center', 'Kiosk', 'Head Office']
+REASONS = [
+    'Fiber cut reported by the carrier on the last-mile segment',
+    'Power outage at the site, UPS drained before the generator started',
+    'CPE unreachable after the overnight maintenance window',
+    'High packet loss on the primary link, traffic failed over to backup',
+    'Carrier core incident affecting several sites in the governorate',
+]
+CAPACITIES = ['10', '20', '50 Mbps', '100', '100 Mbps', '200', '1 Gbps']
+
+
+def _text(rng, base, words):
+    # Long free-text fields like the ones operators actually type
+    filler = ' '.join(rng.choice(['escalated', 'carrier', 'ticket', 'follow-up', 'technician',
+                                  'dispatched', 'awaiting', 'confirmation', 'restored', 'monitoring'])
+                      for _ in range(words))
+    return f'{base}. {filler}.'
+
+
+def site_rows(rng, count):
+    for i in range(count):
+        city = rng.choice(CITIES)
+        row = {
+            'site_location': f'{city} {rng.choice(KINDS)} {i:05d}',
+            'device_name': f'{city[:3].upper()}-EDGE-{i:05d}',
+            'sdwan_site_id': f'SD-{100000 + i}',
+            'lan_ip': f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}',
+            'atm_port': f'ATM-{rng.randint(1, 48)}' if rng.random() < 0.4 else None,
+        }
+        for provider in PROVIDERS:
+            prefix = provider.lower()
+            present = rng.random() < 0.7
+            row[f'{prefix}_isp_info_details'] = f'{provider} circuit {rng.randint(10000, 99999)} {city}' if present else None
+            row[f'{prefix}_isp_capacity'] = rng.choice(CAPACITIES) if present else None
+            if provider != 'ILevant':
+                row[f'{prefix}_isp_l2_ip'] = f'172.{16 + i % 16}.{i // 256 % 256}.{i % 256}' if present else None
+        yield row
+
+
+def report_rows(rng, count, site_count, start=date(2019, 1, 1), days=2500):
+    # A few sites account for most incidents, like the real history
+    weights = [1 / (n + 1) ** 0.8 for n in range(site_count)]
+    site_ids = rng.choices(range(1, site_count + 1), weights=weights, k=count)
+    for i, site_id in enumerate(site_ids):
+        issue = start + timedelta(days=rng.randrange(days))
+        yield {
+            'site_id': site_id,
+            'ticket_id': f'INC{1000000 + i}',
+            'status': 'DOWN' if rng.random() < 0.3 else 'UP',
+            'reason': _text(rng, rng.choice(REASONS), rng.randint(10, 60)),
+            'last_update': _text(rng, 'Last update from NOC', rng.randint(20, 120)),
+            'issue_date': issue,
+            'last_follow_up': issue + timedelta(days=rng.randint(0, 10)),
+        }
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(app, sites, reports, random_seed=42, batch_size=5000):
+    from sqlalchemy import insert
+    import aggregates
+    from extensions import db
+    from models import Site, IspLink, ProblemReport, User, split_isp_fields
+    from search import rebuild_search_index
+
+    rng = random.Random(random_seed)
+    with app.app_context():
+        db.create_all()
+        for batch in _batched(site_rows(rng, sites), batch_size):
+            site_values, links = zip(*(split_isp_fields(row) for row in batch))
+            site_ids = db.session.scalars(
+                insert(Site).returning(Site.id, sort_by_parameter_order=True), list(site_values)
+            ).all()
+            link_rows = [dict(link, site_id=site_id) for site_id, site_links in zip(site_ids, links) for link in site_links]
+            if link_rows:
+                db.session.execute(insert(IspLink), link_rows)
+        for batch in _batched(report_rows(rng, reports, sites), batch_size):
+            db.session.execute(insert(ProblemReport), batch)
+        # Bulk inserts skip the flush hook that fills the dashboard tables
+        aggregates.rebuild(db.session.connection())
+        admin = User(username='bench', group='Admin')
+        admin.set_password('benchpass')
+        db.session.add(admin)
+        db.session.commit()
+        # What `flask db upgrade` builds; searches no longer create it
+        rebuild_search_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('database', help='SQLite file to create')
+    parser.add_argument('--sites', type=int, default=2000)
+    parser.add_argument('--reports', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    seed(make_app(args.database), args.sites, args.reports, args.seed)
+    print(f'Seeded {args.sites} sites and {args.reports} reports into {args.database}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Worker boot time and memory: create_app() in fresh interpreters.
+
+    python -m benchmarks.startup --repeat 5 --json startup.json
+
+Each run starts a new Python process, as a gunicorn worker would without
+--preload, and records the time to import the app and build it, the
+process's max RSS after boot and after one request, and (from
+python -X importtime) the slowest top-level imports.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import ROOT, percentiles
+
+# Peak RSS comes from VmHWM where available: ru_maxrss survives exec on
+# Linux, so it would report the (much larger) benchmark parent instead
+PROBE = '''
+import json, resource, time
+
+def peak_rss_kib():
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+boot = time.perf_counter() - start
+rss_boot = peak_rss_kib()
+app.test_client().get('/login')
+print(json.dumps({'boot_ms': boot * 1000, 'rss_boot_kib': rss_boot, 'rss_first_request_kib': peak_rss_kib()}))
+'''
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='nbi-bench-'), 'boot.db'))
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def _probe(env, importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE]
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(stderr, top):
+    # Top-level entries of the -X importtime tree ("import time: self | cumulative | name")
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.startswith(' ') and not name.startswith('  '):
+            imports.append((name.strip(), int(cumulative) / 1000))
+    imports.sort(key=lambda item: item[1], reverse=True)
+    return [{'module': name, 'cumulative_ms': round(ms, 1)} for name, ms in imports[:top]]
+
+
+def measure(repeat=5, top=15):
+    env = _env()
+    runs = [_probe(env)[0] for _ in range(repeat)]
+    _, stderr = _probe(env, importtime=True)
+    return {
+        'boot': percentiles([run['boot_ms'] for run in runs]),
+        'rss_boot_kib': max(run['rss_boot_kib'] for run in runs),
+        'rss_first_request_kib': max(run['rss_first_request_kib'] for run in runs),
+        'slowest_imports': slowest_imports(stderr, top),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='how many of the slowest imports to list')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    report = measure(args.repeat, args.top)
+    print(f'boot p50 {report["boot"]["p50_ms"]:.1f} ms, max RSS {report["rss_boot_kib"] / 1024:.1f} MiB '
+          f'({report["rss_first_request_kib"] / 1024:.1f} MiB after one request)')
+    for item in report['slowest_imports']:
+        print(f'  {item["cumulative_ms"]:>8.1f} ms  {item["module"]}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
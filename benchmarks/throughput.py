@@ -0,0 +1,258 @@
+"""Concurrent-client throughput: sync gunicorn workers against asgi.py.
+
+    python -m benchmarks.throughput --clients 32 --streams 50 --slow-downloads 4 --json out.json
+
+Each deployment is started on a local port against the same seeded
+database, with the same number of worker processes:
+
+    sync   gunicorn -w N 'app:create_app()'
+    async  gunicorn -w N -k uvicorn.workers.UvicornWorker 'asgi:create_asgi_app()'
+
+While --streams browsers hold /events open and --slow-downloads clients read
+the CSV report export at --slow-rate KiB/s, --clients closed-loop clients
+request the read pages for --duration seconds. A request that takes longer
+than --timeout counts as an error. The async deployment needs uvicorn and
+a2wsgi; it is skipped without uvicorn. The sync deployment serves /events
+only with EVENTS_STREAM=1 in the environment; otherwise its pages poll and
+the held streams are refused.
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.common import ROOT, git_commit, make_app, percentiles
+from benchmarks.seed import seed
+
+DEPLOYMENTS = {
+    'sync': (None, 'app:create_app()'),
+    'async': ('uvicorn.workers.UvicornWorker', 'asgi:create_asgi_app()'),
+}
+
+# What the closed-loop clients cycle through
+READ_PATHS = [
+    '/site_data',
+    '/daily_problem_report',
+    '/api/v1/sites',
+    '/api/v1/reports',
+    '/daily_problem_report?status=DOWN',
+]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(name, database, workers, sync_worker_class):
+    worker_class, target = DEPLOYMENTS[name]
+    port = _free_port()
+    command = [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+               '--worker-class', worker_class or sync_worker_class, '--log-level', 'warning', target]
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.abspath(database), FLASK_ENV='production')
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/login')
+            connection.getresponse().read()
+            return process, port
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{name} server did not start')
+
+
+def login(port):
+    # The login form carries a CSRF token tied to the session cookie
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.request('GET', '/login')
+    response = connection.getresponse()
+    cookie = response.getheader('Set-Cookie', '').split(';')[0]
+    token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', response.read().decode())
+    body = f'username=bench&password=benchpass&csrf_token={token.group(1) if token else ""}'
+    connection.request('POST', '/login', body=body, headers={
+        'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': cookie,
+    })
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 302, response.status
+    return response.getheader('Set-Cookie', '').split(';')[0] or cookie
+
+
+class Load:
+    """The clients of one run, all stopping at the same deadline."""
+
+    def __init__(self, port, cookie, timeout):
+        self.port, self.cookie, self.timeout = port, cookie, timeout
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.samples, self.errors = [], 0
+        self.streams_open = self.stream_events = self.download_bytes = 0
+
+    def _connection(self):
+        return http.client.HTTPConnection('127.0.0.1', self.port, timeout=self.timeout)
+
+    def client(self, offset):
+        connection = self._connection()
+        i = offset
+        while not self.stop.is_set():
+            path = READ_PATHS[i % len(READ_PATHS)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path, headers={'Cookie': self.cookie})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except OSError:
+                ok = False
+                connection.close()
+                connection = self._connection()
+            elapsed = (time.perf_counter() - start) * 1000
+            with self.lock:
+                if ok:
+                    self.samples.append(elapsed)
+                else:
+                    self.errors += 1
+
+    def stream(self):
+        # A browser tab: /events held open until the run ends
+        connection = self._connection()
+        try:
+            connection.request('GET', '/events', headers={'Cookie': self.cookie})
+            response = connection.getresponse()
+            if response.status != 200:
+                return
+            with self.lock:
+                self.streams_open += 1
+            while not self.stop.is_set():
+                line = response.fp.readline()
+                if not line:
+                    break
+                if line.startswith(b'event:'):
+                    with self.lock:
+                        self.stream_events += 1
+        except OSError:
+            pass
+        finally:
+            connection.close()
+
+    def slow_download(self, rate_kib):
+        # Reads the CSV export at rate_kib KiB/s, starting over when it ends
+        while not self.stop.is_set():
+            connection = self._connection()
+            try:
+                connection.request('GET', '/export_reports?format=csv', headers={'Cookie': self.cookie})
+                response = connection.getresponse()
+                while not self.stop.is_set():
+                    chunk = response.read(4096)
+                    if not chunk:
+                        break
+                    with self.lock:
+                        self.download_bytes += len(chunk)
+                    time.sleep(4 / rate_kib)
+            except OSError:
+                time.sleep(0.5)
+            finally:
+                connection.close()
+
+    def run(self, clients, streams, downloads, rate_kib, duration):
+        threads = [threading.Thread(target=self.stream, daemon=True) for _ in range(streams)]
+        threads += [threading.Thread(target=self.slow_download, args=(rate_kib,), daemon=True) for _ in range(downloads)]
+        for thread in threads:
+            thread.start()
+        time.sleep(1)  # let the long-lived connections take their places first
+        workers = [threading.Thread(target=self.client, args=(i,), daemon=True) for i in range(clients)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        time.sleep(duration)
+        self.stop.set()
+        for thread in workers:
+            thread.join(self.timeout + 1)
+        elapsed = time.perf_counter() - start
+        return {
+            'requests': len(self.samples),
+            'errors': self.errors,
+            'requests_per_second': round(len(self.samples) / elapsed, 2),
+            **(percentiles(self.samples) if self.samples else {}),
+            'streams_open': self.streams_open,
+            'stream_events': self.stream_events,
+            'download_kib': round(self.download_bytes / 1024, 1),
+        }
+
+
+def run_deployment(name, database, args):
+    process, port = start_server(name, database, args.workers, args.sync_worker_class)
+    try:
+        load = Load(port, login(port), args.timeout)
+        return load.run(args.clients, args.streams, args.slow_downloads, args.slow_rate, args.duration)
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help='existing benchmark database (see benchmarks.seed); seeded afresh if omitted')
+    parser.add_argument('--sites', type=int, default=2000)
+    parser.add_argument('--reports', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=2, help='worker processes per deployment')
+    parser.add_argument('--sync-worker-class', default='sync', help='gunicorn worker class of the sync deployment')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--streams', type=int, default=20, help='/events connections held open')
+    parser.add_argument('--slow-downloads', type=int, default=2)
+    parser.add_argument('--slow-rate', type=float, default=64, help='KiB/s per slow download')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--only', nargs='+', choices=sorted(DEPLOYMENTS))
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    database = args.database
+    if not database:
+        database = os.path.join(tempfile.mkdtemp(prefix='nbi-bench-'), 'bench.db')
+        seed(make_app(database), args.sites, args.reports)
+
+    results = {}
+    for name in args.only or DEPLOYMENTS:
+        worker_class = DEPLOYMENTS[name][0]
+        if worker_class and importlib.util.find_spec(worker_class.split('.')[0]) is None:
+            print(f'{name:<6} skipped: {worker_class.split(".")[0]} is not installed')
+            continue
+        results[name] = result = run_deployment(name, database, args)
+        print(f'{name:<6} {result["requests_per_second"]:>8.1f} req/s  p50 {result.get("p50_ms", 0):>8.1f} ms  '
+              f'p99 {result.get("p99_ms", 0):>8.1f} ms  errors {result["errors"]}  '
+              f'streams {result["streams_open"]}/{args.streams}  downloaded {result["download_kib"]:g} KiB')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'options': {k: v for k, v in vars(args).items() if k not in ('json', 'only')},
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
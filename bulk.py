@@ -0,0 +1,142 @@
+from sqlalchemy import delete, exists, insert, literal, select, update
+
+import aggregates
+import events
+from extensions import db
+from models import Site, IspLink, ProblemReport, ArchivedReport, ISP_FIELDS, parse_capacity
+from versioning import bump_version
+
+# Each operation below is a few set-based statements over all the selected ids
+# and one commit. Bulk statements skip the ORM flush, so they bump the data
+# and row versions, dashboard tables and change events themselves.
+
+SITE_COPY_COLUMNS = [c for c in Site.__table__.columns if c.name != 'id']
+LINK_COPY_COLUMNS = [c for c in IspLink.__table__.columns if c.name != 'id']
+REPORT_COPY_COLUMNS = [c for c in ProblemReport.__table__.columns if c.name != 'id']
+
+
+def _commit(*versions):
+    bump_version(*versions)
+    db.session.commit()
+
+
+def update_sites(ids, column, value):
+    if column in ISP_FIELDS:
+        count = _update_isp_links(ids, *ISP_FIELDS[column], value)
+        db.session.execute(
+            update(Site).where(Site.id.in_(ids)).values(row_version=Site.row_version + 1),
+            execution_options={'synchronize_session': False},
+        )
+    else:
+        count = db.session.execute(
+            update(Site).where(Site.id.in_(ids)).values({column: value, 'row_version': Site.row_version + 1}),
+            execution_options={'synchronize_session': False},
+        ).rowcount
+    _commit('site')
+    return count
+
+
+def _update_isp_links(ids, provider, attr, value):
+    if attr == 'capacity_mbps':
+        value = parse_capacity(value)
+    in_scope = IspLink.site_id.in_(ids) & (IspLink.provider == provider)
+    count = db.session.execute(
+        update(IspLink).where(in_scope).values({attr: value}),
+        execution_options={'synchronize_session': False},
+    ).rowcount
+    if value is None:
+        # Clearing the last filled-in field removes the link altogether
+        db.session.execute(
+            delete(IspLink).where(in_scope, IspLink.details.is_(None),
+                                  IspLink.capacity_mbps.is_(None), IspLink.l2_ip.is_(None)),
+            execution_options={'synchronize_session': False},
+        )
+        return count
+    has_link = exists().where(IspLink.site_id == Site.id, IspLink.provider == provider)
+    count += db.session.execute(
+        insert(IspLink).from_select(
+            ['site_id', 'provider', attr],
+            select(Site.id, literal(provider), literal(value)).where(Site.id.in_(ids), ~has_link),
+        )
+    ).rowcount
+    return count
+
+
+def delete_sites(ids):
+    # Sites that still have problem reports, live or archived, are left alone.
+    # Returns the number deleted and the ids kept for that reason.
+    has_reports = exists().where(ProblemReport.site_id == Site.id) \
+        | exists().where(ArchivedReport.site_id == Site.id)
+    kept = db.session.scalars(select(Site.id).where(Site.id.in_(ids), has_reports)).all()
+    deletable = select(Site.id).where(Site.id.in_(ids), ~has_reports)
+    db.session.execute(
+        delete(IspLink).where(IspLink.site_id.in_(deletable)),
+        execution_options={'synchronize_session': False},
+    )
+    result = db.session.execute(
+        delete(Site).where(Site.id.in_(deletable.scalar_subquery())),
+        execution_options={'synchronize_session': False},
+    )
+    _commit('site')
+    return result.rowcount, kept
+
+
+def clone_sites(ids):
+    sources = db.session.execute(select(Site.id, *SITE_COPY_COLUMNS).where(Site.id.in_(ids)).order_by(Site.id)).all()
+    if not sources:
+        return 0
+    names = [c.name for c in SITE_COPY_COLUMNS]
+    new_ids = db.session.scalars(
+        insert(Site).returning(Site.id, sort_by_parameter_order=True),
+        [dict(zip(names, row[1:])) for row in sources],
+    ).all()
+    clone_of = {row.id: new_id for row, new_id in zip(sources, new_ids)}
+    links = db.session.execute(select(*LINK_COPY_COLUMNS).where(IspLink.site_id.in_(clone_of))).mappings().all()
+    if links:
+        db.session.execute(insert(IspLink), [dict(link, site_id=clone_of[link['site_id']]) for link in links])
+    _commit('site')
+    return len(new_ids)
+
+
+def _commit_reports(footprint, action, report_ids):
+    # Bulk report statements skip the flush hooks that maintain the dashboard
+    # tables and record change events
+    conn = db.session.connection()
+    aggregates.refresh(conn, *footprint)
+    events.record_reports(conn, action, report_ids)
+    events.record_statuses(conn, footprint[0])
+    _commit('problem_report')
+
+
+def set_report_status(ids, status):
+    footprint = aggregates.reports_footprint(ids)
+    updated = db.session.scalars(
+        update(ProblemReport).where(ProblemReport.id.in_(ids))
+        .values(status=status, row_version=ProblemReport.row_version + 1)
+        .returning(ProblemReport.id),
+        execution_options={'synchronize_session': False},
+    ).all()
+    _commit_reports(footprint, 'updated', updated)
+    return len(updated)
+
+
+def delete_reports(ids):
+    footprint = aggregates.reports_footprint(ids)
+    deleted = db.session.scalars(
+        delete(ProblemReport).where(ProblemReport.id.in_(ids)).returning(ProblemReport.id),
+        execution_options={'synchronize_session': False},
+    ).all()
+    _commit_reports(footprint, 'deleted', deleted)
+    return len(deleted)
+
+
+def clone_reports(ids):
+    footprint = aggregates.reports_footprint(ids)
+    names = [c.name for c in REPORT_COPY_COLUMNS]
+    created = db.session.scalars(
+        insert(ProblemReport.__table__).from_select(
+            names, select(*REPORT_COPY_COLUMNS).where(ProblemReport.id.in_(ids)).order_by(ProblemReport.id)
+        ).returning(ProblemReport.__table__.c.id)
+    ).all()
+    _commit_reports(footprint, 'created', created)
+    return len(created)
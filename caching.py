@@ -0,0 +1,69 @@
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import select
+
+from extensions import db
+from models import Site
+from versioning import current_versions, on_change
+
+
+class VersionedCache:
+    """A process-local value rebuilt whenever its data version counters move.
+
+    Commits made by this process invalidate it immediately (through the
+    versioning after-commit hook); commits made by other workers are noticed
+    by comparing the shared counters in data_version, at most every
+    CACHE_VERSION_CHECK_SECONDS.
+    """
+
+    def __init__(self, names, loader):
+        self.names = tuple(names)
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        self._checked = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def get(self):
+        now = time.monotonic()
+        interval = current_app.config['CACHE_VERSION_CHECK_SECONDS']
+        with self._lock:
+            if self._version is not None and now - self._checked < interval:
+                return self._value
+
+        version = current_versions(*self.names)
+        with self._lock:
+            if version == self._version:
+                self._checked = now
+                return self._value
+
+        value = self.loader()
+        with self._lock:
+            self._value, self._version, self._checked = value, version, now
+        return value
+
+
+def _load_site_choices():
+    rows = db.session.execute(select(Site.id, Site.site_location).order_by(Site.site_location)).all()
+    choices = [(site_id, location) for site_id, location in rows]
+    return choices, frozenset(site_id for site_id, _ in choices)
+
+
+_site_choices = VersionedCache(('site',), _load_site_choices)
+
+
+def site_choices():
+    # ([(id, site_location), ...] sorted by name, frozenset of ids)
+    return _site_choices.get()
+
+
+@on_change
+def _invalidate_site_caches(names):
+    if 'site' in names:
+        _site_choices.invalidate()
@@ -1,6 +1,155 @@
 import os
 
+
+def engine_options(uri):
+    # Pool settings for SQLALCHEMY_ENGINE_OPTIONS. An in-memory SQLite
+    # database lives in a single connection (StaticPool), which takes no
+    # size options.
+    options = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    if not (uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') == 'sqlite:')):
+        options['pool_size'] = int(os.environ.get('DB_POOL_SIZE', 5))
+        options['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+        options['pool_timeout'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    return options
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///nbi_site_management.db'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Applied to every new SQLite connection. WAL lets readers run alongside
+    # the single writer, so gunicorn workers do not queue on the database
+    # lock; busy_timeout (ms) makes a blocked writer wait instead of failing.
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    }
+
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+
+    # Listing page sizes; ?per_page= can override up to MAX_PER_PAGE
+    SITES_PER_PAGE = int(os.environ.get('SITES_PER_PAGE', 50))
+    REPORTS_PER_PAGE = int(os.environ.get('REPORTS_PER_PAGE', 50))
+    MAX_PER_PAGE = int(os.environ.get('MAX_PER_PAGE', 500))
+
+    # Rows fetched per round trip while streaming an export
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+    # Background exports (?background=1): worker threads per process, artifact
+    # cache directory (defaults to instance/exports) and when a job that has
+    # stopped reporting progress may be restarted
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+    EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR')
+    EXPORT_JOB_STALE_SECONDS = int(os.environ.get('EXPORT_JOB_STALE_SECONDS', 60))
+
+    # How long process-local caches trust their data version before re-reading
+    # the shared counters; 0 checks on every use (one primary-key lookup)
+    CACHE_VERSION_CHECK_SECONDS = float(os.environ.get('CACHE_VERSION_CHECK_SECONDS', 0))
+
+    # Rows per transaction for bulk site imports
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))
+
+    # How authenticated requests get the current user: 'db' loads the row every
+    # request, 'cache' keeps (id, username, group) in a per-process LRU for
+    # USER_CACHE_TTL seconds, 'session' carries them in the signed session cookie.
+    # Both cached modes drop stale entries once the shared user version moves,
+    # checked at most every USER_VERSION_CHECK_SECONDS.
+    IDENTITY_MODE = os.environ.get('IDENTITY_MODE', 'cache')
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 300))
+    USER_VERSION_CHECK_SECONDS = float(os.environ.get('USER_VERSION_CHECK_SECONDS', 5))
+
+    # Password hashing policy, in werkzeug's method syntax: 'scrypt:N:r:p' or
+    # 'pbkdf2:sha256:iterations'. Hashes stored under other settings are
+    # upgraded at the user's next login. Verification runs on a pool of
+    # PASSWORD_HASH_WORKERS threads per process; a login that cannot get a
+    # slot within PASSWORD_VERIFY_TIMEOUT seconds is asked to retry.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_VERIFY_TIMEOUT = float(os.environ.get('PASSWORD_VERIFY_TIMEOUT', 10))
+
+    # Live updates (/events): how often each process polls change_event, the
+    # keep-alive interval for idle streams, how long events are kept for
+    # reconnecting browsers, per-client backlog before a stalled client is
+    # dropped, the reconnect delay suggested to browsers, and how many ids
+    # below the newest are re-read for events that committed late. Pages
+    # stream /events only with EVENTS_STREAM on (each stream holds a thread
+    # unless served by asgi.py, which turns it on); otherwise they poll
+    # /events/recent every EVENTS_PAGE_POLL_SECONDS
+    EVENTS_STREAM = os.environ.get('EVENTS_STREAM', '0') == '1'
+    EVENTS_PAGE_POLL_SECONDS = float(os.environ.get('EVENTS_PAGE_POLL_SECONDS', 10))
+    EVENTS_REORDER_WINDOW = int(os.environ.get('EVENTS_REORDER_WINDOW', 200))
+    EVENTS_POLL_SECONDS = float(os.environ.get('EVENTS_POLL_SECONDS', 1))
+    EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15))
+    EVENTS_RETENTION_SECONDS = int(os.environ.get('EVENTS_RETENTION_SECONDS', 3600))
+    EVENTS_MAX_QUEUE = int(os.environ.get('EVENTS_MAX_QUEUE', 1000))
+    EVENTS_RETRY_MS = int(os.environ.get('EVENTS_RETRY_MS', 3000))
+
+    # Rendered site/report table rows and pages (see fragments.py): entries kept
+    # per process (0 turns the cache off), and an optional directory shared by
+    # all workers whose files are trusted for FRAGMENT_CACHE_DISK_TTL seconds
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 5000))
+    FRAGMENT_CACHE_DIR = os.environ.get('FRAGMENT_CACHE_DIR')
+    FRAGMENT_CACHE_DISK_TTL = int(os.environ.get('FRAGMENT_CACHE_DISK_TTL', 86400))
+
+    # Request instrumentation (see instrumentation.py): statements and requests
+    # at or above these durations are logged with a warning (0 disables), and
+    # /metrics serves per-endpoint counters and latency histograms in the
+    # Prometheus text format, behind a bearer token when METRICS_TOKEN is set
+    # and a login otherwise
+    SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', 0.25))
+    SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 1.0))
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    # Writes a cProfile dump of every request to PROFILE_DIR (defaults to
+    # instance/profiles), one request at a time. For diagnosis only: never
+    # leave it on in production
+    PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '0') == '1'
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')
+
+    # "flask reports archive" (see archive.py) moves reports issued more than
+    # ARCHIVE_AFTER_DAYS ago, and UP reports older than ARCHIVE_UP_AFTER_DAYS
+    # (0 disables), to the compressed problem_report_archive table, in
+    # transactions of ARCHIVE_BATCH_SIZE reports
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+    ARCHIVE_UP_AFTER_DAYS = int(os.environ.get('ARCHIVE_UP_AFTER_DAYS', 90))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 1000))
+
+    # Threads a2wsgi runs views and database work on under asgi.py; open
+    # /events streams do not hold one while they wait
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG')
+
+
+class ProductionConfig(Config):
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'WARNING')
+
+
+class TestingConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'  # fast hashes for test users
+
+
+# create_app() name -> class; FLASK_ENV picks one when no name is passed
+config = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+    'default': ProductionConfig,
+}
@@ -0,0 +1,302 @@
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from flask import Response, current_app, request
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+import aggregates  # imported first so its after_flush hook runs before ours
+from extensions import db
+from models import ProblemReport, SiteStatus, ChangeEvent
+
+logger = logging.getLogger(__name__)
+
+# Writers append to change_event inside their own transaction. Each process
+# runs one poller thread that reads new rows once per EVENTS_POLL_SECONDS and
+# hands them to that process's SSE clients, so the database sees one poll per
+# worker however many browsers are connected, and events reach clients of
+# every worker.
+#
+# Ids need not become visible in commit order: on Postgres a writer holding
+# a lower id can commit after one holding a higher id has been read. So
+# readers re-read a trailing window of EVENTS_REORDER_WINDOW ids below the
+# highest they have seen and skip the ids they already have. The browser
+# patches are idempotent, so a replayed event does no harm.
+#
+# A stream holds its connection for as long as the tab stays open. Under
+# asgi.py that costs no thread; under gunicorn's sync workers it would take
+# a whole worker per tab. So pages stream /events only when EVENTS_STREAM is
+# on (asgi.py turns it on) and otherwise poll /events/recent.
+
+_table = ChangeEvent.__table__
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def record(conn, kind, payloads):
+    if payloads:
+        now = datetime.utcnow()
+        conn.execute(insert(_table), [
+            {'created_at': now, 'kind': kind, 'payload': json.dumps(p, default=_json_default)} for p in payloads
+        ])
+
+
+def record_reports(conn, action, report_ids):
+    record(conn, 'report', [{'action': action, 'id': report_id} for report_id in sorted(report_ids)])
+
+
+def record_statuses(conn, site_ids):
+    # Current site_status rows for these sites; a site without reports goes back to no status
+    if not site_ids:
+        return
+    rows = {r.site_id: r for r in conn.execute(select(SiteStatus.__table__).where(SiteStatus.site_id.in_(site_ids)))}
+    record(conn, 'status', [
+        {'site_id': site_id, 'status': rows[site_id].status, 'since': rows[site_id].issue_date,
+         'ticket_id': rows[site_id].ticket_id} if site_id in rows else {'site_id': site_id, 'status': None}
+        for site_id in sorted(site_ids)
+    ])
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_flushed(session, flush_context):
+    # Runs after aggregates._refresh_flushed (registered first, on import), so
+    # site_status already reflects this flush
+    actions = {'created': set(), 'updated': set(), 'deleted': set()}
+    site_ids = set()
+    for obj in session.new | session.dirty | session.deleted:
+        if not isinstance(obj, ProblemReport):
+            continue
+        if obj in session.deleted:
+            action = 'deleted'
+        elif obj in session.new:
+            action = 'created'
+        elif session.is_modified(obj, include_collections=False):
+            action = 'updated'
+        else:
+            continue
+        actions[action].add(obj.id)
+        history = inspect(obj).attrs.site_id.history
+        site_ids.update(v for v in history.sum() if v is not None)
+    if not any(actions.values()):
+        return
+    conn = session.connection()
+    for action, ids in actions.items():
+        record_reports(conn, action, ids)
+    record_statuses(conn, site_ids)
+
+
+class Subscription(queue.Queue):
+    """One client's queue of (id, kind, payload) rows; None ends the stream."""
+
+    def end(self):
+        # Drop the backlog and wake the reader with the end marker
+        with self.mutex:
+            self.queue.clear()
+        self.put_nowait(None)
+
+
+class EventCursor:
+    """A reader's place in change_event: the highest id read and the ids
+    read in the window below it, where late commits can still appear."""
+
+    def __init__(self, last_id, window):
+        self.last_id = last_id
+        self.window = window
+        self.seen = set()
+
+    @classmethod
+    def at_end(cls, window):
+        # Starts after the newest event, counting the window below it as read
+        cursor = cls(db.session.execute(select(db.func.max(_table.c.id))).scalar() or 0, window)
+        cursor.seen.update(row[0] for row in events_after(cursor.floor))
+        return cursor
+
+    @property
+    def floor(self):
+        return max(self.last_id - self.window, 0)
+
+    def read(self, limit=1000):
+        # The rows not read before, by id
+        rows = events_after(self.floor, limit + self.window)
+        fresh = [row for row in rows if row[0] not in self.seen]
+        if rows:
+            self.last_id = max(self.last_id, rows[-1][0])
+        self.seen.update(row[0] for row in fresh)
+        floor = self.floor
+        self.seen = {i for i in self.seen if i > floor}
+        return fresh
+
+
+class Broadcaster:
+    """The per-process poller and its subscriber queues.
+
+    A subscriber is anything with put_nowait() (raising queue.Full when it is
+    behind) and end(), called from the poller thread; asgi.py subscribes
+    asyncio-backed ones.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self.cursor = None
+
+    def subscribe(self, app, q=None):
+        q = q if q is not None else Subscription(maxsize=app.config['EVENTS_MAX_QUEUE'])
+        with self._lock:
+            self._subscribers.add(q)
+            if self._thread is None or not self._thread.is_alive():
+                # Start from the newest event; anything older reaches a client
+                # only through its own Last-Event-ID backlog
+                self.cursor = EventCursor.at_end(app.config['EVENTS_REORDER_WINDOW'])
+                self._thread = threading.Thread(target=self._run, args=(app,), name='events-poller', daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def _publish(self, rows):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            for row in rows:
+                try:
+                    q.put_nowait(row)
+                except queue.Full:
+                    # A stalled client: end its stream so the browser reconnects
+                    # and catches up through Last-Event-ID
+                    self.unsubscribe(q)
+                    q.end()
+                    break
+
+    def _run(self, app):
+        with app.app_context():
+            interval = app.config['EVENTS_POLL_SECONDS']
+            retention = app.config['EVENTS_RETENTION_SECONDS']
+            next_cleanup = 0.0
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        db.session.remove()
+                        return
+                try:
+                    rows = self.cursor.read()
+                    if rows:
+                        self._publish(rows)
+                    if time.monotonic() >= next_cleanup:
+                        cutoff = datetime.utcnow() - timedelta(seconds=retention)
+                        db.session.execute(delete(_table).where(_table.c.created_at < cutoff))
+                        db.session.commit()
+                        next_cleanup = time.monotonic() + 300
+                except Exception:
+                    logger.exception('Change event poll failed')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+                time.sleep(interval)
+
+
+_broadcaster = Broadcaster()
+
+
+def events_after(last_id, limit=1000):
+    # [(id, kind, payload)] by id
+    return db.session.execute(
+        select(_table.c.id, _table.c.kind, _table.c.payload).where(_table.c.id > last_id)
+        .order_by(_table.c.id).limit(limit)
+    ).all()
+
+
+def sse_message(row):
+    event_id, kind, payload = row
+    return f'id: {event_id}\nevent: {kind}\ndata: {payload}\n\n'
+
+
+def sse_retry(app):
+    return f'retry: {int(app.config["EVENTS_RETRY_MS"])}\n\n'
+
+
+def open_stream(app, last_id, q=None):
+    """Subscribe a client, returning (queue, backlog since last_id).
+
+    Subscribes before reading the backlog so nothing falls between the two;
+    readers skip queued rows the backlog already sent. The backlog starts a
+    reorder window below last_id, for events that committed late.
+    """
+    q = _broadcaster.subscribe(app, q)
+    try:
+        window = app.config['EVENTS_REORDER_WINDOW']
+        backlog = events_after(max(last_id - window, 0)) if last_id is not None else []
+    except Exception:
+        _broadcaster.unsubscribe(q)
+        raise
+    return q, backlog
+
+
+def close_stream(q):
+    _broadcaster.unsubscribe(q)
+
+
+def recent_events(after):
+    """The /events/recent answer for pages that poll instead of streaming.
+
+    Without ``after`` it only gives the id to poll from. With it, the rows
+    from a reorder window below ``after`` on; the page skips ids it has.
+    """
+    window = current_app.config['EVENTS_REORDER_WINDOW']
+    if after is None:
+        cursor = EventCursor.at_end(window)
+        return {'last_id': cursor.last_id, 'seen': sorted(cursor.seen), 'events': []}
+    rows = events_after(max(after - window, 0))
+    return {
+        'last_id': max([after] + [row[0] for row in rows]),
+        'events': [{'id': event_id, 'kind': kind, 'data': json.loads(payload)} for event_id, kind, payload in rows],
+    }
+
+
+def event_stream_response():
+    """text/event-stream of change events for one browser.
+
+    A reconnecting browser sends Last-Event-ID and first gets what it
+    missed. Each open stream holds its thread, so this is only served with
+    EVENTS_STREAM on, for threaded or async gunicorn workers (gthread,
+    gevent); under asgi.py streams hold no thread at all.
+    """
+    app = current_app._get_current_object()
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    heartbeat = app.config['EVENTS_HEARTBEAT_SECONDS']
+    q, backlog = open_stream(app, last_id)
+
+    def generate():
+        try:
+            yield sse_retry(app)
+            replayed = {row[0] for row in backlog}
+            for row in backlog:
+                yield sse_message(row)
+            while True:
+                try:
+                    row = q.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if row is None:
+                    return
+                if row[0] not in replayed:
+                    yield sse_message(row)
+        finally:
+            close_stream(q)
+
+    db.session.remove()  # the stream outlives this request's session
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
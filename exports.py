@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+import tempfile
+from datetime import date, datetime
+
+from flask import Response, abort, current_app, stream_with_context
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Font
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from extensions import db
+from models import Site, IspLink, ProblemReport, ArchivedReport, ISP_PROVIDERS, format_capacity
+
+# One outer-joined alias of isp_link per provider, so a site stays one row
+_LINKS = {provider: aliased(IspLink, name=f'{provider}_link') for provider in ISP_PROVIDERS}
+
+# Same column layout the Excel exports have always had
+SITE_COLUMNS = [
+    ('Site Name', Site.site_location),
+    ('Device Name', Site.device_name),
+    ('SDWAN Site ID', Site.sdwan_site_id),
+    ('LAN IP', Site.lan_ip),
+    ('ATM Port', Site.atm_port),
+    ('EL ISP Info', _LINKS['el'].details),
+    ('EL Capacity', _LINKS['el'].capacity_mbps),
+    ('EL L2 IP', _LINKS['el'].l2_ip),
+    ('Ilevant ISP Info', _LINKS['ilevant'].details),
+    ('ILevant Capacity', _LINKS['ilevant'].capacity_mbps),
+    ('Horizon ISP Info', _LINKS['horizon'].details),
+    ('Horizon Capacity', _LINKS['horizon'].capacity_mbps),
+    ('Horizon L2 IP', _LINKS['horizon'].l2_ip),
+]
+
+REPORT_COLUMNS = [
+    ('Site Location', Site.site_location),
+    ('Ticket ID', ProblemReport.ticket_id),
+    ('Status', ProblemReport.status),
+    ('Reason', ProblemReport.reason),
+    ('Last Update', ProblemReport.last_update),
+    ('Issue Date', ProblemReport.issue_date),
+    ('Last Follow Up', ProblemReport.last_follow_up),
+]
+
+
+def site_export_query():
+    stmt = select(*(c for _, c in SITE_COLUMNS)).select_from(Site)
+    for provider, link in _LINKS.items():
+        stmt = stmt.outerjoin(link, (link.site_id == Site.id) & (link.provider == provider))
+    return stmt.order_by(Site.id)
+
+
+def report_export_query(model=ProblemReport, filters=None):
+    # REPORT_COLUMNS read from ProblemReport or ArchivedReport, narrowed by a ReportFilter
+    columns = [getattr(model, c.key) if c.class_ is ProblemReport else c for _, c in REPORT_COLUMNS]
+    stmt = select(*columns).select_from(model) \
+        .outerjoin(Site, model.site_id == Site.id).order_by(model.id)
+    return filters.apply(stmt, model) if filters else stmt
+
+
+def site_rows():
+    return _stream(site_export_query())
+
+
+def report_rows(filters=None):
+    return _stream(report_export_query(filters=filters))
+
+
+def report_history_rows(filters=None):
+    # The archive first: its reports are the older ones
+    if filters is None or filters.covers_archive:
+        yield from _stream(report_export_query(ArchivedReport, filters))
+    yield from _stream(report_export_query(filters=filters))
+
+
+def _stream(stmt):
+    # Plain column tuples fetched a batch at a time; no ORM objects are built
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    for row in result:
+        yield tuple(row)
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, float):
+        return format_capacity(value)
+    return str(value)
+
+
+# ===== WRITERS =====
+# Each writer takes the header names and a row iterator and yields bytes.
+
+def write_csv(headers, rows, flush_every=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for i, row in enumerate(rows, 1):
+        writer.writerow([_cell_text(v) for v in row])
+        if i % flush_every == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def write_ndjson(headers, rows, flush_every=500):
+    lines = []
+    for row in rows:
+        record = {h: (_cell_text(v) if isinstance(v, (date, datetime)) else v) for h, v in zip(headers, row)}
+        lines.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        if len(lines) >= flush_every:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _xlsx_value(value):
+    # Numbers and dates stay typed cells; text loses the control characters XML 1.0 forbids
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    return value
+
+
+def write_xlsx(headers, rows, sheet_name='Sheet1', chunk_size=64 * 1024):
+    # openpyxl's write-only mode spools the sheet to disk row by row, so memory
+    # stays flat; the finished workbook is then sent from a temporary file
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    header_cells = []
+    for name in headers:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    ws.append(header_cells)
+    for row in rows:
+        ws.append([_xlsx_value(v) for v in row])
+    with tempfile.TemporaryFile() as f:
+        wb.save(f)
+        f.seek(0)
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+FORMATS = {
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', write_xlsx),
+    'csv': ('text/csv', write_csv),
+    'ndjson': ('application/x-ndjson', write_ndjson),
+}
+
+EXPORTS = {
+    'sites': ('site_data', 'Sites', SITE_COLUMNS, site_rows),
+    'reports': ('daily_problem_reports', 'Daily Reports', REPORT_COLUMNS, report_rows),
+    'history': ('problem_report_history', 'Report History', REPORT_COLUMNS, report_history_rows),
+}
+
+
+def _counted(rows, progress, every=500):
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % every == 0:
+            progress(count)
+    progress(count)
+
+
+def generate_export(kind, fmt, progress=None, filters=None):
+    # progress, if given, is called with the number of rows written so far;
+    # filters (a ReportFilter) applies to the report kinds
+    filename, sheet_name, columns, rows = EXPORTS[kind]
+    headers = [name for name, _ in columns]
+    writer = FORMATS[fmt][1]
+    rows = rows(filters) if filters else rows()
+    if progress:
+        rows = _counted(rows, progress)
+    if fmt == 'xlsx':
+        return writer(headers, rows, sheet_name=sheet_name)
+    return writer(headers, rows)
+
+
+def export_response(kind, fmt, filters=None):
+    if fmt not in FORMATS:
+        abort(400, f'Unsupported export format: {fmt}')
+    filename = f'{EXPORTS[kind][0]}.{fmt}'
+    return Response(
+        stream_with_context(generate_export(kind, fmt, filters=filters)),
+        mimetype=FORMATS[fmt][0],
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
@@ -0,0 +1,123 @@
+import sys
+from datetime import date
+
+from flask import abort
+
+from models import ProblemReport
+
+# Filters shared by the report page, its exports and /api/v1/reports. Each
+# one maps onto an indexed column of problem_report (site_id, status,
+# issue_date, last_follow_up, ticket_id); the reason text match is applied
+# on top of the rows those narrow down.
+
+REPORT_STATUSES = ('UP', 'DOWN')
+
+
+def _date(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, f'{name} must be a YYYY-MM-DD date')
+
+
+def _prefix_upper(prefix):
+    # Smallest string above every string starting with prefix, or None when
+    # there is none (a prefix of nothing but U+10FFFF)
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        code = 0xE000  # surrogates cannot be encoded for the database
+    return prefix[:-1] + chr(code)
+
+
+class ReportFilter:
+    """One set of problem report filters, e.g.
+    ReportFilter(status='DOWN', since=date(2026, 1, 1), site_id=4).apply(query)."""
+
+    # Query string names, in the order the page shows them
+    ARGS = ('site_id', 'status', 'since', 'until', 'follow_up_since', 'follow_up_until', 'ticket', 'ticket_id',
+            'reason')
+
+    def __init__(self, site_id=None, status=None, since=None, until=None, follow_up_since=None,
+                 follow_up_until=None, ticket=None, ticket_id=None, reason=None):
+        self.site_id = site_id
+        self.status = status
+        self.since = since  # issue_date range, inclusive
+        self.until = until
+        self.follow_up_since = follow_up_since  # last_follow_up range, inclusive
+        self.follow_up_until = follow_up_until
+        self.ticket = ticket  # ticket_id prefix
+        self.ticket_id = ticket_id  # exact ticket_id
+        self.reason = reason  # case-insensitive text within reason
+
+    @classmethod
+    def from_args(cls, args):
+        # Answers 400 for malformed values, like the other query string parsers
+        status = args.get('status', '').upper() or None
+        if status and status not in REPORT_STATUSES:
+            abort(400, 'status must be UP or DOWN')
+        return cls(
+            site_id=args.get('site_id', type=int),
+            status=status,
+            since=_date(args, 'since'),
+            until=_date(args, 'until'),
+            follow_up_since=_date(args, 'follow_up_since'),
+            follow_up_until=_date(args, 'follow_up_until'),
+            ticket=args.get('ticket', '').strip() or None,
+            ticket_id=args.get('ticket_id') or None,
+            reason=args.get('reason', '').strip() or None,
+        )
+
+    def __bool__(self):
+        return any(getattr(self, name) is not None for name in self.ARGS)
+
+    def to_args(self):
+        # The query string that rebuilds this filter, for links and exports
+        args = {}
+        for name in self.ARGS:
+            value = getattr(self, name)
+            if value is not None:
+                args[name] = value.isoformat() if isinstance(value, date) else value
+        return args
+
+    @property
+    def covers_archive(self):
+        # Archived reasons are stored compressed, so a reason match only sees live reports
+        return self.reason is None
+
+    def criteria(self, model=ProblemReport):
+        """The WHERE clauses for ProblemReport or ArchivedReport."""
+        clauses = []
+        if self.site_id is not None:
+            clauses.append(model.site_id == self.site_id)
+        if self.status:
+            clauses.append(model.status == self.status)
+        if self.since:
+            clauses.append(model.issue_date >= self.since)
+        if self.until:
+            clauses.append(model.issue_date <= self.until)
+        if self.follow_up_since:
+            clauses.append(model.last_follow_up >= self.follow_up_since)
+        if self.follow_up_until:
+            clauses.append(model.last_follow_up <= self.follow_up_until)
+        if self.ticket:
+            # A range rather than LIKE, so ix_problem_report_ticket_id serves it
+            clauses.append(model.ticket_id >= self.ticket)
+            upper = _prefix_upper(self.ticket)
+            if upper is not None:
+                clauses.append(model.ticket_id < upper)
+        if self.ticket_id:
+            clauses.append(model.ticket_id == self.ticket_id)
+        if self.reason:
+            clauses.append(model.reason.icontains(self.reason, autoescape=True))
+        return clauses
+
+    def apply(self, query, model=ProblemReport):
+        # Works on ORM queries and select() statements alike
+        clauses = self.criteria(model)
+        return query.filter(*clauses) if clauses else query
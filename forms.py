@@ -1,6 +1,17 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, TextAreaField, SelectField, DateField
-from wtforms.validators import DataRequired, Length, IPAddress, Optional
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, PasswordField, SubmitField, TextAreaField, SelectField, DateField, BooleanField
+from wtforms.validators import DataRequired, Length, IPAddress, Optional, ValidationError
+from models import parse_capacity
+
+
+class Capacity:
+    # Bandwidth in Mbps, optionally with a unit: 100, 100 Mbps, 1 Gbps, 512 kbps
+    def __call__(self, form, field):
+        try:
+            parse_capacity (field.data)
+        except ValueError:
+            raise ValidationError ('Enter a bandwidth such as 100, 100 Mbps or 1 Gbps.')
 
 
 class SiteForm (FlaskForm):
@@ -10,21 +21,81 @@ class SiteForm (FlaskForm):
     lan_ip = StringField ('LAN IP', validators=[DataRequired (), IPAddress ()])
 
     el_isp_details = StringField ('EL ISP Details', validators=[Optional ()])
-    el_capacity = StringField ('Capacity', validators=[Optional ()])
+    el_capacity = StringField ('Capacity', validators=[Optional (), Capacity ()])
     el_l2_ip = StringField ('L2 IP', validators=[Optional (), IPAddress ()])
 
     ilevant_isp_details = StringField ('ILevant ISP Details', validators=[Optional ()])
-    ilevant_capacity = StringField ('Capacity', validators=[Optional ()])
+    ilevant_capacity = StringField ('Capacity', validators=[Optional (), Capacity ()])
 
     atm_port = StringField ('ATM Port', validators=[Optional ()])
 
     horizon_isp_details = StringField ('Horizon ISP Details', validators=[Optional ()])
-    horizon_capacity = StringField ('Capacity', validators=[Optional ()])
+    horizon_capacity = StringField ('Capacity', validators=[Optional (), Capacity ()])
     horizon_l2_ip = StringField ('L2 IP', validators=[Optional (), IPAddress ()])
 
     submit = SubmitField ('Add Site')
 
 
+class SiteImportForm (FlaskForm):
+    file = FileField ('Sites File (.xlsx or .csv)', validators=[FileRequired (), FileAllowed (['xlsx', 'csv'], 'Upload an .xlsx or .csv file')])
+    upsert = BooleanField ('Update existing sites with the same SDWAN Site ID')
+    submit = SubmitField ('Import Sites')
+
+
+class BulkSiteForm (FlaskForm):
+    # Site columns a bulk "set field" can change, with SiteForm's labels
+    FIELDS = [
+        ('site_location', 'Site Location Name'), ('device_name', 'Device Name'),
+        ('sdwan_site_id', 'SDWAN Site ID'), ('lan_ip', 'LAN IP'), ('atm_port', 'ATM Port'),
+        ('el_isp_info_details', 'EL ISP Details'), ('el_isp_capacity', 'EL Capacity'), ('el_isp_l2_ip', 'EL L2 IP'),
+        ('ilevant_isp_info_details', 'ILevant ISP Details'), ('ilevant_isp_capacity', 'ILevant Capacity'),
+        ('horizon_isp_info_details', 'Horizon ISP Details'), ('horizon_isp_capacity', 'Horizon Capacity'),
+        ('horizon_isp_l2_ip', 'Horizon L2 IP'),
+    ]
+    REQUIRED = ('site_location', 'device_name', 'sdwan_site_id', 'lan_ip')
+    IP_FIELDS = ('lan_ip', 'el_isp_l2_ip', 'horizon_isp_l2_ip')
+    CAPACITY_FIELDS = ('el_isp_capacity', 'ilevant_isp_capacity', 'horizon_isp_capacity')
+
+    action = SelectField ('Action', choices=[('update', 'Set field'), ('clone', 'Clone'), ('delete', 'Delete')], validators=[DataRequired ()])
+    # Checked by validate_field, and only for the action that uses it
+    field = SelectField ('Field', choices=FIELDS, validate_choice=False)
+    value = StringField ('Value', validators=[Optional ()])
+    submit = SubmitField ('Apply')
+
+    def validate_field(self, field):
+        # Only the columns listed above ever reach bulk.update_sites
+        if self.action.data != 'update':
+            return
+        if not field.data:
+            raise ValidationError ('Choose a field to set.')
+        if field.data not in dict (self.FIELDS):
+            raise ValidationError ('This field cannot be set in bulk.')
+
+    def validate_value(self, field):
+        if self.action.data != 'update' or self.field.errors:
+            return
+        if not field.data and self.field.data in self.REQUIRED:
+            raise ValidationError ('This field cannot be blank.')
+        if field.data and self.field.data in self.IP_FIELDS:
+            IPAddress () (self, field)
+        if field.data and self.field.data in self.CAPACITY_FIELDS:
+            Capacity () (self, field)
+
+
+class BulkReportForm (FlaskForm):
+    action = SelectField ('Action', choices=[('status', 'Set status'), ('clone', 'Clone'), ('delete', 'Delete')], validators=[DataRequired ()])
+    status = SelectField ('Status', choices=[('UP', 'UP'), ('DOWN', 'DOWN')], validate_choice=False)
+    submit = SubmitField ('Apply')
+
+    def validate_status(self, field):
+        if self.action.data != 'status':
+            return
+        if not field.data:
+            raise ValidationError ('Choose a status.')
+        if field.data not in ('UP', 'DOWN'):
+            raise ValidationError ('Not a valid choice.')
+
+
 class ProblemReportForm (FlaskForm):
     site_location = SelectField ('Site Location', coerce=int, validators=[DataRequired ()])
     ticket_id = StringField ('Ticket ID', validators=[DataRequired ()])
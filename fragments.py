@@ -0,0 +1,198 @@
+import hashlib
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import lru_cache
+
+import click
+from flask import current_app, request
+from flask.cli import AppGroup
+from flask_login import current_user
+from markupsafe import Markup
+
+from models import Site, ProblemReport, ArchivedReport
+from versioning import current_versions, on_change
+
+# Rendered HTML for the site and report tables, cached at two levels:
+#
+# - row: one <tr>, keyed by the row's id and row_version (plus whatever else
+#   it shows, such as the site's current status), so a write re-renders only
+#   the rows it touched;
+# - page: the whole rows fragment of a listing page, keyed by its query string
+#   and the data version counters it depends on, so an unchanged page costs
+#   one version lookup.
+#
+# Both keys carry the user's group, since the checkbox and Actions columns
+# depend on it, and a digest of the templates. Entries live in a
+# per-process LRU of FRAGMENT_CACHE_SIZE entries and, when FRAGMENT_CACHE_DIR
+# is set, in files shared by every worker.
+
+fragments_cli = AppGroup('fragments', help='Rendered fragment cache.')
+
+
+def _site_key(site):
+    latest = site.latest
+    return site.id, site.row_version, latest and (latest.status, latest.issue_date, latest.ticket_id)
+
+
+def _report_key(report):
+    # The row also shows the site's name; archived rows drop the actions
+    return report.id, report.archived, report.row_version, report.site.row_version
+
+
+ROW_KEYS = {
+    Site: _site_key,
+    ProblemReport: _report_key,
+    ArchivedReport: _report_key,
+}
+
+
+class FragmentCache:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (html, data version names it depends on)
+        self.stats = Counter()
+
+    def _path(self, key):
+        directory = current_app.config['FRAGMENT_CACHE_DIR']
+        if directory:
+            return os.path.join(directory, hashlib.sha1(repr(key).encode()).hexdigest() + '.html')
+
+    def get(self, kind, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats[kind + '_hits'] += 1
+                return entry[0]
+        path = self._path(key)
+        if path:
+            try:
+                if time.time() - os.path.getmtime(path) < current_app.config['FRAGMENT_CACHE_DISK_TTL']:
+                    with open(path, encoding='utf-8') as f:
+                        html = f.read()
+                    self._remember(key, html, ())
+                    with self._lock:
+                        self.stats[kind + '_disk_hits'] += 1
+                    return html
+            except OSError:
+                pass
+        with self._lock:
+            self.stats[kind + '_misses'] += 1
+        return None
+
+    def put(self, kind, key, html, names=()):
+        self._remember(key, html, names)
+        path = self._path(key)
+        if path:
+            tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(html)
+                os.replace(tmp, path)
+            except OSError:
+                current_app.logger.warning('Could not write fragment cache file %s', path, exc_info=True)
+
+    def _remember(self, key, html, names):
+        with self._lock:
+            self._entries[key] = (html, frozenset(names))
+            self._entries.move_to_end(key)
+            while len(self._entries) > current_app.config['FRAGMENT_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, names):
+        # Pages built from these counters can no longer be hit; free them now
+        with self._lock:
+            stale = [key for key, (_, deps) in self._entries.items() if deps & names]
+            for key in stale:
+                del self._entries[key]
+            self.stats['invalidations'] += len(stale)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries))
+
+
+_cache = FragmentCache()
+
+
+@lru_cache(maxsize=1)
+def _templates_digest():
+    # Keys change with any template, so a deploy never serves old markup from disk
+    env = current_app.jinja_env
+    digest = hashlib.sha1()
+    for name in env.list_templates():
+        digest.update(name.encode() + env.loader.get_source(env, name)[0].encode())
+    return digest.hexdigest()[:12]
+
+
+def _enabled():
+    return current_app.config['FRAGMENT_CACHE_SIZE'] > 0
+
+
+def render_row(template, **context):
+    """Render one table row template for one object, e.g.
+    {{ render_row('_site_row.html', site=site) }}."""
+    (obj,) = context.values()
+    jinja_template = current_app.jinja_env.get_template(template)
+    if not _enabled():
+        return Markup(jinja_template.render(current_user=current_user, **context))
+    key = ('row', template, _templates_digest(), current_user.group, ROW_KEYS[type(obj)](obj))
+    html = _cache.get('row', key)
+    if html is None:
+        html = jinja_template.render(current_user=current_user, **context)
+        _cache.put('row', key, html)
+    return Markup(html)
+
+
+def cached_page(template, names, render):
+    """The rows fragment of a listing page, or render() if it is not cached.
+
+    render() runs the page query and returns the rendered template; it is
+    skipped on a hit, so an unchanged page needs no query beyond the version
+    lookup.
+    """
+    if not _enabled():
+        return Markup(render())
+    args = tuple(sorted((k, v) for k, v in request.args.items(multi=True) if k != 'fragment'))
+    key = ('page', request.endpoint, template, _templates_digest(), current_user.group, args,
+           current_versions(*names))
+    html = _cache.get('page', key)
+    if html is None:
+        html = render()
+        _cache.put('page', key, html, names)
+    return Markup(html)
+
+
+def stats():
+    return _cache.snapshot()
+
+
+@on_change
+def _invalidate_pages(names):
+    _cache.invalidate(names)
+
+
+@fragments_cli.command('clear')
+@click.option('--older-than', type=int, default=0, help='Only remove files not written for this many seconds.')
+def clear_command(older_than):
+    """Remove cached fragment files from FRAGMENT_CACHE_DIR."""
+    directory = current_app.config['FRAGMENT_CACHE_DIR']
+    if not directory or not os.path.isdir(directory):
+        click.echo('No fragment cache directory configured.')
+        return
+    removed = 0
+    cutoff = time.time() - older_than
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if name.endswith('.html') and os.path.getmtime(path) <= cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    click.echo(f'{removed} fragment file(s) removed.')
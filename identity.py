@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, session
+from flask_login import UserMixin
+from sqlalchemy import select
+
+from extensions import db
+from models import User
+from versioning import current_versions, on_change
+
+# Session key holding the signed identity claim in IDENTITY_MODE = 'session'
+SESSION_KEY = '_identity'
+
+
+class Identity(UserMixin):
+    """What the request needs to know about the logged-in user.
+
+    Stands in for the User row as current_user, so authenticated requests
+    (and roles_required) do not have to load it from the database.
+    """
+
+    def __init__(self, id, username, group):
+        self.id = id
+        self.username = username
+        self.group = group
+
+    def __repr__(self):
+        return f'<Identity {self.id} {self.username!r} {self.group!r}>'
+
+
+class IdentityCache:
+    # LRU of user id -> (Identity, loaded at), entries expire after ttl seconds
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self._checked = 0.0
+
+    def clear(self):
+        # Also forgets the version, so session claims are re-checked right away
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def version(self):
+        # The shared 'user' counter, re-read at most every USER_VERSION_CHECK_SECONDS;
+        # a change made by another worker clears this process's entries
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._checked < current_app.config['USER_VERSION_CHECK_SECONDS']:
+                return self._version
+        version = current_versions('user')[0]
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+            self._version, self._checked = version, now
+        return version
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[1] < current_app.config['USER_CACHE_TTL']:
+                self._entries.move_to_end(user_id)
+                return entry[0]
+
+        row = db.session.execute(select(User.id, User.username, User.group).where(User.id == user_id)).first()
+        identity = Identity(*row) if row else None
+        with self._lock:
+            if identity is None:
+                self._entries.pop(user_id, None)
+                return None
+            self._entries[user_id] = (identity, now)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > current_app.config['USER_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+        return identity
+
+
+_cache = IdentityCache()
+
+
+def remember_identity(user):
+    # Called at login: in session mode the signed cookie carries the group
+    # claim, stamped with the user version it was issued under
+    if current_app.config['IDENTITY_MODE'] == 'session':
+        session[SESSION_KEY] = {'id': user.id, 'username': user.username, 'group': user.group,
+                                'v': _cache.version()}
+
+
+def forget_identity():
+    session.pop(SESSION_KEY, None)
+
+
+def load_identity(user_id):
+    """flask_login user_loader.
+
+    IDENTITY_MODE 'db' loads the User row on every request as before;
+    'cache' serves it from the process-local identity cache; 'session'
+    trusts the signed claim while the user version it carries is current,
+    and falls back to the cache (re-issuing the claim) once it is not.
+    """
+    user_id = int(user_id)
+    mode = current_app.config['IDENTITY_MODE']
+    if mode == 'db':
+        return db.session.get(User, user_id)
+
+    version = _cache.version()
+    if mode == 'session':
+        claim = session.get(SESSION_KEY)
+        if claim and claim.get('id') == user_id and claim.get('v') == version:
+            return Identity(claim['id'], claim['username'], claim['group'])
+
+    identity = _cache.get(user_id)
+    if mode == 'session':
+        if identity is None:
+            forget_identity()
+        else:
+            session[SESSION_KEY] = {'id': identity.id, 'username': identity.username,
+                                    'group': identity.group, 'v': version}
+    return identity
+
+
+@on_change
+def _invalidate_identities(names):
+    if 'user' in names:
+        _cache.clear()
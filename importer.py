@@ -0,0 +1,245 @@
+import csv
+import io
+import os
+import zipfile
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+
+from extensions import db
+from forms import SiteForm
+from models import Site, IspLink, split_isp_fields
+from versioning import bump_version
+
+# Export header -> SiteForm field -> Site attribute; the inverse of the export_sites layout
+IMPORT_COLUMNS = [
+    ('Site Name', 'site_location', 'site_location'),
+    ('Device Name', 'device_name', 'device_name'),
+    ('SDWAN Site ID', 'sdwan_site_id', 'sdwan_site_id'),
+    ('LAN IP', 'lan_ip', 'lan_ip'),
+    ('ATM Port', 'atm_port', 'atm_port'),
+    ('EL ISP Info', 'el_isp_details', 'el_isp_info_details'),
+    ('EL Capacity', 'el_capacity', 'el_isp_capacity'),
+    ('EL L2 IP', 'el_l2_ip', 'el_isp_l2_ip'),
+    ('Ilevant ISP Info', 'ilevant_isp_details', 'ilevant_isp_info_details'),
+    ('ILevant Capacity', 'ilevant_capacity', 'ilevant_isp_capacity'),
+    ('Horizon ISP Info', 'horizon_isp_details', 'horizon_isp_info_details'),
+    ('Horizon Capacity', 'horizon_capacity', 'horizon_isp_capacity'),
+    ('Horizon L2 IP', 'horizon_l2_ip', 'horizon_isp_l2_ip'),
+]
+
+REQUIRED_FIELDS = ('site_location', 'device_name', 'sdwan_site_id', 'lan_ip')
+
+_HEADER_FIELDS = {header.lower(): field for header, field, _ in IMPORT_COLUMNS}
+_FIELD_COLUMNS = {field: column for _, field, column in IMPORT_COLUMNS}
+
+sites_cli = AppGroup('sites', help='Site inventory maintenance.')
+
+
+class SiteImportError(Exception):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []  # (row number, message)
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _csv_error(reader, error):
+    if isinstance(error, UnicodeDecodeError):
+        return SiteImportError(f'The file is not UTF-8 text after line {reader.line_num}; '
+                               'save it as "CSV UTF-8" and import it again.')
+    return SiteImportError(f'The file is not a readable CSV after line {reader.line_num}: {error}')
+
+
+def _csv_rows(reader):
+    # Decoding happens as the rows are read, so a bad byte can turn up mid-import
+    try:
+        yield from reader
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise _csv_error(reader, e)
+
+
+def read_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    try:
+        header = next(reader, None)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise _csv_error(reader, e)
+    if header is None:
+        return [], iter(())
+    return header, _csv_rows(reader)
+
+
+def read_xlsx(stream):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise SiteImportError('Reading .xlsx files needs openpyxl installed; upload a CSV instead.')
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        # KeyError: a zip file without the workbook parts
+        raise SiteImportError('The file is not a readable .xlsx workbook; save it from Excel as .xlsx or upload a CSV.')
+    rows = workbook.worksheets[0].iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return [], iter(())
+    return list(header), rows
+
+
+READERS = {'.csv': read_csv, '.xlsx': read_xlsx}
+
+
+def _records(header, rows):
+    # Yields (row number as seen in a spreadsheet, {form field: value})
+    fields = [_HEADER_FIELDS.get(_cell(h).lower()) for h in header]
+    missing = [h for h, f, _ in IMPORT_COLUMNS if f in REQUIRED_FIELDS and f not in fields]
+    if missing:
+        raise SiteImportError('Missing required column(s): ' + ', '.join(missing))
+    for number, row in enumerate(rows, 2):
+        values = {f: _cell(v) for f, v in zip(fields, row) if f}
+        if any(values.values()):
+            yield number, values
+
+
+def _validate(values):
+    # Same rules as the Submit Site page, including the IPAddress checks
+    form = SiteForm(formdata=MultiDict(values), meta={'csrf': False})
+    if not form.validate():
+        return None, '; '.join(f'{form[f].label.text}: {", ".join(e)}' for f, e in form.errors.items())
+    return {column: (form[field].data or None) for field, column in _FIELD_COLUMNS.items()}, None
+
+
+def _write_links(site_ids, link_rows):
+    rows = [dict(link, site_id=site_id) for site_id, links in zip(site_ids, link_rows) for link in links]
+    if rows:
+        db.session.execute(insert(IspLink), rows)
+
+
+def _write_batch(batch, upsert, result):
+    inserts, updates = [], []
+    existing = {}
+    if upsert:
+        ids = {row['sdwan_site_id'] for _, row in batch}
+        existing = dict(db.session.execute(
+            select(Site.sdwan_site_id, Site.id).where(Site.sdwan_site_id.in_(ids))
+        ).all())
+
+    # Repeated within the file: the later row wins
+    pending, updating = {}, {}
+    for number, row in batch:
+        site_id = existing.get(row['sdwan_site_id'])
+        if site_id is not None and site_id in updating:
+            updating[site_id].update(row)
+        elif site_id is not None:
+            updating[site_id] = dict(row, id=site_id)
+            updates.append(updating[site_id])
+        elif upsert and row['sdwan_site_id'] in pending:
+            pending[row['sdwan_site_id']].update(row)
+        else:
+            inserts.append(row)
+            if upsert:
+                pending[row['sdwan_site_id']] = row
+
+    try:
+        if inserts:
+            sites, links = zip(*(split_isp_fields(row) for row in inserts))
+            site_ids = db.session.scalars(
+                insert(Site).returning(Site.id, sort_by_parameter_order=True), list(sites)
+            ).all()
+            _write_links(site_ids, links)
+        if updates:
+            # A row's ISP columns replace all of the site's links
+            sites, links = zip(*(split_isp_fields(row) for row in updates))
+            site_ids = [row['id'] for row in updates]
+            db.session.execute(update(Site), list(sites))
+            db.session.execute(
+                update(Site).where(Site.id.in_(site_ids)).values(row_version=Site.row_version + 1),
+                execution_options={'synchronize_session': False},
+            )
+            db.session.execute(delete(IspLink).where(IspLink.site_id.in_(site_ids)))
+            _write_links(site_ids, links)
+        bump_version('site')
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        if len(batch) > 1:
+            # Write the batch again a row at a time, so only the rows the
+            # database rejects are reported
+            for item in batch:
+                _write_batch([item], upsert, result)
+            return
+        message = str(getattr(e, 'orig', e))
+        result.errors.extend((number, f'Not saved: {message}') for number, _ in batch)
+        return
+    result.inserted += len(inserts)
+    result.updated += len(updates)
+
+
+def import_sites(stream, filename, upsert=False, batch_size=None):
+    """Validate and insert sites from an exported-layout .xlsx or .csv file.
+
+    Rows are written in batched executemany statements, one transaction per
+    batch. A row that fails validation is reported and skipped; a batch the
+    database rejects is rolled back and written again row by row, so only
+    the rows it rejects are reported. A CSV that turns out not to be UTF-8
+    part way through raises SiteImportError, keeping the batches already
+    written.
+    """
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext not in READERS:
+        raise SiteImportError('Unsupported file type; use .xlsx or .csv')
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+
+    result = ImportResult()
+    header, rows = READERS[ext](stream)
+    batch = []
+    for number, values in _records(header, rows):
+        row, error = _validate(values)
+        if error:
+            result.errors.append((number, error))
+            continue
+        batch.append((number, row))
+        if len(batch) >= batch_size:
+            _write_batch(batch, upsert, result)
+            batch = []
+    if batch:
+        _write_batch(batch, upsert, result)
+    return result
+
+
+@sites_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--upsert', is_flag=True, help='Update sites whose SDWAN Site ID already exists.')
+@click.option('--batch-size', type=int, default=None, help='Rows per transaction.')
+def import_command(path, upsert, batch_size):
+    """Import sites from an .xlsx or .csv file in the export layout."""
+    with open(path, 'rb') as f:
+        try:
+            result = import_sites(f, path, upsert=upsert, batch_size=batch_size)
+        except SiteImportError as e:
+            raise click.ClickException(str(e))
+    for number, message in result.errors:
+        click.echo(f'Row {number}: {message}', err=True)
+    click.echo(f'{result.inserted} inserted, {result.updated} updated, {result.failed} failed.')
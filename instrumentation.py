@@ -0,0 +1,264 @@
+import cProfile
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import (
+    Response, abort, current_app, g, has_app_context, has_request_context, request,
+    before_render_template, template_rendered,
+)
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Record every SQL statement sent to ``engine`` inside the block.
+
+    Used to check that a page issues a fixed number of statements however
+    many rows it shows::
+
+        with count_queries() as queries:
+            client.get('/daily_problem_report')
+        assert queries.count <= 4
+    """
+    engine = engine or db.engine
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+
+# ===== REQUEST INSTRUMENTATION =====
+# Every request records its wall time, the number and total time of its SQL
+# statements and the time spent rendering templates. The totals go out in a
+# Server-Timing header (visible in the browser's network panel), feed the
+# per-endpoint metrics served at /metrics, and are logged for requests slower
+# than SLOW_REQUEST_SECONDS. Statements slower than SLOW_QUERY_SECONDS are
+# logged on their own, inside or outside a request.
+
+
+class Metrics:
+    """Per-process request counters and latency histograms, by endpoint.
+
+    Each gunicorn worker keeps its own; series carry the worker's pid so
+    Prometheus can sum them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.buckets = ()
+        self.requests = defaultdict(int)  # (endpoint, method, status) -> count
+        self.latency = {}  # endpoint -> [bucket counts..., +Inf count, sum]
+        self.sql_statements = defaultdict(int)
+        self.sql_seconds = defaultdict(float)
+        self.template_seconds = defaultdict(float)
+
+    def observe(self, endpoint, method, status, elapsed, stats):
+        with self._lock:
+            self.requests[endpoint, method, status] += 1
+            counts = self.latency.get(endpoint)
+            if counts is None:
+                counts = self.latency[endpoint] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect_left(self.buckets, elapsed)] += 1
+            counts[-1] += elapsed
+            self.sql_statements[endpoint] += stats.sql_count
+            self.sql_seconds[endpoint] += stats.sql_time
+            self.template_seconds[endpoint] += stats.template_time
+
+    def render(self):
+        pid = os.getpid()
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            family('nbi_requests_total', 'counter', 'HTTP requests handled.')
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'nbi_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}",pid="{pid}"}} {count}')
+
+            family('nbi_request_duration_seconds', 'histogram', 'Request latency.')
+            for endpoint, counts in sorted(self.latency.items()):
+                labels = f'endpoint="{endpoint}",pid="{pid}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f'nbi_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                cumulative += counts[len(self.buckets)]
+                lines.append(f'nbi_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+                lines.append(f'nbi_request_duration_seconds_sum{{{labels}}} {counts[-1]:.6f}')
+                lines.append(f'nbi_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+            for name, help_text, values in (
+                ('nbi_sql_statements_total', 'SQL statements executed by requests.', self.sql_statements),
+                ('nbi_sql_seconds_total', 'Time requests spent in SQL statements.', self.sql_seconds),
+                ('nbi_template_seconds_total', 'Time requests spent rendering templates.', self.template_seconds),
+            ):
+                family(name, 'counter', help_text)
+                for endpoint, value in sorted(values.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}",pid="{pid}"}} {value:g}')
+
+        from fragments import stats as fragment_stats
+        family('nbi_fragment_cache_total', 'counter', 'Rendered fragment cache lookups and evictions.')
+        for name, value in sorted(fragment_stats().items()):
+            if name != 'entries':
+                lines.append(f'nbi_fragment_cache_total{{event="{name}",pid="{pid}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+_metrics = Metrics()
+
+# Only one request is profiled at a time; the others run unprofiled
+_profile_lock = threading.Lock()
+
+
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.template_start = 0.0
+        self.profiler = None
+
+
+def _request_stats():
+    return g.get('_instrumentation') if has_request_context() else None
+
+
+# The start time lives on the statement's execution context, which is
+# discarded with it, so a statement that fails leaves nothing behind
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    stats = _request_stats()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_time += elapsed
+    threshold = current_app.config['SLOW_QUERY_SECONDS'] if has_app_context() else 0
+    if threshold and elapsed >= threshold:
+        where = request.endpoint if has_request_context() else 'no request'
+        logger.warning('Slow query (%.3fs, %s): %s', elapsed, where, ' '.join(statement.split())[:1000])
+
+
+def _template_started(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is not None:
+        # Nested renders (a template rendered from a view helper) count once
+        if stats.template_depth == 0:
+            stats.template_start = time.perf_counter()
+        stats.template_depth += 1
+
+
+def _template_finished(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is not None and stats.template_depth:
+        stats.template_depth -= 1
+        if stats.template_depth == 0:
+            stats.template_time += time.perf_counter() - stats.template_start
+
+
+def _start_request():
+    stats = g._instrumentation = RequestStats()
+    if current_app.config['PROFILE_REQUESTS'] and _profile_lock.acquire(blocking=False):
+        stats.profiler = cProfile.Profile()
+        stats.profiler.enable()
+
+
+def _dump_profile(stats):
+    stats.profiler.disable()
+    _profile_lock.release()
+    directory = current_app.config['PROFILE_DIR'] or os.path.join(current_app.instance_path, 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    name = f'{request.endpoint or "unmatched"}-{datetime.utcnow():%Y%m%dT%H%M%S%f}.prof'
+    stats.profiler.dump_stats(os.path.join(directory, name))
+
+
+def _finish_request(response):
+    stats = g.pop('_instrumentation', None)
+    if stats is None:
+        return response
+    if stats.profiler is not None:
+        _dump_profile(stats)
+    elapsed = time.perf_counter() - stats.start
+    endpoint = request.endpoint or 'unmatched'
+    if endpoint != 'metrics':
+        _metrics.observe(endpoint, request.method, response.status_code, elapsed, stats)
+    response.headers['Server-Timing'] = (
+        f'app;dur={elapsed * 1000:.1f}, '
+        f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries", '
+        f'tpl;dur={stats.template_time * 1000:.1f}'
+    )
+    threshold = current_app.config['SLOW_REQUEST_SECONDS']
+    if threshold and elapsed >= threshold:
+        logger.warning('Slow request %s %s: %.3fs, %d queries in %.3fs, templates %.3fs', request.method,
+                       request.full_path.rstrip('?'), elapsed, stats.sql_count, stats.sql_time, stats.template_time)
+    return response
+
+
+def _abandon_request(exc):
+    # after_request does not run for unhandled errors; count them as 500s
+    stats = g.pop('_instrumentation', None)
+    if stats is None:
+        return
+    if stats.profiler is not None:
+        _dump_profile(stats)
+    _metrics.observe(request.endpoint or 'unmatched', request.method, 500, time.perf_counter() - stats.start, stats)
+
+
+def metrics_view():
+    # A bearer token for scrapers when METRICS_TOKEN is set, a login otherwise
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+    elif not current_user.is_authenticated:
+        return current_app.login_manager.unauthorized()
+    return Response(_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    _metrics.buckets = tuple(sorted(app.config['METRICS_BUCKETS']))
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_abandon_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    if app.config['METRICS_ENABLED']:
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,31 @@
+from sqlalchemy import func, select
+
+from extensions import db
+from models import Site, IspLink, ISP_PROVIDERS
+
+# Both queries read only isp_link columns covered by
+# ix_isp_link_provider_capacity_mbps / ix_isp_link_capacity_mbps
+
+
+def bandwidth_by_provider():
+    # [(provider display name, links, links with a known capacity, total Mbps)]
+    rows = db.session.execute(
+        select(IspLink.provider, func.count(IspLink.id), func.count(IspLink.capacity_mbps),
+               func.coalesce(func.sum(IspLink.capacity_mbps), 0))
+        .group_by(IspLink.provider)
+    ).all()
+    totals = {provider: (links, known, total) for provider, links, known, total in rows}
+    return [(name,) + totals.get(provider, (0, 0, 0)) for provider, name in ISP_PROVIDERS.items()]
+
+
+def sites_below(mbps, provider=None):
+    """Sites with a link under ``mbps``, slowest first.
+
+    Returns (Site, IspLink) pairs; a site with several slow links appears
+    once per link. Links with an unknown capacity are not included.
+    """
+    stmt = select(Site, IspLink).join(IspLink, IspLink.site_id == Site.id) \
+        .where(IspLink.capacity_mbps < mbps)
+    if provider:
+        stmt = stmt.where(IspLink.provider == provider)
+    return db.session.execute(stmt.order_by(IspLink.capacity_mbps, Site.site_location, Site.id)).all()
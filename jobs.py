@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, jsonify, request, send_file, url_for, abort
+
+from extensions import db
+from exports import EXPORTS, FORMATS, export_response, generate_export
+from models import Site, ProblemReport, ArchivedReport
+from versioning import version_stamp
+
+logger = logging.getLogger(__name__)
+
+# Which data version counters an export depends on, and what to count for progress
+EXPORT_SOURCES = {
+    'sites': (('site',), (Site,)),
+    'reports': (('problem_report', 'site'), (ProblemReport,)),
+    'history': (('problem_report', 'problem_report_archive', 'site'), (ArchivedReport, ProblemReport)),
+}
+
+# Job ids double as artifact file names, e.g. "reports-41-12.xlsx"
+JOB_ID = re.compile(r'^[a-z]+-[0-9-]+\.[a-z]+$')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['EXPORT_WORKERS'], thread_name_prefix='export'
+            )
+        return _executor
+
+
+def _artifact_dir():
+    path = current_app.config['EXPORT_CACHE_DIR'] or os.path.join(current_app.instance_path, 'exports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _paths(job_id):
+    base = os.path.join(_artifact_dir(), job_id)
+    return base, base + '.json'
+
+
+def _temp_file(path):
+    # A fresh file next to path, so concurrent writers never share one
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+    return os.fdopen(fd, 'wb'), tmp
+
+
+def job_id_for(kind, fmt):
+    # Keyed by the data version stamp, so any write to the source tables
+    # gives the next export a new id and the old artifact is never served
+    names = EXPORT_SOURCES[kind][0]
+    return f'{kind}-{version_stamp(*names)}.{fmt}'
+
+
+def _write_status(path, **status):
+    status['updated'] = time.time()
+    f, tmp = _temp_file(path)
+    with f:
+        f.write(json.dumps(status).encode())
+    os.replace(tmp, path)
+
+
+def _read_status(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_stale_artifacts(kind, fmt, keep):
+    # Drop finished artifacts built from older data; running jobs are left alone
+    directory = _artifact_dir()
+    for name in os.listdir(directory):
+        if name != keep and name.startswith(kind + '-') and name.endswith('.' + fmt):
+            for path in (os.path.join(directory, name), os.path.join(directory, name + '.json')):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _run_export(app, job_id, kind, fmt):
+    with app.app_context():
+        final, status_path = _paths(job_id)
+        part = None
+        try:
+            total = sum(db.session.query(db.func.count(model.id)).scalar() for model in EXPORT_SOURCES[kind][1])
+            _write_status(status_path, state='running', rows=0, total=total)
+
+            def progress(rows):
+                _write_status(status_path, state='running', rows=rows, total=total)
+
+            f, part = _temp_file(final)
+            with f:
+                for chunk in generate_export(kind, fmt, progress=progress):
+                    f.write(chunk)
+            os.replace(part, final)
+            _write_status(status_path, state='done', rows=total, total=total)
+            _remove_stale_artifacts(kind, fmt, keep=job_id)
+        except Exception as e:
+            logger.exception('Export job %s failed', job_id)
+            _write_status(status_path, state='failed', error=str(e))
+            if part and os.path.exists(part):
+                os.remove(part)
+        finally:
+            db.session.remove()
+
+
+def start_export(kind, fmt):
+    """Queue an export unless it is already built or being built.
+
+    State lives next to the artifact on disk rather than in this process,
+    so any gunicorn worker can answer the polling requests.
+    """
+    job_id = job_id_for(kind, fmt)
+    final, status_path = _paths(job_id)
+    if os.path.exists(final):
+        return job_id
+
+    # A queued job is as good as a running one; either is only given up on
+    # once its status has not moved for EXPORT_JOB_STALE_SECONDS
+    status = _read_status(status_path)
+    stale_after = current_app.config['EXPORT_JOB_STALE_SECONDS']
+    if status and status['state'] in ('queued', 'running') and time.time() - status['updated'] < stale_after:
+        return job_id
+
+    _write_status(status_path, state='queued', rows=0, total=None)
+    app = current_app._get_current_object()
+    _get_executor().submit(_run_export, app, job_id, kind, fmt)
+    return job_id
+
+
+def job_status(job_id):
+    if not JOB_ID.match(job_id):
+        return None
+    final, status_path = _paths(job_id)
+    status = _read_status(status_path)
+    if os.path.exists(final):
+        status = dict(status or {}, state='done')
+    if status is None:
+        return None
+    total = status.get('total')
+    status['progress'] = 1.0 if status['state'] == 'done' else (
+        round(status.get('rows', 0) / total, 3) if total else 0.0
+    )
+    status['job_id'] = job_id
+    status['status_url'] = url_for('main.export_job', job_id=job_id)
+    if status['state'] == 'done':
+        status['download_url'] = url_for('main.export_download', job_id=job_id)
+    return status
+
+
+def _send_artifact(job_id):
+    kind, fmt = job_id.split('-', 1)[0], job_id.rsplit('.', 1)[1]
+    return send_file(
+        _paths(job_id)[0],
+        download_name=f'{EXPORTS[kind][0]}.{fmt}',
+        as_attachment=True,
+        mimetype=FORMATS[fmt][0],
+    )
+
+
+def export_view(kind, filters=None):
+    """Shared body of the export routes.
+
+    A finished artifact for the current data version is sent straight from
+    disk. Otherwise ?background=1 queues a job and answers with its status
+    (202 while running), and a plain request streams the export inline.
+    Filtered exports are always streamed; artifacts only hold full ones.
+    """
+    fmt = request.args.get('format', 'xlsx')
+    if fmt not in FORMATS:
+        abort(400, f'Unsupported export format: {fmt}')
+    if filters:
+        return export_response(kind, fmt, filters)
+
+    job_id = job_id_for(kind, fmt)
+    if os.path.exists(_paths(job_id)[0]):
+        if request.args.get('background'):
+            return jsonify(job_status(job_id))
+        return _send_artifact(job_id)
+
+    if request.args.get('background'):
+        start_export(kind, fmt)
+        return jsonify(job_status(job_id)), 202
+    return export_response(kind, fmt)
+
+
+def export_job_view(job_id):
+    status = job_status(job_id)
+    if status is None:
+        abort(404)
+    return jsonify(status), 200 if status['state'] == 'done' else 202
+
+
+def export_download_view(job_id):
+    status = job_status(job_id)
+    if status is None or status['state'] != 'done':
+        abort(404)
+    return _send_artifact(job_id)
@@ -0,0 +1,32 @@
+"""add row_version to site and problem_report for the fragment cache
+
+Revision ID: 0b6d3e9a4c27
+Revises: f7a2c4d8e15b
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6d3e9a4c27'
+down_revision = 'f7a2c4d8e15b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('site', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('row_version', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('problem_report', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('row_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('problem_report', schema=None) as batch_op:
+        batch_op.drop_column('row_version')
+
+    with op.batch_alter_table('site', schema=None) as batch_op:
+        batch_op.drop_column('row_version')
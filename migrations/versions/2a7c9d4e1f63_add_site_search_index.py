@@ -0,0 +1,74 @@
+"""build the site search index
+
+Revision ID: 2a7c9d4e1f63
+Revises: 8c1f4e6a2d90
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a7c9d4e1f63'
+down_revision = '8c1f4e6a2d90'
+branch_labels = None
+depends_on = None
+
+# Same index as search.rebuild_search_index(); searches only read it
+COLUMNS = 'site_location, device_name, sdwan_site_id, lan_ip, atm_port, isp'
+TRIGGERS = ('site_fts_ai', 'site_fts_ad', 'site_fts_au', 'isp_link_fts_ai', 'isp_link_fts_ad', 'isp_link_fts_au')
+
+PG_SITE_DOCUMENT = ("to_tsvector('simple', coalesce(site_location, '') || ' ' || coalesce(device_name, '') || ' ' || "
+                    "coalesce(sdwan_site_id, '') || ' ' || coalesce(lan_ip, '') || ' ' || coalesce(atm_port, ''))")
+PG_LINK_DOCUMENT = ("to_tsvector('simple', coalesce(details, '') || ' ' || "
+                    "coalesce(capacity_mbps::text, '') || ' ' || coalesce(l2_ip, ''))")
+
+
+def _document(site_id):
+    isp = ("(SELECT group_concat(coalesce(l.details, '') || ' ' || "
+           "CASE WHEN l.capacity_mbps IS NULL THEN '' ELSE printf('%g', l.capacity_mbps) || ' Mbps' END || ' ' || "
+           "coalesce(l.l2_ip, ''), ' ') FROM isp_link l WHERE l.site_id = s.id)")
+    where = f' WHERE s.id = {site_id}' if site_id else ''
+    return (f"INSERT INTO site_fts(rowid, {COLUMNS}) SELECT s.id, s.site_location, s.device_name, s.sdwan_site_id, "
+            f"s.lan_ip, s.atm_port, {isp} FROM site s{where}")
+
+
+def _refresh(site_id):
+    return f'DELETE FROM site_fts WHERE rowid = {site_id}; {_document(site_id)};'
+
+
+def _has_fts5():
+    return op.get_bind().execute(sa.text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar()
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite' and _has_fts5():
+        op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS site_fts USING fts5({COLUMNS}, tokenize=\"unicode61 tokenchars '.:'\")")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS site_fts_ai AFTER INSERT ON site BEGIN {_refresh('new.id')} END")
+        op.execute("CREATE TRIGGER IF NOT EXISTS site_fts_ad AFTER DELETE ON site BEGIN "
+                   "DELETE FROM site_fts WHERE rowid = old.id; END")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS site_fts_au AFTER UPDATE ON site BEGIN "
+                   f"DELETE FROM site_fts WHERE rowid = old.id; {_document('new.id')}; END")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS isp_link_fts_ai AFTER INSERT ON isp_link BEGIN {_refresh('new.site_id')} END")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS isp_link_fts_ad AFTER DELETE ON isp_link BEGIN {_refresh('old.site_id')} END")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS isp_link_fts_au AFTER UPDATE ON isp_link BEGIN "
+                   f"{_refresh('old.site_id')} {_refresh('new.site_id')} END")
+        # An index the app built before this migration is rebuilt from scratch
+        op.execute('DELETE FROM site_fts')
+        op.execute(_document(None))
+    elif dialect == 'postgresql':
+        op.execute(f'CREATE INDEX IF NOT EXISTS ix_site_search ON site USING gin ({PG_SITE_DOCUMENT})')
+        op.execute(f'CREATE INDEX IF NOT EXISTS ix_isp_link_search ON isp_link USING gin ({PG_LINK_DOCUMENT})')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for name in TRIGGERS:
+            op.execute(f'DROP TRIGGER IF EXISTS {name}')
+        op.execute('DROP TABLE IF EXISTS site_fts')
+    elif dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_site_search')
+        op.execute('DROP INDEX IF EXISTS ix_isp_link_search')
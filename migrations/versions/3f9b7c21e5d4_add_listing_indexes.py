@@ -0,0 +1,42 @@
+"""add indexes for listing, filter and lookup columns
+
+Revision ID: 3f9b7c21e5d4
+Revises: a1c4e2b7d903
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9b7c21e5d4'
+down_revision = 'a1c4e2b7d903'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('site', schema=None) as batch_op:
+        batch_op.create_index('ix_site_site_location_id', ['site_location', 'id'], unique=False)
+        batch_op.create_index('ix_site_sdwan_site_id', ['sdwan_site_id'], unique=False)
+        batch_op.create_index('ix_site_lan_ip', ['lan_ip'], unique=False)
+
+    with op.batch_alter_table('problem_report', schema=None) as batch_op:
+        batch_op.create_index('ix_problem_report_issue_date_id', ['issue_date', 'id'], unique=False)
+        batch_op.create_index('ix_problem_report_site_id_issue_date', ['site_id', 'issue_date'], unique=False)
+        batch_op.create_index('ix_problem_report_status_issue_date', ['status', 'issue_date'], unique=False)
+        batch_op.create_index('ix_problem_report_ticket_id', ['ticket_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('problem_report', schema=None) as batch_op:
+        batch_op.drop_index('ix_problem_report_ticket_id')
+        batch_op.drop_index('ix_problem_report_status_issue_date')
+        batch_op.drop_index('ix_problem_report_site_id_issue_date')
+        batch_op.drop_index('ix_problem_report_issue_date_id')
+
+    with op.batch_alter_table('site', schema=None) as batch_op:
+        batch_op.drop_index('ix_site_lan_ip')
+        batch_op.drop_index('ix_site_sdwan_site_id')
+        batch_op.drop_index('ix_site_site_location_id')
@@ -0,0 +1,46 @@
+"""add problem_report_archive with compressed free-text columns
+
+Revision ID: 5d9e2f7b3a81
+Revises: 0b6d3e9a4c27
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d9e2f7b3a81'
+down_revision = '0b6d3e9a4c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('problem_report_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('site_id', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.String(length=120), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('reason', sa.LargeBinary(), nullable=True),
+    sa.Column('last_update', sa.LargeBinary(), nullable=True),
+    sa.Column('issue_date', sa.Date(), nullable=False),
+    sa.Column('last_follow_up', sa.Date(), nullable=False),
+    sa.Column('row_version', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['site_id'], ['site.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('problem_report_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_problem_report_archive_issue_date_id', ['issue_date', 'id'], unique=False)
+        batch_op.create_index('ix_problem_report_archive_site_id_issue_date', ['site_id', 'issue_date'], unique=False)
+        batch_op.create_index('ix_problem_report_archive_ticket_id', ['ticket_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('problem_report_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_problem_report_archive_ticket_id')
+        batch_op.drop_index('ix_problem_report_archive_site_id_issue_date')
+        batch_op.drop_index('ix_problem_report_archive_issue_date_id')
+
+    op.drop_table('problem_report_archive')
@@ -0,0 +1,62 @@
+"""initial schema
+
+Revision ID: 6d35fae6e1e9
+Revises: 
+Create Date: 2025-06-01 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d35fae6e1e9'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('site',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('site_location', sa.String(length=120), nullable=False),
+    sa.Column('device_name', sa.String(length=120), nullable=False),
+    sa.Column('sdwan_site_id', sa.String(length=120), nullable=False),
+    sa.Column('lan_ip', sa.String(length=45), nullable=False),
+    sa.Column('el_isp_info_details', sa.String(length=255), nullable=True),
+    sa.Column('el_isp_capacity', sa.String(length=50), nullable=True),
+    sa.Column('el_isp_l2_ip', sa.String(length=45), nullable=True),
+    sa.Column('ilevant_isp_info_details', sa.String(length=255), nullable=True),
+    sa.Column('ilevant_isp_capacity', sa.String(length=50), nullable=True),
+    sa.Column('horizon_isp_info_details', sa.String(length=255), nullable=True),
+    sa.Column('horizon_isp_capacity', sa.String(length=50), nullable=True),
+    sa.Column('horizon_isp_l2_ip', sa.String(length=45), nullable=True),
+    sa.Column('atm_port', sa.String(length=100), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('user',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=128), nullable=False),
+    sa.Column('group', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('problem_report',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('site_id', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.String(length=120), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('reason', sa.Text(), nullable=True),
+    sa.Column('last_update', sa.Text(), nullable=True),
+    sa.Column('issue_date', sa.Date(), nullable=False),
+    sa.Column('last_follow_up', sa.Date(), nullable=False),
+    sa.ForeignKeyConstraint(['site_id'], ['site.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('problem_report')
+    op.drop_table('user')
+    op.drop_table('site')
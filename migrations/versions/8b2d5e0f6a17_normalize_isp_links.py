@@ -0,0 +1,125 @@
+"""move per-provider ISP columns into isp_link
+
+Revision ID: 8b2d5e0f6a17
+Revises: 3f9b7c21e5d4
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2d5e0f6a17'
+down_revision = '3f9b7c21e5d4'
+branch_labels = None
+depends_on = None
+
+# provider -> old site columns (details, capacity, l2 ip); ILevant never had an L2 IP
+PROVIDER_COLUMNS = {
+    'el': ('el_isp_info_details', 'el_isp_capacity', 'el_isp_l2_ip'),
+    'ilevant': ('ilevant_isp_info_details', 'ilevant_isp_capacity', None),
+    'horizon': ('horizon_isp_info_details', 'horizon_isp_capacity', 'horizon_isp_l2_ip'),
+}
+
+# Frozen copy of models.parse_capacity as of this revision
+_CAPACITY = re.compile(r'^(\d+(?:\.\d+)?)\s*(?:([kmg])(?:b(?:ps|it/s)?)?)?$', re.IGNORECASE)
+_CAPACITY_UNITS = {'k': 0.001, 'm': 1, 'g': 1000, None: 1}
+
+
+def _parse_capacity(text):
+    match = _CAPACITY.match(text.strip())
+    if not match:
+        return None
+    unit = match.group(2).lower() if match.group(2) else None
+    return float(match.group(1)) * _CAPACITY_UNITS[unit]
+
+
+def _format_capacity(mbps):
+    return f'{mbps:.3f}'.rstrip('0').rstrip('.')
+
+
+def _drop_search_index():
+    # The SQLite search triggers read the columns dropped below; revision
+    # 2a7c9d4e1f63 (or `flask search rebuild`) builds the index again
+    if op.get_bind().dialect.name == 'sqlite':
+        for name in ('site_fts_ai', 'site_fts_ad', 'site_fts_au',
+                     'isp_link_fts_ai', 'isp_link_fts_ad', 'isp_link_fts_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {name}')
+        op.execute('DROP TABLE IF EXISTS site_fts')
+
+
+def upgrade():
+    isp_link = op.create_table('isp_link',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('site_id', sa.Integer(), nullable=False),
+    sa.Column('provider', sa.String(length=20), nullable=False),
+    sa.Column('details', sa.String(length=255), nullable=True),
+    sa.Column('capacity_mbps', sa.Float(), nullable=True),
+    sa.Column('l2_ip', sa.String(length=45), nullable=True),
+    sa.ForeignKeyConstraint(['site_id'], ['site.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('site_id', 'provider', name='uq_isp_link_site_id_provider')
+    )
+    with op.batch_alter_table('isp_link', schema=None) as batch_op:
+        batch_op.create_index('ix_isp_link_provider_capacity_mbps', ['provider', 'capacity_mbps'], unique=False)
+        batch_op.create_index('ix_isp_link_capacity_mbps', ['capacity_mbps'], unique=False)
+        batch_op.create_index('ix_isp_link_l2_ip', ['l2_ip'], unique=False)
+
+    columns = [c for cols in PROVIDER_COLUMNS.values() for c in cols if c]
+    site = sa.table('site', sa.column('id'), *(sa.column(c) for c in columns))
+    links = []
+    for row in op.get_bind().execute(sa.select(site)).mappings():
+        for provider, (details_col, capacity_col, l2_ip_col) in PROVIDER_COLUMNS.items():
+            details = (row[details_col] or '').strip() or None
+            capacity_text = (row[capacity_col] or '').strip()
+            l2_ip = ((row[l2_ip_col] or '').strip() or None) if l2_ip_col else None
+            capacity = _parse_capacity(capacity_text) if capacity_text else None
+            if capacity_text and capacity is None:
+                # Free text such as "2x50M": keep it readable rather than drop it
+                details = ' '.join(filter(None, [details, f'(capacity: {capacity_text})']))
+            if details or capacity is not None or l2_ip:
+                links.append({'site_id': row['id'], 'provider': provider, 'details': details,
+                              'capacity_mbps': capacity, 'l2_ip': l2_ip})
+    if links:
+        op.bulk_insert(isp_link, links)
+
+    _drop_search_index()
+    with op.batch_alter_table('site', schema=None) as batch_op:
+        for column in columns:
+            batch_op.drop_column(column)
+
+
+def downgrade():
+    _drop_search_index()
+    with op.batch_alter_table('site', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('el_isp_info_details', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('el_isp_capacity', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('el_isp_l2_ip', sa.String(length=45), nullable=True))
+        batch_op.add_column(sa.Column('ilevant_isp_info_details', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('ilevant_isp_capacity', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('horizon_isp_info_details', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('horizon_isp_capacity', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('horizon_isp_l2_ip', sa.String(length=45), nullable=True))
+
+    bind = op.get_bind()
+    isp_link = sa.table('isp_link', sa.column('site_id'), sa.column('provider'), sa.column('details'),
+                        sa.column('capacity_mbps'), sa.column('l2_ip'))
+    for link in bind.execute(sa.select(isp_link)).mappings():
+        details_col, capacity_col, l2_ip_col = PROVIDER_COLUMNS[link['provider']]
+        values = {details_col: link['details']}
+        if link['capacity_mbps'] is not None:
+            values[capacity_col] = _format_capacity(link['capacity_mbps'])
+        if l2_ip_col:
+            values[l2_ip_col] = link['l2_ip']
+        site = sa.table('site', sa.column('id'), *(sa.column(c) for c in values))
+        bind.execute(sa.update(site).where(site.c.id == link['site_id']).values(values))
+
+    with op.batch_alter_table('isp_link', schema=None) as batch_op:
+        batch_op.drop_index('ix_isp_link_l2_ip')
+        batch_op.drop_index('ix_isp_link_capacity_mbps')
+        batch_op.drop_index('ix_isp_link_provider_capacity_mbps')
+
+    op.drop_table('isp_link')
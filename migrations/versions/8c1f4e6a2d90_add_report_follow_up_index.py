@@ -0,0 +1,26 @@
+"""index problem_report.last_follow_up for the report filters
+
+Revision ID: 8c1f4e6a2d90
+Revises: 5d9e2f7b3a81
+Create Date: 2026-10-18 21:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1f4e6a2d90'
+down_revision = '5d9e2f7b3a81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('problem_report', schema=None) as batch_op:
+        batch_op.create_index('ix_problem_report_last_follow_up', ['last_follow_up'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('problem_report', schema=None) as batch_op:
+        batch_op.drop_index('ix_problem_report_last_follow_up')
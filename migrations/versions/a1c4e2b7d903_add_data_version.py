@@ -0,0 +1,36 @@
+"""add data_version counters
+
+Revision ID: a1c4e2b7d903
+Revises: 6d35fae6e1e9
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c4e2b7d903'
+down_revision = '6d35fae6e1e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    data_version = op.create_table('data_version',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    now = datetime.utcnow()
+    op.bulk_insert(data_version, [
+        {'name': 'site', 'version': 1, 'updated_at': now},
+        {'name': 'problem_report', 'version': 1, 'updated_at': now},
+    ])
+
+
+def downgrade():
+    op.drop_table('data_version')
@@ -0,0 +1,33 @@
+"""widen user.password_hash for scrypt hashes
+
+Revision ID: c5e8a3d1f042
+Revises: 8b2d5e0f6a17
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e8a3d1f042'
+down_revision = '8b2d5e0f6a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # werkzeug's scrypt hashes are 162 characters
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=128),
+               type_=sa.String(length=255),
+               existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=255),
+               type_=sa.String(length=128),
+               existing_nullable=False)
@@ -0,0 +1,59 @@
+"""add site_status and daily_outage dashboard aggregates
+
+Revision ID: e4f1b9c27a63
+Revises: c5e8a3d1f042
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f1b9c27a63'
+down_revision = 'c5e8a3d1f042'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('site_status',
+    sa.Column('site_id', sa.Integer(), nullable=False),
+    sa.Column('report_id', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.String(length=120), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('issue_date', sa.Date(), nullable=False),
+    sa.ForeignKeyConstraint(['site_id'], ['site.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('site_id')
+    )
+    with op.batch_alter_table('site_status', schema=None) as batch_op:
+        batch_op.create_index('ix_site_status_status_issue_date', ['status', 'issue_date'], unique=False)
+
+    op.create_table('daily_outage',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('reports', sa.Integer(), nullable=False),
+    sa.Column('down', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+    # Same result as aggregates.rebuild()
+    op.execute(
+        "INSERT INTO site_status (site_id, report_id, ticket_id, status, issue_date) "
+        "SELECT site_id, id, ticket_id, status, issue_date FROM ("
+        " SELECT site_id, id, ticket_id, status, issue_date, ROW_NUMBER() OVER ("
+        "  PARTITION BY site_id ORDER BY issue_date DESC, id DESC) AS rn"
+        " FROM problem_report) AS ranked WHERE rn = 1"
+    )
+    op.execute(
+        "INSERT INTO daily_outage (day, reports, down) "
+        "SELECT issue_date, COUNT(id), SUM(CASE WHEN status = 'DOWN' THEN 1 ELSE 0 END) "
+        "FROM problem_report GROUP BY issue_date"
+    )
+
+
+def downgrade():
+    op.drop_table('daily_outage')
+    with op.batch_alter_table('site_status', schema=None) as batch_op:
+        batch_op.drop_index('ix_site_status_status_issue_date')
+
+    op.drop_table('site_status')
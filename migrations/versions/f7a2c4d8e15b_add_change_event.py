@@ -0,0 +1,35 @@
+"""add change_event log for live updates
+
+Revision ID: f7a2c4d8e15b
+Revises: e4f1b9c27a63
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a2c4d8e15b'
+down_revision = 'e4f1b9c27a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('change_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('change_event', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_change_event_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('change_event', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_change_event_created_at'))
+
+    op.drop_table('change_event')
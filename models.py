@@ -1,48 +1,186 @@
 from extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hash_password, verify_password, needs_rehash
 from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attribute_keyed_dict
 from datetime import datetime
+import re
+import zlib
+
+# ISP providers a site can have a link with: code -> display name
+ISP_PROVIDERS = {'el': 'EL', 'ilevant': 'ILevant', 'horizon': 'Horizon'}
+
+# Flat Site attribute -> (provider, IspLink column) it is stored in
+ISP_FIELDS = {
+    'el_isp_info_details': ('el', 'details'),
+    'el_isp_capacity': ('el', 'capacity_mbps'),
+    'el_isp_l2_ip': ('el', 'l2_ip'),
+    'ilevant_isp_info_details': ('ilevant', 'details'),
+    'ilevant_isp_capacity': ('ilevant', 'capacity_mbps'),
+    'horizon_isp_info_details': ('horizon', 'details'),
+    'horizon_isp_capacity': ('horizon', 'capacity_mbps'),
+    'horizon_isp_l2_ip': ('horizon', 'l2_ip'),
+}
+
+_CAPACITY = re.compile(r'^(\d+(?:\.\d+)?)\s*(?:([kmg])(?:b(?:ps|it/s)?)?)?$', re.IGNORECASE)
+_CAPACITY_UNITS = {'k': 0.001, 'm': 1, 'g': 1000, None: 1}
+
+
+def parse_capacity(text):
+    # "100", "100 Mbps", "1 Gbps", "512kbps" -> Mbps as a float; "" -> None
+    if text is None or isinstance(text, (int, float)):
+        return text
+    text = text.strip ()
+    if not text:
+        return None
+    match = _CAPACITY.match (text)
+    if not match:
+        raise ValueError (f'Unrecognised capacity: {text!r}')
+    unit = match.group (2).lower () if match.group (2) else None
+    return float (match.group (1)) * _CAPACITY_UNITS[unit]
+
+
+def split_isp_fields(values):
+    # {flat Site attribute: value} -> (site column values, [IspLink row dicts])
+    site, links = {}, {}
+    for key, value in values.items():
+        if key not in ISP_FIELDS:
+            site[key] = value
+            continue
+        provider, attr = ISP_FIELDS[key]
+        if attr == 'capacity_mbps':
+            value = parse_capacity (value)
+        if value is not None and value != '':
+            links.setdefault (provider, {'provider': provider})[attr] = value
+    return site, list (links.values ())
+
+
+def format_capacity(mbps):
+    if mbps is None:
+        return None
+    return f'{mbps:.3f}'.rstrip ('0').rstrip ('.')
+
+
+def _isp_field(provider, attr):
+    def fget(self):
+        link = self.isp_links.get (provider)
+        value = getattr (link, attr) if link is not None else None
+        return format_capacity (value) if attr == 'capacity_mbps' else value
+
+    def fset(self, value):
+        if attr == 'capacity_mbps':
+            value = parse_capacity (value)
+        elif isinstance (value, str):
+            value = value.strip () or None
+        link = self.isp_links.get (provider)
+        if link is None:
+            if value is None:
+                return
+            link = self.isp_links[provider] = IspLink (provider=provider)
+        # A link left with no fields is removed at flush, see _drop_empty_isp_links
+        setattr (link, attr, value)
+
+    return property (fget, fset)
+
 
 class Site(db.Model):
+    __table_args__ = (
+        db.Index('ix_site_site_location_id', 'site_location', 'id'),  # listing order / keyset cursor
+        db.Index('ix_site_sdwan_site_id', 'sdwan_site_id'),  # import upsert lookups
+        db.Index('ix_site_lan_ip', 'lan_ip'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     site_location = db.Column(db.String(120), nullable=False)
     device_name = db.Column(db.String(120), nullable=False)
     sdwan_site_id = db.Column(db.String(120), nullable=False)
     lan_ip = db.Column(db.String(45), nullable=False)
 
-    # ISP fields stored as JSON or you can split into multiple columns
-    el_isp_info_details = db.Column(db.String(255))
-    el_isp_capacity = db.Column(db.String(50))
-    el_isp_l2_ip = db.Column(db.String(45))
+    atm_port = db.Column (db.String (100))
+
+    # Bumped on every change to the site or its ISP links (see versioning.py);
+    # rendered rows are cached under (id, row_version)
+    row_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
-    ilevant_isp_info_details = db.Column(db.String(255))
-    ilevant_isp_capacity = db.Column(db.String(50))
+    # One IspLink per provider, keyed by provider code: site.isp_links['el']
+    isp_links = db.relationship('IspLink', backref='site', lazy='selectin', cascade='all, delete-orphan',
+                                collection_class=attribute_keyed_dict('provider'))
 
-    atm_port = db.Column (db.String (100))
+    # Flat per-provider attributes used by SiteForm, the templates and the
+    # Site(...) constructor; they read and write the matching IspLink row
+    el_isp_info_details = _isp_field(*ISP_FIELDS['el_isp_info_details'])
+    el_isp_capacity = _isp_field(*ISP_FIELDS['el_isp_capacity'])
+    el_isp_l2_ip = _isp_field(*ISP_FIELDS['el_isp_l2_ip'])
+
+    ilevant_isp_info_details = _isp_field(*ISP_FIELDS['ilevant_isp_info_details'])
+    ilevant_isp_capacity = _isp_field(*ISP_FIELDS['ilevant_isp_capacity'])
 
-    horizon_isp_info_details = db.Column(db.String(255))
-    horizon_isp_capacity = db.Column(db.String(50))
-    horizon_isp_l2_ip = db.Column(db.String(45))
+    horizon_isp_info_details = _isp_field(*ISP_FIELDS['horizon_isp_info_details'])
+    horizon_isp_capacity = _isp_field(*ISP_FIELDS['horizon_isp_capacity'])
+    horizon_isp_l2_ip = _isp_field(*ISP_FIELDS['horizon_isp_l2_ip'])
+
+    # Latest problem report summary, maintained by aggregates.py; None if the site has no reports
+    latest = db.relationship('SiteStatus', uselist=False, viewonly=True, lazy='select')
+
+    @property
+    def current_status(self):
+        return self.latest.status if self.latest is not None else None
+
+    def _capacity_label(self, provider):
+        link = self.isp_links.get(provider)
+        if link is None or link.capacity_mbps is None:
+            return ''
+        return f"{format_capacity (link.capacity_mbps)} Mbps"
 
     @property
     def el_isp_capacity_mbps(self):
-        if self.el_isp_capacity and not self.el_isp_capacity.strip ().lower ().endswith ('mbps'):
-            return f"{self.el_isp_capacity.strip ()} Mbps"
-        return self.el_isp_capacity or ''
+        return self._capacity_label ('el')
 
     @property
     def ilevant_isp_capacity_mbps(self):
-        if self.ilevant_isp_capacity and not self.ilevant_isp_capacity.strip ().lower ().endswith ('mbps'):
-            return f"{self.ilevant_isp_capacity.strip ()} Mbps"
-        return self.ilevant_isp_capacity or ''
+        return self._capacity_label ('ilevant')
 
     @property
     def horizon_isp_capacity_mbps(self):
-        if self.horizon_isp_capacity and not self.horizon_isp_capacity.strip ().lower ().endswith ('mbps'):
-            return f"{self.horizon_isp_capacity.strip ()} Mbps"
-        return self.horizon_isp_capacity or ''
+        return self._capacity_label ('horizon')
+
+class IspLink(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('site_id', 'provider', name='uq_isp_link_site_id_provider'),
+        db.Index('ix_isp_link_provider_capacity_mbps', 'provider', 'capacity_mbps'),  # per-provider totals / thresholds
+        db.Index('ix_isp_link_capacity_mbps', 'capacity_mbps'),
+        db.Index('ix_isp_link_l2_ip', 'l2_ip'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    site_id = db.Column(db.Integer, db.ForeignKey('site.id', ondelete='CASCADE'), nullable=False)
+    provider = db.Column(db.String(20), nullable=False)  # a key of ISP_PROVIDERS
+    details = db.Column(db.String(255))
+    capacity_mbps = db.Column(db.Float)
+    l2_ip = db.Column(db.String(45))
+
+    @property
+    def is_empty(self):
+        return self.details is None and self.capacity_mbps is None and self.l2_ip is None
+
+
+@event.listens_for(Session, 'before_flush')
+def _drop_empty_isp_links(session, flush_context, instances):
+    # Done at flush rather than on assignment, so clearing one field and then
+    # filling another never deletes and re-inserts the same (site, provider)
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, IspLink) and obj.is_empty and obj.site is not None:
+            del obj.site.isp_links[obj.provider]
 
 class ProblemReport(db.Model):
+    __table_args__ = (
+        db.Index('ix_problem_report_issue_date_id', 'issue_date', 'id'),  # listing order / keyset cursor
+        db.Index('ix_problem_report_site_id_issue_date', 'site_id', 'issue_date'),
+        db.Index('ix_problem_report_status_issue_date', 'status', 'issue_date'),
+        db.Index('ix_problem_report_ticket_id', 'ticket_id'),
+        db.Index('ix_problem_report_last_follow_up', 'last_follow_up'),  # follow-up date filter
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     site_id = db.Column(db.Integer, db.ForeignKey('site.id'), nullable=False)
     ticket_id = db.Column(db.String(120), nullable=False)
@@ -51,17 +189,94 @@ class ProblemReport(db.Model):
     last_update = db.Column(db.Text, nullable=True)
     issue_date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     last_follow_up = db.Column(db.Date, nullable=False, default=datetime.utcnow)
+    row_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     site = db.relationship('Site', backref=db.backref('problem_reports', lazy=True))
 
+    archived = False
+
+class CompressedText(db.TypeDecorator):
+    # Text stored zlib-compressed; the free-text columns of archived reports
+    impl = db.LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else zlib.compress(value.encode('utf-8'), 9)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else zlib.decompress(value).decode('utf-8')
+
+class ArchivedReport(db.Model):
+    # Problem reports moved out of problem_report by "flask reports archive"
+    # (see archive.py), under the id they had there
+    __tablename__ = 'problem_report_archive'
+    __table_args__ = (
+        db.Index('ix_problem_report_archive_issue_date_id', 'issue_date', 'id'),
+        db.Index('ix_problem_report_archive_site_id_issue_date', 'site_id', 'issue_date'),
+        db.Index('ix_problem_report_archive_ticket_id', 'ticket_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    site_id = db.Column(db.Integer, db.ForeignKey('site.id'), nullable=False)
+    ticket_id = db.Column(db.String(120), nullable=False)
+    status = db.Column(db.String(10), nullable=False)
+    reason = db.Column(CompressedText)
+    last_update = db.Column(CompressedText)
+    issue_date = db.Column(db.Date, nullable=False)
+    last_follow_up = db.Column(db.Date, nullable=False)
+    row_version = db.Column(db.Integer, nullable=False, default=1)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    site = db.relationship('Site')
+
+    archived = True
+
+class SiteStatus(db.Model):
+    # Each site's latest problem report, kept in step with problem_report by
+    # aggregates.py; sites without reports have no row
+    __table_args__ = (
+        db.Index('ix_site_status_status_issue_date', 'status', 'issue_date'),
+    )
+
+    site_id = db.Column(db.Integer, db.ForeignKey('site.id', ondelete='CASCADE'), primary_key=True)
+    report_id = db.Column(db.Integer, nullable=False)
+    ticket_id = db.Column(db.String(120), nullable=False)
+    status = db.Column(db.String(10), nullable=False)
+    issue_date = db.Column(db.Date, nullable=False)
+
+class DailyOutage(db.Model):
+    # Report counts per issue date, maintained by aggregates.py
+    day = db.Column(db.Date, primary_key=True)
+    reports = db.Column(db.Integer, nullable=False, default=0)
+    down = db.Column(db.Integer, nullable=False, default=0)
+
+class ChangeEvent(db.Model):
+    # Append-only log of report/status changes, read by every process's
+    # events.py poller and pushed to browsers over SSE
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # report or status
+    payload = db.Column(db.Text, nullable=False)  # JSON
+
+class DataVersion(db.Model):
+    # One counter per table, bumped in the same transaction as every write to it
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
     group = db.Column(db.String(50), nullable=False)  # Admin, Network Team, NOC Team etc
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
\ No newline at end of file
+        return verify_password(self.password_hash, password)
+
+    @property
+    def needs_rehash(self):
+        # Stored with a different algorithm or cost than PASSWORD_HASH_METHOD
+        return needs_rehash(self.password_hash)
\ No newline at end of file
@@ -0,0 +1,108 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from flask import abort, current_app, request, url_for
+from sqlalchemy import tuple_
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def next_url(self):
+        if not self.has_next:
+            return None
+        return page_url(self.next_cursor)
+
+
+def per_page_arg(default_key):
+    # Page size from ?per_page=, bounded by MAX_PER_PAGE
+    per_page = request.args.get('per_page', type=int) or current_app.config[default_key]
+    return max(1, min(per_page, current_app.config['MAX_PER_PAGE']))
+
+
+def page_url(cursor):
+    # Same endpoint and filters as the current request, moved to another cursor
+    args = request.args.to_dict()
+    args.pop('fragment', None)
+    args['cursor'] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_json_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        abort(400, 'Invalid page cursor')
+    if not isinstance(values, list) or len(values) != len(keys):
+        abort(400, 'Invalid page cursor')
+
+    decoded = []
+    for key, value in zip(keys, values):
+        # A cursor comes back from the client, so anything but a scalar of the
+        # key column's type is rejected rather than handed to the comparison
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float, str))):
+            abort(400, 'Invalid page cursor')
+        try:
+            python_type = key.type.python_type
+        except NotImplementedError:
+            python_type = None  # e.g. a search rank expression: numbers only
+        try:
+            if value is None:
+                pass
+            elif python_type in (datetime, date):
+                value = python_type.fromisoformat(value)
+            elif python_type in (int, float, str):
+                value = python_type(value)
+            elif python_type is None and isinstance(value, str):
+                raise ValueError(value)
+        except (TypeError, ValueError, OverflowError):
+            abort(400, 'Invalid page cursor')
+        decoded.append(value)
+    return decoded
+
+
+def keyset_paginate(query, keys, cursor=None, per_page=50, descending=False):
+    """Return one page of ``query`` ordered by ``keys``.
+
+    ``keys`` must end with a unique column (normally the primary key) so
+    the ordering is total. The next page starts strictly after the last
+    row of this one, so every page costs one index range scan no matter
+    how deep it is.
+    """
+    if cursor:
+        position = tuple_(*decode_cursor(cursor, keys))
+        if descending:
+            query = query.filter(tuple_(*keys) < position)
+        else:
+            query = query.filter(tuple_(*keys) > position)
+
+    ordering = [k.desc() for k in keys] if descending else list(keys)
+    rows = query.add_columns(*keys).order_by(None).order_by(*ordering).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1][1:])
+    return KeysetPage([row[0] for row in rows], next_cursor, per_page)
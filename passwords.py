@@ -0,0 +1,59 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class LoginBusy(Exception):
+    # Every hashing slot stayed busy for PASSWORD_VERIFY_TIMEOUT seconds
+    pass
+
+
+def hash_method():
+    return current_app.config['PASSWORD_HASH_METHOD']
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=hash_method())
+
+
+@lru_cache(maxsize=8)
+def _prefix(method):
+    # werkzeug fills in default parameters ("pbkdf2" -> "pbkdf2:sha256:600000"),
+    # so compare against a real hash's prefix rather than the configured string
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    return password_hash.split('$', 1)[0] != _prefix(hash_method())
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['PASSWORD_HASH_WORKERS'], thread_name_prefix='password'
+            )
+        return _executor
+
+
+def verify_password(password_hash, password):
+    """Check a password on the bounded hashing pool.
+
+    scrypt and PBKDF2 release the GIL, so the request thread waiting here
+    does not hold up other requests in the worker, and the pool size caps
+    how many cores (and, for scrypt, how much memory) a login burst can use.
+    Raises LoginBusy if no slot frees up within PASSWORD_VERIFY_TIMEOUT.
+    """
+    future = _get_executor().submit(check_password_hash, password_hash, password)
+    try:
+        return future.result(timeout=current_app.config['PASSWORD_VERIFY_TIMEOUT'])
+    except TimeoutError:
+        future.cancel()
+        raise LoginBusy()
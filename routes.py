@@ -1,15 +1,26 @@
 from flask import (
-    Blueprint, render_template, redirect, url_for, request, flash, send_file, current_app
+    Blueprint, render_template, redirect, url_for, request, flash, current_app, jsonify, abort
 )
 from flask_login import login_required, current_user, login_user, logout_user
-from io import BytesIO
-import pandas as pd
 from datetime import datetime
 from decorators import roles_required
 from extensions import db
-from models import Site, ProblemReport, User
-from forms import SiteForm, ProblemReportForm, UserForm
-from sqlalchemy import or_
+from models import Site, ProblemReport, User, ISP_PROVIDERS, format_capacity
+from forms import SiteForm, SiteImportForm, BulkSiteForm, ProblemReportForm, BulkReportForm, UserForm
+from sqlalchemy.orm import joinedload, selectinload
+from search import search_sites
+from filters import ReportFilter
+from pagination import keyset_paginate, per_page_arg
+from caching import site_choices
+from importer import import_sites, SiteImportError
+import aggregates
+import archive
+import bulk
+import fragments
+from isp import bandwidth_by_provider, sites_below
+from identity import remember_identity, forget_identity
+from passwords import LoginBusy
+from events import event_stream_response, recent_events
 from flask import current_app as app
 
 main_bp = Blueprint ('main', __name__)
@@ -25,60 +36,43 @@ def index():
 @login_required
 def site_data():
     search = request.args.get ('search', '', type=str)
-    query = Site.query
+    status = request.args.get ('status', '', type=str).upper ()
+    # Each row shows the site's current status, loaded for the whole page in one SELECT
+    query = Site.query.options (selectinload (Site.latest))
+
+    if status in aggregates.STATUS_FILTERS:
+        query = aggregates.filter_sites_by_status (query, status)
+    else:
+        status = ''
+
+    keys = [Site.site_location, Site.id]
 
     if search:
-        # Use ilike for case-insensitive partial match on multiple columns
-        like_term = f'%{search}%'
-
-        query = query.filter (
-            or_ (
-                Site.site_location.ilike (like_term),
-                Site.device_name.ilike (like_term),
-                Site.sdwan_site_id.ilike (like_term),
-                Site.lan_ip.ilike (like_term),
-                Site.atm_port.ilike (like_term),
-                Site.el_isp_info_details.ilike (like_term),
-                Site.el_isp_capacity.ilike (like_term),
-                Site.el_isp_l2_ip.ilike (like_term),
-                Site.ilevant_isp_info_details.ilike (like_term),
-                Site.ilevant_isp_capacity.ilike (like_term),
-                Site.horizon_isp_info_details.ilike (like_term),
-                Site.horizon_isp_capacity.ilike (like_term),
-                Site.horizon_isp_l2_ip.ilike (like_term),
-            )
-        )
-    sites = query.all ()
-    return render_template ('site_data.html', sites=sites, search=search)
+        # Ranked full-text match served by the search index (see search.py)
+        query, rank = search_sites (query, search)
+        if rank is not None:
+            keys = [rank, Site.id]
+
+    def render_rows ():
+        page = keyset_paginate (query, keys, cursor=request.args.get ('cursor'),
+                                per_page=per_page_arg ('SITES_PER_PAGE'))
+        return render_template ('_site_rows.html', sites=page.items, page=page)
+
+    # Cached per query string and data version; rows also show report status
+    rows = fragments.cached_page ('_site_rows.html', ('site', 'problem_report'), render_rows)
+    if request.args.get ('fragment'):
+        # Infinite scroll: only the next batch of rows
+        return rows
+    return render_template ('site_data.html', rows=rows, search=search, status=status, bulk_form=BulkSiteForm ())
 
 
 @main_bp.route ('/export_sites')
 @login_required
 def export_sites():
-    sites = Site.query.all ()
-    df = pd.DataFrame ([{
-        "Site Name": s.site_location,
-        "Device Name": s.device_name,
-        "SDWAN Site ID": s.sdwan_site_id,
-        "LAN IP": s.lan_ip,
-        "ATM Port": s.atm_port,
-        "EL ISP Info": s.el_isp_info_details,
-        "EL Capacity": s.el_isp_capacity,
-        "EL L2 IP": s.el_isp_l2_ip,
-        "Ilevant ISP Info": s.ilevant_isp_info_details,
-        "ILevant Capacity": s.ilevant_isp_capacity,
-        "Horizon ISP Info": s.horizon_isp_info_details,
-        "Horizon Capacity": s.horizon_isp_capacity,
-        "Horizon L2 IP": s.horizon_isp_l2_ip
-    } for s in sites])
-
-    output = BytesIO ()
-    with pd.ExcelWriter (output, engine='openpyxl') as writer:
-        df.to_excel (writer, index=False, sheet_name='Sites')
-    output.seek (0)
-
-    return send_file(output, download_name='site_data.xlsx', as_attachment=True, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-
+    # ?format=csv|ndjson picks the writer, ?background=1 builds it as a job (see jobs.py).
+    # The export modules are imported on first use rather than at worker boot.
+    from jobs import export_view
+    return export_view ('sites')
 
 
 @main_bp.route ('/site_data/edit/<int:id>', methods=['GET', 'POST'])
@@ -184,6 +178,55 @@ def clone_site(id):
     # Pass 'add' mode flag to template for button text and heading
     return render_template('submit_site.html', form=form, edit=False)
 
+@main_bp.route('/site_data/bulk', methods=['POST'])
+@login_required
+@roles_required('Admin', 'Network Team')
+def bulk_sites():
+    form = BulkSiteForm()
+    ids = request.form.getlist('ids', type=int)
+    if not ids:
+        flash('Select at least one site.', 'warning')
+    elif not form.validate_on_submit():
+        flash('; '.join(e for errors in form.errors.values() for e in errors), 'danger')
+    elif form.action.data == 'update':
+        count = bulk.update_sites(ids, form.field.data, form.value.data or None)
+        flash(f'{count} sites updated', 'success')
+    elif form.action.data == 'clone':
+        count = bulk.clone_sites(ids)
+        flash(f'{count} sites cloned', 'success')
+    elif form.action.data == 'delete':
+        count, kept = bulk.delete_sites(ids)
+        flash(f'{count} sites deleted' + (f', {len(kept)} kept because they have problem reports' if kept else ''), 'info')
+    return redirect(request.referrer or url_for('main.site_data'))
+
+@main_bp.route('/site_data/import', methods=['GET', 'POST'])
+@login_required
+@roles_required('Admin', 'Network Team')
+def import_sites_view():
+    form = SiteImportForm()
+    result = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            result = import_sites(upload.stream, upload.filename, upsert=form.upsert.data)
+        except SiteImportError as e:
+            flash(str(e), 'danger')
+        else:
+            flash(f'{result.inserted} sites added, {result.updated} updated, {result.failed} rows failed.',
+                  'success' if not result.failed else 'warning')
+    return render_template('import_sites.html', form=form, result=result)
+
+@main_bp.route('/site_data/bandwidth')
+@login_required
+def site_bandwidth():
+    below = request.args.get('below', type=float)
+    provider = request.args.get('provider', '')
+    if provider not in ISP_PROVIDERS:
+        provider = ''
+    slow = sites_below(below, provider or None) if below is not None else []
+    return render_template('bandwidth.html', totals=bandwidth_by_provider(), slow=slow, below=below,
+                           provider=provider, providers=ISP_PROVIDERS, format_capacity=format_capacity)
+
 @main_bp.route('/site_data/add_to_daily_report/<int:site_id>', methods=['GET'])
 @login_required
 @roles_required('Admin', 'Network Team', 'NOC Team')
@@ -221,19 +264,38 @@ def submit_site():
     return render_template ('submit_site.html', form=form)
 
 
+# ===== DASHBOARD =====
+@main_bp.route('/dashboard')
+@login_required
+def dashboard():
+    # Reads only the aggregate tables kept by aggregates.py, never the report history
+    days = min(request.args.get('days', 30, type=int), 366)
+    return render_template(
+        'dashboard.html',
+        counts=aggregates.status_counts(),
+        average_age=aggregates.average_down_age(),
+        by_provider=aggregates.down_by_provider(),
+        down_sites=aggregates.down_sites(),
+        series=aggregates.daily_outages(max(days, 1)),
+        providers=ISP_PROVIDERS,
+    )
+
+
 # ===== DAILY PROBLEM REPORT =====
 @main_bp.route('/daily_problem_report', methods=['GET', 'POST'])
 @login_required
 @roles_required('Admin', 'Network Team', 'NOC Team')
 def daily_problem_report():
     form = ProblemReportForm()
-    sites = Site.query.order_by('site_location').all()
-    form.site_location.choices = [(site.id, site.site_location) for site in sites]
+    # Cached (id, site_location) list, rebuilt only when sites change (see caching.py)
+    form.site_location.choices, site_ids = site_choices()
 
     # Preselect site_location if query param present
     site_id = request.args.get('site_id', type=int)
-    if site_id and site_id in [site.id for site in sites]:
+    site_status = None
+    if site_id and site_id in site_ids:
         form.site_location.data = site_id
+        site_status = aggregates.current_status(site_id)
 
     if form.validate_on_submit():
         report = ProblemReport(
@@ -250,44 +312,106 @@ def daily_problem_report():
         flash('Problem report added', 'success')
         return redirect(url_for('main.daily_problem_report'))
 
-    reports = ProblemReport.query.order_by(ProblemReport.issue_date.desc()).all()
-    return render_template('daily_report.html', form=form, reports=reports)
+    # Each report's site comes in the same SELECT, without its ISP links (rows only show the name)
+    # ?site_id= &status= &since= &until= &follow_up_since= &follow_up_until= &ticket= &reason=
+    filters = ReportFilter.from_args(request.args)
+
+    def build(model):
+        query = model.query.options(joinedload(model.site, innerjoin=True).lazyload(Site.isp_links))
+        return filters.apply(query, model)
+    latest_only = bool(request.args.get('latest'))
+
+    def render_rows():
+        cursor, per_page = request.args.get('cursor'), per_page_arg('REPORTS_PER_PAGE')
+        if latest_only:
+            # Latest reports are never archived
+            page = keyset_paginate(aggregates.latest_reports_only(build(ProblemReport)),
+                                   [ProblemReport.issue_date, ProblemReport.id],
+                                   cursor=cursor, per_page=per_page, descending=True)
+        else:
+            page = archive.paginate_reports(build, cursor=cursor, per_page=per_page, since=filters.since,
+                                            include_archive=filters.covers_archive)
+        return render_template('_report_rows.html', reports=page.items, page=page)
+
+    rows = fragments.cached_page('_report_rows.html', ('problem_report', 'problem_report_archive', 'site'),
+                                 render_rows)
+    if request.args.get('fragment'):
+        return rows
+    return render_template('daily_report.html', form=form, rows=rows, bulk_form=BulkReportForm(),
+                           latest_only=latest_only, site_status=site_status, filters=filters,
+                           archive_skipped=None if latest_only else archive.archive_skipped(filters))
+
+
+@main_bp.route('/daily_problem_report/rows')
+@login_required
+@roles_required('Admin', 'Network Team', 'NOC Team')
+def report_rows():
+    # Table rows for the given report ids, fetched by the live update script
+    ids = request.args.getlist('ids', type=int)[:100]
+    reports = (ProblemReport.query.options(joinedload(ProblemReport.site, innerjoin=True).lazyload(Site.isp_links))
+               .filter(ProblemReport.id.in_(ids))
+               .order_by(ProblemReport.issue_date.desc(), ProblemReport.id.desc()).all()) if ids else []
+    return render_template('_report_rows.html', reports=reports, page=None)
+
+
+@main_bp.route('/events')
+@login_required
+def live_events():
+    if not current_app.config['EVENTS_STREAM']:
+        abort(404)
+    return event_stream_response()
+
+
+@main_bp.route('/events/recent')
+@login_required
+def recent_live_events():
+    return jsonify(recent_events(request.args.get('after', type=int)))
+
+
+@main_bp.route('/daily_problem_report/bulk', methods=['POST'])
+@login_required
+@roles_required('Admin', 'NOC Team')
+def bulk_reports():
+    form = BulkReportForm()
+    ids = request.form.getlist('ids', type=int)
+    if not ids:
+        flash('Select at least one report.', 'warning')
+    elif not form.validate_on_submit():
+        flash('; '.join(e for errors in form.errors.values() for e in errors), 'danger')
+    elif form.action.data == 'status':
+        count = bulk.set_report_status(ids, form.status.data)
+        flash(f'{count} reports marked {form.status.data}', 'success')
+    elif form.action.data == 'clone':
+        count = bulk.clone_reports(ids)
+        flash(f'{count} reports cloned', 'success')
+    elif form.action.data == 'delete':
+        count = bulk.delete_reports(ids)
+        flash(f'{count} reports deleted', 'info')
+    return redirect(request.referrer or url_for('main.daily_problem_report'))
 
 
 @main_bp.route ('/export_reports')
 @login_required
 def export_reports():
-    # Query all daily problem reports
-    reports = ProblemReport.query.all ()
-
-    # Prepare list of dicts for DataFrame
-    data = []
-    for r in reports:
-        data.append ({
-            'Site Location': r.site.site_location if r.site else '',
-            'Ticket ID': r.ticket_id,
-            'Status': r.status,
-            'Reason': r.reason or '',
-            'Last Update': r.last_update or '',
-            'Issue Date': r.issue_date.strftime ('%Y-%m-%d') if r.issue_date else '',
-            'Last Follow Up': r.last_follow_up.strftime ('%Y-%m-%d') if r.last_follow_up else ''
-        })
-
-    df = pd.DataFrame (data)
-
-    # Create Excel in memory
-    output = BytesIO ()
-    with pd.ExcelWriter (output, engine='openpyxl') as writer:
-        df.to_excel (writer, index=False, sheet_name='Daily Reports')
-    output.seek (0)
-
-    # Send file as attachment with proper parameter for Flask>=2.0
-    return send_file (
-        output,
-        download_name='daily_problem_reports.xlsx',
-        as_attachment=True,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+    # ?archive=1 adds the archived reports (see archive.py); the report page
+    # filters (filters.py) narrow the export to the rows shown there
+    from jobs import export_view
+    return export_view ('history' if request.args.get('archive') else 'reports',
+                        ReportFilter.from_args (request.args))
+
+
+@main_bp.route ('/exports/<job_id>')
+@login_required
+def export_job(job_id):
+    from jobs import export_job_view
+    return export_job_view (job_id)
+
+
+@main_bp.route ('/exports/<job_id>/download')
+@login_required
+def export_download(job_id):
+    from jobs import export_download_view
+    return export_download_view (job_id)
 
 
 @main_bp.route ('/daily_problem_report/edit/<int:id>', methods=['GET', 'POST'])
@@ -296,8 +420,7 @@ def export_reports():
 def edit_report(id):
     report = ProblemReport.query.get_or_404 (id)
     form = ProblemReportForm (obj=report)
-    form.site_location.choices = [(site.id, site.site_location) for site in
-                                  Site.query.order_by ('site_location').all ()]
+    form.site_location.choices = site_choices ()[0]
     form.site_location.data = report.site_id
     if form.validate_on_submit ():
         report.site_id = form.site_location.data
@@ -310,7 +433,7 @@ def edit_report(id):
         db.session.commit ()
         flash ('Problem report updated', 'success')
         return redirect (url_for ('main.daily_problem_report'))
-    return render_template ('daily_report.html', form=form, edit=True)
+    return render_template ('daily_report.html', form=form, edit=True, filters=ReportFilter ())
 
 
 @main_bp.route ('/daily_problem_report/delete/<int:id>', methods=['POST'])
@@ -329,7 +452,7 @@ def delete_report(id):
 def clone_report(id):
     report = ProblemReport.query.get_or_404(id)
     form = ProblemReportForm()
-    form.site_location.choices = [(site.id, site.site_location) for site in Site.query.order_by('site_location').all()]
+    form.site_location.choices = site_choices()[0]
 
     if request.method == 'GET':
         form.site_location.data = report.site_id
@@ -355,7 +478,7 @@ def clone_report(id):
         flash('Problem report cloned successfully as new report.', 'success')
         return redirect(url_for('main.daily_problem_report'))
 
-    return render_template('daily_report.html', form=form, edit=False)
+    return render_template('daily_report.html', form=form, edit=False, filters=ReportFilter())
 
 # ===== ADMIN USER MANAGEMENT =====
 @main_bp.route ('/admin', methods=['GET', 'POST'])
@@ -383,30 +506,30 @@ def edit_user(id):
     form.password.data = ''  # Clear password on GET to avoid pre-fill & browser validation issues
 
     if form.validate_on_submit():
-        app.logger.debug(f"Form data - username: {form.username.data}, password entered: {'YES' if form.password.data else 'NO'}, password length: {len(form.password.data) if form.password.data else 0}, group: {form.group.data}")
-        app.logger.debug(f"Raw password field from form: '{request.form.get('password')}'")
+        app.logger.debug("Form data - username: %s, password entered: %s, group: %s",
+                         form.username.data, 'YES' if form.password.data else 'NO', form.group.data)
 
         user.username = form.username.data
         user.group = form.group.data
 
         if form.password.data:
-            app.logger.info(f"Updating password for user: {user.username}")
+            app.logger.info("Updating password for user: %s", user.username)
             try:
                 user.set_password(form.password.data)
             except Exception as e:
-                app.logger.error(f"Error setting password: {e}")
+                app.logger.error("Error setting password: %s", e)
                 flash('An error occurred while updating the password.', 'danger')
                 return render_template('admin.html', form=form, edit=True, edit_user=user)
         else:
-            app.logger.info(f"No password change for user: {user.username}")
+            app.logger.info("No password change for user: %s", user.username)
 
         db.session.commit()
-        app.logger.info(f"User '{user.username}' updated successfully.")
+        app.logger.info("User '%s' updated successfully.", user.username)
         flash('User updated successfully', 'success')
         return redirect(url_for('main.admin'))
 
     if form.errors:
-        app.logger.warning(f"Form validation errors: {form.errors}")
+        app.logger.warning("Form validation errors: %s", form.errors)
 
     return render_template('admin.html', form=form, edit=True, edit_user=user)
 
@@ -421,6 +544,14 @@ def delete_user(id):
     return redirect (url_for ('main.admin'))
 
 
+@main_bp.route('/admin/fragment_cache')
+@login_required
+@roles_required('Admin')
+def fragment_cache_stats():
+    # Hit/miss counters of this worker's rendered-row cache
+    return jsonify(fragments.stats())
+
+
 # ===== AUTH ROUTES =====
 @main_bp.route ('/login', methods=['GET', 'POST'])
 def login():
@@ -430,8 +561,18 @@ def login():
         username = request.form['username']
         password = request.form['password']
         user = User.query.filter_by (username=username).first ()
-        if user and user.check_password (password):
+        try:
+            valid = user is not None and user.check_password (password)
+        except LoginBusy:
+            flash ('The server is busy signing other users in, please try again in a moment.', 'warning')
+            return render_template ('login.html'), 503
+        if valid:
+            if user.needs_rehash:
+                # Stored under an older hashing policy; upgrade while we have the password
+                user.set_password (password)
+                db.session.commit ()
             login_user (user)
+            remember_identity (user)
             flash (f'Welcome back, {user.username}!', 'success')
             return redirect (url_for ('main.site_data'))
         else:
@@ -443,5 +584,6 @@ def login():
 @login_required
 def logout():
     logout_user ()
+    forget_identity ()
     flash ('You have been logged out', 'info')
     return redirect (url_for ('main.login'))
\ No newline at end of file
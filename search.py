@@ -0,0 +1,207 @@
+import logging
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import String, bindparam, cast, or_, select, text, literal_column
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from models import Site, IspLink
+
+logger = logging.getLogger(__name__)
+
+# Site columns covered by the /site_data search box; ISP link details,
+# capacities and L2 IPs are indexed too, as one extra "isp" column
+SEARCH_COLUMNS = ('site_location', 'device_name', 'sdwan_site_id', 'lan_ip', 'atm_port')
+FTS_COLUMNS = SEARCH_COLUMNS + ('isp',)
+
+# Keep IPs (v4 and v6) as single tokens so "10.20.*" style prefixes work
+FTS_TOKENIZER = "unicode61 tokenchars '.:'"
+
+FTS_TRIGGERS = ('site_fts_ai', 'site_fts_ad', 'site_fts_au', 'isp_link_fts_ai', 'isp_link_fts_ad', 'isp_link_fts_au')
+
+# Postgres: queries have to repeat these exact expressions to hit the GIN indexes
+PG_SITE_DOCUMENT = "to_tsvector('simple', {})".format(
+    " || ' ' || ".join(f"coalesce({c}, '')" for c in SEARCH_COLUMNS)
+)
+PG_LINK_DOCUMENT = ("to_tsvector('simple', coalesce(details, '') || ' ' || "
+                    "coalesce(capacity_mbps::text, '') || ' ' || coalesce(l2_ip, ''))")
+
+# The index is built by the add_site_search_index migration or by
+# `flask search rebuild`, never by a request: searches only check for it and
+# fall back to ILIKE while it is missing.
+#
+# On SQLite it is a regular (not external-content) FTS5 table keyed by site
+# id, kept current by triggers: its "isp" column is assembled from isp_link
+# rows, so there is no content table it could read the indexed text back from.
+
+# Engines (by URL) found to have the index in this process
+_ready = set()
+_warned = set()
+
+search_cli = AppGroup('search', help='Manage the site search index.')
+
+
+def _sqlite_document(site_id):
+    # One index row per site: its own columns plus all of its ISP links
+    isp = ("(SELECT group_concat(coalesce(l.details, '') || ' ' || "
+           "CASE WHEN l.capacity_mbps IS NULL THEN '' ELSE printf('%g', l.capacity_mbps) || ' Mbps' END || ' ' || "
+           "coalesce(l.l2_ip, ''), ' ') FROM isp_link l WHERE l.site_id = s.id)")
+    cols = ', '.join(f's.{c}' for c in SEARCH_COLUMNS)
+    where = f' WHERE s.id = {site_id}' if site_id else ''
+    return f"INSERT INTO site_fts(rowid, {', '.join(FTS_COLUMNS)}) SELECT s.id, {cols}, {isp} FROM site s{where}"
+
+
+def _sqlite_ddl():
+    def refresh(site_id):
+        return f'DELETE FROM site_fts WHERE rowid = {site_id}; {_sqlite_document(site_id)};'
+
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS site_fts USING fts5("
+        f"{', '.join(FTS_COLUMNS)}, tokenize=\"{FTS_TOKENIZER}\")",
+        f"CREATE TRIGGER IF NOT EXISTS site_fts_ai AFTER INSERT ON site BEGIN {refresh('new.id')} END",
+        "CREATE TRIGGER IF NOT EXISTS site_fts_ad AFTER DELETE ON site BEGIN "
+        "DELETE FROM site_fts WHERE rowid = old.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS site_fts_au AFTER UPDATE ON site BEGIN "
+        f"DELETE FROM site_fts WHERE rowid = old.id; {_sqlite_document('new.id')}; END",
+        f"CREATE TRIGGER IF NOT EXISTS isp_link_fts_ai AFTER INSERT ON isp_link BEGIN {refresh('new.site_id')} END",
+        f"CREATE TRIGGER IF NOT EXISTS isp_link_fts_ad AFTER DELETE ON isp_link BEGIN {refresh('old.site_id')} END",
+        f"CREATE TRIGGER IF NOT EXISTS isp_link_fts_au AFTER UPDATE ON isp_link BEGIN "
+        f"{refresh('old.site_id')} {refresh('new.site_id')} END",
+    ]
+
+
+def _drop_index(conn, dialect):
+    if dialect == 'sqlite':
+        for name in FTS_TRIGGERS:
+            conn.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+        conn.execute(text('DROP TABLE IF EXISTS site_fts'))
+    elif dialect == 'postgresql':
+        conn.execute(text('DROP INDEX IF EXISTS ix_site_search'))
+        conn.execute(text('DROP INDEX IF EXISTS ix_isp_link_search'))
+
+
+def _create_index(conn, dialect):
+    if dialect == 'sqlite':
+        for statement in _sqlite_ddl():
+            conn.execute(text(statement))
+        conn.execute(text(_sqlite_document(None)))
+        return True
+    if dialect == 'postgresql':
+        conn.execute(text(f'CREATE INDEX IF NOT EXISTS ix_site_search ON site USING gin ({PG_SITE_DOCUMENT})'))
+        conn.execute(text(f'CREATE INDEX IF NOT EXISTS ix_isp_link_search ON isp_link USING gin ({PG_LINK_DOCUMENT})'))
+        return True
+    return False
+
+
+def _index_exists(conn, dialect):
+    if dialect == 'sqlite':
+        # An index in an older column layout does not count
+        return tuple(row[1] for row in conn.execute(text('PRAGMA table_info(site_fts)'))) == FTS_COLUMNS
+    if dialect == 'postgresql':
+        return conn.execute(text(
+            "SELECT to_regclass('ix_site_search') IS NOT NULL AND to_regclass('ix_isp_link_search') IS NOT NULL"
+        )).scalar()
+    return False
+
+
+def search_index_ready():
+    # True when a real index backs the search, False for the ILIKE fallback.
+    # Only reads the schema, so concurrent first searches cannot collide.
+    key = str(db.engine.url)
+    if key in _ready:
+        return True
+    with db.engine.connect() as conn:
+        found = _index_exists(conn, db.engine.dialect.name)
+    if found:
+        _ready.add(key)
+    elif key not in _warned:
+        _warned.add(key)
+        logger.warning('No site search index on %s; using ILIKE until `flask db upgrade` or '
+                       '`flask search rebuild` builds it', db.engine.dialect.name)
+    return found
+
+
+def rebuild_search_index():
+    dialect = db.engine.dialect.name
+    with db.engine.begin() as conn:
+        _drop_index(conn, dialect)
+        built = _create_index(conn, dialect)
+    _ready.discard(str(db.engine.url))
+    return built
+
+
+def _tokens(term):
+    return [t for t in term.split() if t]
+
+
+def _fts5_match(tokens):
+    # Every token is a quoted prefix phrase; whitespace between them means AND
+    return ' '.join('"{}"*'.format(t.replace('"', '""')) for t in tokens)
+
+
+def _pg_tsquery(tokens):
+    return ' & '.join("'{}':*".format(t.replace("'", "''").replace('\\', '')) for t in tokens)
+
+
+def _pg_search(query, tokens):
+    site_document = literal_column(PG_SITE_DOCUMENT)
+    for i, token in enumerate(tokens):
+        # One bind name per token; a shared name would send only the last value
+        tsquery = db.func.to_tsquery('simple', bindparam(f'tsq_{i}', _pg_tsquery([token])))
+        in_links = select(IspLink.id).where(
+            IspLink.site_id == Site.id, literal_column(PG_LINK_DOCUMENT).op('@@')(tsquery)
+        ).exists()
+        query = query.filter(or_(site_document.op('@@')(tsquery), in_links))
+    tsquery = db.func.to_tsquery('simple', bindparam('tsq_any', _pg_tsquery(tokens).replace(' & ', ' | ')))
+    rank = -db.func.ts_rank(site_document, tsquery)
+    return query.order_by(rank, Site.id), rank
+
+
+def search_sites(query, term):
+    """Filter a Site query by a search term, best matches first.
+
+    Returns ``(query, rank)`` where ``rank`` is the ascending relevance
+    expression the query is ordered by, or None when no index is available.
+    """
+    tokens = _tokens(term)
+    if not tokens:
+        return query, None
+
+    dialect = db.engine.dialect.name
+    if search_index_ready():
+        if dialect == 'sqlite':
+            hits = select(
+                literal_column('site_fts.rowid').label('site_id'),
+                literal_column('site_fts.rank').label('rank'),
+            ).select_from(text('site_fts')).where(
+                text('site_fts MATCH :match').bindparams(match=_fts5_match(tokens))
+            ).subquery('search_hits')
+            query = query.join(hits, Site.id == hits.c.site_id)
+            return query.order_by(hits.c.rank, Site.id), hits.c.rank
+        if dialect == 'postgresql':
+            return _pg_search(query, tokens)
+
+    # No index on this backend: every token must appear in some column
+    for token in tokens:
+        like_term = f'%{token}%'
+        query = query.filter(or_(
+            *(getattr(Site, c).ilike(like_term) for c in SEARCH_COLUMNS),
+            Site.isp_links.any(or_(IspLink.details.ilike(like_term), IspLink.l2_ip.ilike(like_term),
+                                   cast(IspLink.capacity_mbps, String).ilike(like_term))),
+        ))
+    return query.order_by(Site.site_location, Site.id), None
+
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    """Drop and rebuild the site search index."""
+    try:
+        built = rebuild_search_index()
+    except OperationalError as e:
+        # e.g. an SQLite build without FTS5
+        raise click.ClickException(f'Could not build the site search index: {e}')
+    if built:
+        click.echo('Site search index rebuilt.')
+    else:
+        click.echo(f'No search index support for {db.engine.dialect.name}; using ILIKE search.')
@@ -55,7 +55,7 @@ $(document).ready(function() {
   var deleteModal = new bootstrap.Modal(document.getElementById('confirmDeleteModal'))
 
   // Site delete button handler
-  $('.btn-delete-site').on('click', function(e) {
+  $(document).on('click', '.btn-delete-site', function(e) {
     e.preventDefault()
     let siteId = $(this).data('site-id')
     let siteName = $(this).data('site-name')
@@ -66,7 +66,7 @@ $(document).ready(function() {
   })
 
   // Report delete button handler
-  $('.btn-delete-report').on('click', function(e) {
+  $(document).on('click', '.btn-delete-report', function(e) {
     e.preventDefault()
     let reportId = $(this).data('report-id')
     let ticket = $(this).data('report-ticket')
@@ -77,3 +77,185 @@ $(document).ready(function() {
     deleteModal.show()
   })
 })
+
+$(document).ready(function() {
+  // Infinite scroll: swap the "Load more" row for the next page of rows
+  function loadMore($row) {
+    if ($row.data('loading')) return
+    $row.data('loading', true)
+    let url = $row.data('next-url')
+    url += (url.indexOf('?') === -1 ? '?' : '&') + 'fragment=1'
+    $.get(url).done(function(html) {
+      $row.replaceWith(html)
+      observeLoadMore()
+    }).fail(function() {
+      $row.data('loading', false)
+    })
+  }
+
+  $(document).on('click', '.load-more a', function(e) {
+    e.preventDefault()
+    loadMore($(this).closest('.load-more'))
+  })
+
+  const observer = 'IntersectionObserver' in window ? new IntersectionObserver(function(entries) {
+    entries.forEach(function(entry) {
+      if (entry.isIntersecting) {
+        observer.unobserve(entry.target)
+        loadMore($(entry.target))
+      }
+    })
+  }, { rootMargin: '200px' }) : null
+
+  function observeLoadMore() {
+    if (!observer) return
+    $('.load-more').each(function() { observer.observe(this) })
+  }
+
+  observeLoadMore()
+})
+
+$(document).ready(function() {
+  // Background export: queue the job, poll its status, then download the file
+  $(document).on('click', '.btn-background-export', function() {
+    const $btn = $(this)
+    const label = $btn.text()
+    $btn.prop('disabled', true)
+
+    function poll(status) {
+      if (status.state === 'done') {
+        $btn.prop('disabled', false).text(label)
+        window.location = status.download_url
+      } else if (status.state === 'failed') {
+        $btn.prop('disabled', false).text(label)
+        alert('Export failed: ' + (status.error || 'unknown error'))
+      } else {
+        $btn.text('Exporting… ' + Math.round(status.progress * 100) + '%')
+        setTimeout(function() { $.getJSON(status.status_url).done(poll) }, 1000)
+      }
+    }
+
+    $.getJSON($btn.data('export-url')).done(poll).fail(function() {
+      $btn.prop('disabled', false).text(label)
+    })
+  })
+})
+
+$(document).ready(function() {
+  // Bulk actions: row checkboxes belong to #bulkForm through their form="" attribute
+  function updateBulkCount() {
+    $('.bulk-count').text($('input[name="ids"][form="bulkForm"]:checked').length)
+  }
+
+  function toggleBulkFields() {
+    const action = $('.bulk-action').val()
+    $('.bulk-update-only').toggle(action === 'update')
+    $('.bulk-status-only').toggle(action === 'status')
+  }
+
+  $(document).on('change', '.bulk-select-all', function() {
+    $('input[name="ids"][form="bulkForm"]').prop('checked', this.checked)
+    updateBulkCount()
+  })
+  $(document).on('change', 'input[name="ids"][form="bulkForm"]', updateBulkCount)
+  $(document).on('change', '.bulk-action', toggleBulkFields)
+
+  $('.bulk-form').on('submit', function(e) {
+    const count = $('input[name="ids"][form="bulkForm"]:checked').length
+    if ($('.bulk-action').val() === 'delete' && !confirm('Delete ' + count + ' selected item(s)?')) {
+      e.preventDefault()
+    }
+  })
+
+  toggleBulkFields()
+})
+
+$(document).ready(function() {
+  // Live updates: patch report rows and site status badges as other users change them
+  const $reports = $('tbody[data-live="reports"]')
+  const $sites = $('tbody[data-live="sites"]')
+  if (!$reports.length && !$sites.length) return
+
+  let pending = {}
+  let timer = null
+
+  // Report changes arrive in bursts (bulk actions), so fetch their rows together
+  function fetchRows() {
+    const batch = pending
+    pending = {}
+    timer = null
+    const ids = Object.keys(batch)
+    $.get($reports.data('rows-url'), $.param({ ids: ids }, true)).done(function(html) {
+      $('<tbody>' + html + '</tbody>').find('tr[data-report-row]').each(function() {
+        const $row = $(this)
+        const id = $row.data('report-row')
+        const $existing = $reports.find(`tr[data-report-row="${id}"]`)
+        // A filtered list only updates the rows it shows; new reports may not match its filters
+        if ($existing.length) {
+          $existing.replaceWith($row)
+        } else if (batch[id] === 'created' && !$reports.data('filtered')) {
+          if ($reports.data('latest-only')) {
+            $reports.find(`tr[data-site="${$row.data('site')}"]`).remove()
+          }
+          $reports.prepend($row)
+        }
+      })
+    })
+  }
+
+  const handlers = {
+    report: function(change) {
+      if (!$reports.length) return
+      if (change.action === 'deleted') {
+        $reports.find(`tr[data-report-row="${change.id}"]`).remove()
+        return
+      }
+      pending[change.id] = pending[change.id] || change.action
+      timer = timer || setTimeout(fetchRows, 300)
+    },
+    status: function(change) {
+      const $cell = $sites.find(`tr[data-site-row="${change.site_id}"] .site-status`)
+      if (!$cell.length) return
+      const $badge = $('<span class="badge"></span>')
+      if (change.status) {
+        $badge.addClass(change.status === 'DOWN' ? 'bg-danger' : 'bg-success').text(change.status)
+          .attr('title', `Since ${change.since}, ticket ${change.ticket_id}`)
+      } else {
+        $badge.addClass('bg-secondary').text('-')
+      }
+      $cell.empty().append($badge)
+    }
+  }
+
+  const $body = $('body')
+  if ($body.data('events-url') && window.EventSource) {
+    // Streamed (EVENTS_STREAM): the server pushes each change as it happens
+    const source = new EventSource($body.data('events-url'))
+    Object.keys(handlers).forEach(function(kind) {
+      source.addEventListener(kind, function(e) { handlers[kind](JSON.parse(e.data)) })
+    })
+    return
+  }
+
+  // Polled: each answer repeats a window of recent ids, for events that
+  // committed late, so skip the ids already handled
+  const pollUrl = $body.data('events-poll-url')
+  if (!pollUrl) return
+  const seen = new Set()
+  let after = null
+
+  function poll() {
+    $.getJSON(pollUrl, after === null ? {} : { after: after }).done(function(answer) {
+      (answer.seen || []).forEach(function(id) { seen.add(id) })
+      answer.events.forEach(function(event) {
+        if (seen.has(event.id)) return
+        seen.add(event.id)
+        if (handlers[event.kind]) handlers[event.kind](event.data)
+      })
+      after = answer.last_id
+    }).always(function() {
+      setTimeout(poll, $body.data('events-poll-seconds') * 1000)
+    })
+  }
+  poll()
+})
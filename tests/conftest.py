@@ -0,0 +1,78 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from extensions import db
+from instrumentation import count_queries
+from models import Site, ProblemReport, User
+from search import rebuild_search_index
+
+SITES = 10
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    # Rendered fragments live in a per-process cache keyed by data versions,
+    # which start over with every test database
+    app.config['FRAGMENT_CACHE_SIZE'] = 0
+    with app.app_context():
+        db.create_all()
+        admin = User(username='admin', group='Admin')
+        admin.set_password('adminpass')
+        db.session.add(admin)
+        db.session.add_all(Site(site_location=f'Site {i:02d}', device_name=f'dev{i}', sdwan_site_id=f'SD-{i}',
+                                lan_ip=f'10.0.0.{i}', el_isp_info_details='EL fiber', el_isp_capacity='100')
+                           for i in range(SITES))
+        db.session.commit()
+        # What the add_site_search_index migration builds
+        rebuild_search_index()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    # Requests run outside any app context: one pushed here would be shared
+    # by every request, and so would flask.g and the logged-in user
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'admin', 'password': 'adminpass'})
+    assert response.status_code == 302
+    return client
+
+
+@pytest.fixture
+def add_reports(app):
+    """add_reports(n) inserts n more problem reports spread over the sites."""
+    def add(count):
+        with app.app_context():
+            site_ids = db.session.execute(db.select(Site.id)).scalars().all()
+            start = db.session.query(db.func.count(ProblemReport.id)).scalar()
+            for i in range(start, start + count):
+                db.session.add(ProblemReport(
+                    site_id=site_ids[i % len(site_ids)], ticket_id=f'T{i}', status='DOWN' if i % 3 else 'UP',
+                    reason='fiber cut', issue_date=date(2026, 1, 1) + timedelta(days=i),
+                    last_follow_up=date(2026, 2, 1),
+                ))
+            db.session.commit()
+    return add
+
+
+@pytest.fixture
+def query_counter(app):
+    """count_queries() on the test app's engine:
+
+        with query_counter() as queries:
+            client.get('/daily_problem_report')
+        assert queries.count == ...
+    """
+    with app.app_context():
+        engine = db.engine
+    return lambda: count_queries(engine)
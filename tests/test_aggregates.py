@@ -0,0 +1,76 @@
+from datetime import date
+
+from sqlalchemy import select
+
+import aggregates
+from archive import archive_reports, restore_reports
+from extensions import db
+from models import DailyOutage, ProblemReport, SiteStatus
+
+
+def insert_reports(app, client, add_reports):
+    add_reports(30)
+
+
+def edit_reports(app, client, add_reports):
+    # Move one site's latest report to another site and day, change another's status
+    with app.app_context():
+        moved = db.session.get(ProblemReport, 25)
+        moved.site_id, moved.issue_date = moved.site_id % 10 + 1, date(2025, 12, 1)
+        db.session.get(ProblemReport, 26).status = 'UP'
+        db.session.commit()
+
+
+def delete_reports(app, client, add_reports):
+    with app.app_context():
+        db.session.delete(db.session.get(ProblemReport, 27))
+        db.session.commit()
+
+
+def bulk_status(app, client, add_reports):
+    client.post('/daily_problem_report/bulk', data={'action': 'status', 'status': 'UP', 'ids': [3, 14, 28, 29]})
+
+
+def bulk_clone(app, client, add_reports):
+    client.post('/daily_problem_report/bulk', data={'action': 'clone', 'ids': [1, 2, 30]})
+
+
+def bulk_delete(app, client, add_reports):
+    client.post('/daily_problem_report/bulk', data={'action': 'delete', 'ids': [2, 20, 21, 22, 31]})
+
+
+def archive_and_restore(app, client, add_reports):
+    with app.app_context():
+        assert archive_reports(before=date(2026, 1, 20))
+        restore_reports(since=date(2026, 1, 10))
+
+
+STEPS = [insert_reports, edit_reports, delete_reports, bulk_status, bulk_clone, bulk_delete, archive_and_restore]
+
+
+def maintained_and_rebuilt(app, model):
+    # The rows as kept up to date, and as aggregates.rebuild() computes them from scratch
+    columns = [c for c in model.__table__.columns]
+    with app.app_context():
+        conn = db.session.connection()
+        maintained = set(conn.execute(select(*columns)).all())
+        aggregates.rebuild(conn)
+        rebuilt = set(conn.execute(select(*columns)).all())
+        db.session.rollback()
+    return maintained, rebuilt
+
+
+def run_steps(app, client, add_reports, model):
+    for step in STEPS:
+        step(app, client, add_reports)
+        maintained, rebuilt = maintained_and_rebuilt(app, model)
+        assert rebuilt, step.__name__
+        assert maintained == rebuilt, step.__name__
+
+
+def test_daily_outage_matches_rebuild(app, client, add_reports):
+    run_steps(app, client, add_reports, DailyOutage)
+
+
+def test_site_status_matches_rebuild(app, client, add_reports):
+    run_steps(app, client, add_reports, SiteStatus)
@@ -0,0 +1,17 @@
+from extensions import db
+from models import Site
+
+
+def test_etag_conditional_get(app, client):
+    response = client.get('/api/v1/sites')
+    assert response.status_code == 200
+    assert response.headers.get('Last-Modified') is None
+    etag = response.headers['ETag']
+    assert client.get('/api/v1/sites', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        db.session.get(Site, 1).device_name = 'edge'
+        db.session.commit()
+    response = client.get('/api/v1/sites', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
@@ -0,0 +1,55 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from archive import archive_reports
+from extensions import db
+from models import ArchivedReport, ProblemReport, SiteStatus
+
+
+@pytest.fixture
+def reports(app, add_reports):
+    # 30 reports; the newest id is backdated, so it is no site's latest
+    add_reports(30)
+    with app.app_context():
+        db.session.get(ProblemReport, 30).issue_date = date(2025, 12, 1)
+        db.session.commit()
+
+
+def ids(app, model):
+    with app.app_context():
+        return set(db.session.execute(select(model.id)).scalars())
+
+
+def test_archive_keeps_latest_reports_and_max_id(app, reports, add_reports):
+    with app.app_context():
+        latest = set(db.session.execute(select(SiteStatus.report_id)).scalars())
+        assert 30 not in latest
+        assert archive_reports(before=date(2027, 1, 1)) == 30 - len(latest) - 1
+    assert ids(app, ProblemReport) == latest | {30}
+    assert ids(app, ArchivedReport) == set(range(1, 31)) - latest - {30}
+
+    # SQLite hands out max(id) + 1, so keeping max(id) live keeps new ids clear of the archive
+    add_reports(1)
+    assert ids(app, ProblemReport) - latest == {30, 31}
+
+
+def test_pages_merge_live_and_archived(app, client, reports):
+    with app.app_context():
+        expected = [r.id for r in db.session.execute(
+            select(ProblemReport).order_by(ProblemReport.issue_date.desc(), ProblemReport.id.desc())).scalars()]
+        # UP reports go earlier, so archived and live issue dates interleave
+        assert archive_reports(before=date(2026, 1, 10), up_before=date(2026, 1, 25))
+    live, archived = ids(app, ProblemReport), ids(app, ArchivedReport)
+
+    seen, mixed = [], 0
+    url = '/api/v1/reports?per_page=4'
+    while url:
+        answer = client.get(url).get_json()
+        page = [r['id'] for r in answer['data']]
+        mixed += bool(set(page) & live) and bool(set(page) & archived)
+        seen += page
+        url = answer['next']
+    assert seen == expected
+    assert mixed
@@ -0,0 +1,75 @@
+import asyncio
+
+from asgi import AsgiApp
+
+
+async def call(asgi_app, path, cookie=None, query=b'', headers=(), until=None, timeout=5):
+    """The messages the app sends for one GET; stops at the end of the body
+    or, for streams, once until(body so far) is true, then disconnects."""
+    headers = [(b'host', b'localhost'), *headers]
+    if cookie:
+        headers.append((b'cookie', cookie.encode()))
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+             'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': query, 'headers': headers,
+             'server': ('localhost', 80), 'client': ('127.0.0.1', 50000)}
+    done = asyncio.Event()
+    requested = False
+    messages = []
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+        body = b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+        if message['type'] == 'http.response.body' and (not message.get('more_body') or (until and until(body))):
+            done.set()
+
+    task = asyncio.ensure_future(asgi_app(scope, receive, send))
+    await asyncio.wait_for(done.wait(), timeout)
+    await asyncio.wait_for(task, timeout)
+    status = messages[0]['status']
+    body = b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+    return status, dict(messages[0]['headers']), body, len(messages) - 1
+
+
+def session_cookie(client):
+    return 'session=' + client.get_cookie('session').value
+
+
+def test_request_through_asgi(app, client):
+    status, headers, body, _ = asyncio.run(call(AsgiApp(app), '/site_data', session_cookie(client)))
+    assert status == 200
+    assert b'Site 09' in body
+    status, headers, _, _ = asyncio.run(call(AsgiApp(app), '/site_data'))
+    assert status == 302
+
+
+def test_streamed_export_through_asgi(app, client, add_reports):
+    add_reports(30)
+    app.config['EXPORT_BATCH_SIZE'] = 5
+    status, headers, body, _ = asyncio.run(
+        call(AsgiApp(app), '/export_reports', session_cookie(client), query=b'format=csv'))
+    assert status == 200
+    assert headers[b'content-type'].startswith(b'text/csv')
+    assert len(body.decode('utf-8-sig').splitlines()) == 31
+
+
+def test_event_stream_through_asgi(app, client, add_reports):
+    add_reports(2)
+    asgi_app = AsgiApp(app)
+    assert app.config['EVENTS_STREAM']
+    status, headers, body, _ = asyncio.run(call(asgi_app, '/events', session_cookie(client),
+                                                headers=[(b'last-event-id', b'0')],
+                                                until=lambda body: body.count(b'event: report') == 2))
+    assert status == 200
+    assert headers[b'content-type'].startswith(b'text/event-stream')
+    assert body.startswith(b'retry: ')
+    assert b'data: {"action": "created", "id": 1}' in body
+    status, _, _, _ = asyncio.run(call(asgi_app, '/events'))
+    assert status == 302
@@ -0,0 +1,45 @@
+from extensions import db
+from models import Site, IspLink, ProblemReport
+
+
+def last_flash(client):
+    with client.session_transaction() as session:
+        return session.pop('_flashes')[-1][1]
+
+
+def test_report_status_needs_a_status(client, add_reports):
+    add_reports(2)
+    response = client.post('/daily_problem_report/bulk', data={'action': 'status', 'ids': [1, 2]})
+    assert response.status_code == 302
+    assert last_flash(client) == 'Choose a status.'
+
+    client.post('/daily_problem_report/bulk', data={'action': 'status', 'status': 'UP', 'ids': [1, 2]})
+    assert last_flash(client) == '2 reports marked UP'
+
+
+def test_site_update_needs_a_listed_field(client):
+    client.post('/site_data/bulk', data={'action': 'update', 'ids': [1]})
+    assert last_flash(client) == 'Choose a field to set.'
+    client.post('/site_data/bulk', data={'action': 'update', 'field': 'row_version', 'value': '7', 'ids': [1]})
+    assert last_flash(client) == 'This field cannot be set in bulk.'
+    client.post('/site_data/bulk', data={'action': 'update', 'field': 'device_name', 'value': 'edge', 'ids': [1]})
+    assert last_flash(client) == '1 sites updated'
+
+
+def test_delete_reports_sites_kept_for_reports(app, client, add_reports):
+    add_reports(1)  # on site 1
+    client.post('/site_data/bulk', data={'action': 'delete', 'ids': [1, 2, 999]})
+    assert last_flash(client) == '1 sites deleted, 1 kept because they have problem reports'
+    with app.app_context():
+        assert db.session.get(Site, 1) is not None
+        assert db.session.get(Site, 2) is None
+
+
+def test_clone_copies_links(app, client):
+    client.post('/site_data/bulk', data={'action': 'clone', 'ids': [2, 3, 999]})
+    assert last_flash(client) == '2 sites cloned'
+    with app.app_context():
+        clones = db.session.scalars(db.select(Site).where(Site.id > 10).order_by(Site.id)).all()
+        assert [site.sdwan_site_id for site in clones] == ['SD-1', 'SD-2']
+        for clone in clones:
+            assert db.session.scalar(db.select(db.func.count()).where(IspLink.site_id == clone.id)) == 1
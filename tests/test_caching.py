@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import update
+
+import caching
+from caching import VersionedCache, site_choices
+from extensions import db
+from models import DataVersion, Site
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    # Version counters start over with every test database, so a cache left
+    # from an earlier test could match them
+    monkeypatch.setattr(caching, '_site_choices', VersionedCache(('site',), caching._load_site_choices))
+
+
+def names(app):
+    with app.app_context():
+        return [location for _, location in site_choices()[0]]
+
+
+def test_site_choices_dropped_on_site_write(app, client):
+    # Only the after-commit hook can drop it within the interval
+    app.config['CACHE_VERSION_CHECK_SECONDS'] = 60
+    assert names(app)[0] == 'Site 00'
+    with app.app_context():
+        db.session.execute(db.select(Site).filter_by(site_location='Site 00')).scalar_one().site_location = 'Site 99'
+        db.session.commit()
+    assert 'Site 00' not in names(app)
+    assert names(app)[-1] == 'Site 99'
+
+    with app.app_context():
+        site_id = db.session.execute(db.select(Site.id).filter_by(site_location='Site 05')).scalar_one()
+    client.post(f'/site_data/delete/{site_id}')
+    assert 'Site 05' not in names(app)
+    page = client.get('/daily_problem_report').get_data(as_text=True)
+    assert 'Site 99' in page
+    assert '>Site 05<' not in page
+
+
+def test_site_choices_see_writes_from_other_workers(app):
+    app.config['CACHE_VERSION_CHECK_SECONDS'] = 60
+    assert names(app)[0] == 'Site 00'
+    # Another worker's commit: no session hooks run in this process
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(update(Site).where(Site.site_location == 'Site 00').values(site_location='Site 99'))
+        conn.execute(update(DataVersion).where(DataVersion.name == 'site').values(version=DataVersion.version + 1))
+    assert names(app)[0] == 'Site 00'  # not checked again within the interval
+    app.config['CACHE_VERSION_CHECK_SECONDS'] = 0
+    assert names(app)[0] == 'Site 01'
+    assert names(app)[-1] == 'Site 99'
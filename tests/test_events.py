@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from extensions import db
+from events import EventCursor
+from models import ChangeEvent
+
+
+def add_event(event_id):
+    db.session.add(ChangeEvent(id=event_id, created_at=datetime.utcnow(), kind='report',
+                               payload=f'{{"action": "created", "id": {event_id}}}'))
+    db.session.commit()
+
+
+def test_cursor_reads_late_commits_once(app):
+    with app.app_context():
+        cursor = EventCursor(0, window=10)
+        for event_id in (1, 2, 4):
+            add_event(event_id)
+        assert [row[0] for row in cursor.read()] == [1, 2, 4]
+        add_event(3)  # a lower id that committed after 4 was read
+        assert [row[0] for row in cursor.read()] == [3]
+        assert cursor.read() == []
+
+
+def test_pages_poll_unless_streaming_is_on(app, client):
+    page = client.get('/daily_problem_report').data
+    assert b'data-events-poll-url="/events/recent"' in page
+    assert b'data-events-url' not in page
+    assert client.get('/events').status_code == 404
+
+    app.config['EVENTS_STREAM'] = True
+    assert b'data-events-url="/events"' in client.get('/daily_problem_report').data
+
+
+def test_recent_events(app, client, add_reports):
+    start = client.get('/events/recent').get_json()
+    assert start['events'] == []
+    add_reports(1)
+    answer = client.get('/events/recent', query_string={'after': start['last_id']}).get_json()
+    assert {(e['kind'], e['data'].get('action')) for e in answer['events']} == {('report', 'created'), ('status', None)}
+    assert answer['last_id'] == max(e['id'] for e in answer['events'])
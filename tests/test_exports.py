@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from openpyxl import load_workbook
+
+from exports import REPORT_COLUMNS, SITE_COLUMNS
+
+REPORT_HEADERS = [name for name, _ in REPORT_COLUMNS]
+
+
+def test_reports_xlsx(app, client, add_reports):
+    add_reports(25)
+    app.config['EXPORT_BATCH_SIZE'] = 10
+    response = client.get('/export_reports')
+    assert response.mimetype == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    wb = load_workbook(io.BytesIO(response.get_data()), read_only=True)
+    assert wb.sheetnames == ['Daily Reports']
+    rows = list(wb['Daily Reports'].values)
+    assert list(rows[0]) == REPORT_HEADERS
+    assert len(rows) == 26
+    first = dict(zip(REPORT_HEADERS, rows[1]))
+    assert first['Site Location'] == 'Site 00'
+    assert first['Ticket ID'] == 'T0'
+    assert first['Issue Date'] == datetime(2026, 1, 1)
+    assert first['Last Follow Up'] == datetime(2026, 2, 1)
+
+
+def test_sites_xlsx_keeps_numbers(client):
+    wb = load_workbook(io.BytesIO(client.get('/export_sites').get_data()))
+    rows = list(wb['Sites'].values)
+    assert list(rows[0]) == [name for name, _ in SITE_COLUMNS]
+    assert len(rows) == 11
+    site = dict(zip(rows[0], rows[1]))
+    assert site['EL ISP Info'] == 'EL fiber'
+    assert site['EL Capacity'] == 100
+    assert site['Horizon Capacity'] is None
+
+
+def test_reports_csv(client, add_reports):
+    add_reports(25)
+    text = client.get('/export_reports?format=csv').get_data().decode('utf-8')
+    rows = list(csv.reader(io.StringIO(text)))
+    assert rows[0] == REPORT_HEADERS
+    assert len(rows) == 26
+    assert rows[1][REPORT_HEADERS.index('Issue Date')] == '2026-01-01'
+
+
+def test_reports_ndjson(client, add_reports):
+    add_reports(25)
+    lines = client.get('/export_reports?format=ndjson').get_data().decode('utf-8').splitlines()
+    assert len(lines) == 25
+    record = json.loads(lines[0])
+    assert list(record) == REPORT_HEADERS
+    assert record['Ticket ID'] == 'T0'
+    assert record['Issue Date'] == '2026-01-01'
@@ -0,0 +1,59 @@
+import pytest
+
+import fragments
+from extensions import db
+from models import ProblemReport, User
+
+
+@pytest.fixture
+def cached(app, monkeypatch):
+    # The cache is per process; a fresh one keeps other tests' entries out
+    app.config['FRAGMENT_CACHE_SIZE'] = 1000
+    monkeypatch.setattr(fragments, '_cache', fragments.FragmentCache())
+    return fragments._cache
+
+
+@pytest.fixture
+def viewer(app):
+    with app.app_context():
+        user = User(username='viewer', group='Network Team')
+        user.set_password('viewerpass')
+        db.session.add(user)
+        db.session.commit()
+    client = app.test_client()
+    assert client.post('/login', data={'username': 'viewer', 'password': 'viewerpass'}).status_code == 302
+    return client
+
+
+EDIT_LINK = b'/daily_problem_report/edit/1'
+
+
+def test_each_group_gets_its_own_markup(cached, client, viewer, add_reports):
+    add_reports(3)
+    for _ in range(2):
+        assert EDIT_LINK in client.get('/daily_problem_report').data
+        page = viewer.get('/daily_problem_report').data
+        assert b'data-report-row="1"' in page
+        assert EDIT_LINK not in page
+        assert b'name="ids"' not in page
+    stats = fragments.stats()
+    assert stats['page_hits'] == 2
+    assert stats['entries'] > 0
+
+    for _ in range(2):
+        assert EDIT_LINK in client.get('/daily_problem_report/rows?ids=1').data
+        assert EDIT_LINK not in viewer.get('/daily_problem_report/rows?ids=1').data
+    assert fragments.stats()['row_hits'] >= 2
+
+
+def test_report_edit_replaces_cached_row(app, cached, client, add_reports):
+    add_reports(3)
+    assert b'T1<' in client.get('/daily_problem_report').data
+    assert b'T1<' in client.get('/daily_problem_report/rows?ids=2').data
+    with app.app_context():
+        db.session.get(ProblemReport, 2).ticket_id = 'EDITED'
+        db.session.commit()
+    for path in ('/daily_problem_report', '/daily_problem_report/rows?ids=2'):
+        html = client.get(path).data
+        assert b'EDITED' in html
+        assert b'T1<' not in html
@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import update
+
+import identity
+from extensions import db
+from identity import IdentityCache
+from models import DataVersion, User
+
+
+@pytest.fixture(autouse=True)
+def cache_mode(app, monkeypatch):
+    # User ids and version counters start over with every test database
+    monkeypatch.setattr(identity, '_cache', IdentityCache())
+    app.config.update(IDENTITY_MODE='cache', USER_CACHE_TTL=300, USER_VERSION_CHECK_SECONDS=60)
+
+
+@pytest.fixture
+def viewer(app):
+    with app.app_context():
+        user = User(username='viewer', group='Network Team')
+        user.set_password('viewerpass')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    assert client.post('/login', data={'username': 'viewer', 'password': 'viewerpass'}).status_code == 302
+    return client, user_id
+
+
+def is_admin(client):
+    return client.get('/admin').status_code == 200
+
+
+def test_cached_identity_follows_edits(client, viewer):
+    viewer, user_id = viewer
+    assert not is_admin(viewer)
+    client.post(f'/admin/edit/{user_id}', data={'username': 'viewer', 'group': 'Admin', 'password': ''})
+    assert is_admin(viewer)
+    client.post(f'/admin/delete/{user_id}')
+    response = viewer.get('/site_data')
+    assert response.status_code == 302
+    assert '/login' in response.location
+
+
+def test_cached_identity_sees_other_workers(app, viewer):
+    viewer, user_id = viewer
+    assert not is_admin(viewer)
+    # Another worker's commit: no session hooks run in this process
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(update(User).where(User.id == user_id).values(group='Admin'))
+        conn.execute(update(DataVersion).where(DataVersion.name == 'user').values(version=DataVersion.version + 1))
+    assert not is_admin(viewer)  # the counter is not read again within the interval
+    app.config['USER_VERSION_CHECK_SECONDS'] = 0
+    assert is_admin(viewer)
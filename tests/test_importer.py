@@ -0,0 +1,54 @@
+import io
+
+import pytest
+from sqlalchemy import text
+
+from extensions import db
+from importer import SiteImportError, import_sites
+from models import Site, IspLink
+
+HEADER = 'Site Name,Device Name,SDWAN Site ID,LAN IP,EL ISP Info,EL Capacity\n'
+
+
+def csv_file(*lines):
+    return io.BytesIO((HEADER + ''.join(line + '\n' for line in lines)).encode('utf-8'))
+
+
+def test_repeated_update_rows_collapse(app):
+    with app.app_context():
+        result = import_sites(csv_file('Moved,dev1,SD-1,10.1.0.1,EL old,50',
+                                       'Moved again,dev1,SD-1,10.1.0.1,EL new,200'), 'sites.csv', upsert=True)
+        assert (result.updated, result.errors) == (1, [])
+        site = db.session.scalars(db.select(Site).where(Site.sdwan_site_id == 'SD-1')).one()
+        assert site.site_location == 'Moved again'
+        links = db.session.scalars(db.select(IspLink).where(IspLink.site_id == site.id)).all()
+        assert [(link.details, link.capacity_mbps) for link in links] == [('EL new', 200)]
+
+
+def test_rejected_row_fails_alone(app):
+    with app.app_context():
+        db.session.execute(text("CREATE TRIGGER reject_site BEFORE INSERT ON site WHEN NEW.device_name = 'bad' "
+                                "BEGIN SELECT RAISE(ABORT, 'rejected'); END"))
+        db.session.commit()
+        result = import_sites(csv_file('New 1,dev-a,SD-100,10.2.0.1,,', 'New 2,bad,SD-101,10.2.0.2,,',
+                                       'New 3,dev-c,SD-102,10.2.0.3,,'), 'sites.csv')
+        assert result.inserted == 2
+        assert [number for number, _ in result.errors] == [3]
+        assert db.session.scalar(db.select(db.func.count()).where(Site.sdwan_site_id.in_(['SD-100', 'SD-102']))) == 2
+
+
+@pytest.mark.parametrize('filename, data', [
+    ('sites.csv', HEADER.encode('utf-8') + b'Caf\xe9,dev,SD-200,10.3.0.1,,\n'),
+    ('sites.xlsx', b'not a workbook'),
+    ('sites.xlsx', b'PK\x05\x06' + b'\0' * 18),  # an empty zip file
+])
+def test_unreadable_files(app, filename, data):
+    with app.app_context(), pytest.raises(SiteImportError):
+        import_sites(io.BytesIO(data), filename)
+
+
+def test_unreadable_upload_is_flashed(client):
+    response = client.post('/site_data/import', data={'file': (io.BytesIO(b'not a workbook'), 'sites.xlsx')},
+                           follow_redirects=True)
+    assert response.status_code == 200
+    assert b'not a readable .xlsx workbook' in response.data
@@ -0,0 +1,14 @@
+def test_metrics_need_a_login_without_a_token(app, client):
+    anonymous = app.test_client()
+    assert anonymous.get('/metrics').status_code == 302
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert b'nbi_requests_total' in response.data
+
+
+def test_metrics_token(app, client):
+    app.config['METRICS_TOKEN'] = 'secret'
+    anonymous = app.test_client()
+    assert anonymous.get('/metrics').status_code == 401
+    assert client.get('/metrics').status_code == 401
+    assert anonymous.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
@@ -0,0 +1,41 @@
+import os
+
+import jobs
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, args))
+
+
+def test_export_started_twice_runs_once(app, tmp_path, monkeypatch):
+    app.config['EXPORT_CACHE_DIR'] = str(tmp_path)
+    executor = RecordingExecutor()
+    monkeypatch.setattr(jobs, '_get_executor', lambda: executor)
+    with app.test_request_context():
+        job_id = jobs.start_export('sites', 'csv')
+        assert jobs.start_export('sites', 'csv') == job_id
+        assert len(executor.calls) == 1
+        assert jobs.job_status(job_id)['state'] == 'queued'
+
+        fn, args = executor.calls[0]
+        fn(*args)
+        status = jobs.job_status(job_id)
+        assert (status['state'], status['rows']) == ('done', 10)
+    assert sorted(os.listdir(tmp_path)) == [job_id, job_id + '.json']
+    with open(tmp_path / job_id, encoding='utf-8-sig') as f:
+        assert len(f.read().splitlines()) == 11  # header and 10 sites
+
+
+def test_stale_queued_export_is_started_again(app, tmp_path, monkeypatch):
+    app.config['EXPORT_CACHE_DIR'] = str(tmp_path)
+    app.config['EXPORT_JOB_STALE_SECONDS'] = 0
+    executor = RecordingExecutor()
+    monkeypatch.setattr(jobs, '_get_executor', lambda: executor)
+    with app.test_request_context():
+        jobs.start_export('sites', 'csv')
+        jobs.start_export('sites', 'csv')
+    assert len(executor.calls) == 2
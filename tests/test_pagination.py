@@ -0,0 +1,48 @@
+from datetime import date
+
+import pytest
+
+from models import ProblemReport
+from pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip(app):
+    keys = [ProblemReport.issue_date, ProblemReport.id]
+    with app.test_request_context():
+        assert decode_cursor(encode_cursor([date(2026, 1, 2), 7]), keys) == [date(2026, 1, 2), 7]
+
+
+def test_pages_cover_every_row_once(client):
+    ids, url, pages = [], '/api/v1/sites?per_page=4', 0
+    while url:
+        answer = client.get(url).get_json()
+        ids += [site['id'] for site in answer['data']]
+        url, pages = answer['next'], pages + 1
+    assert pages == 3
+    assert sorted(ids) == list(range(1, 11))
+
+
+def test_exact_last_page_has_no_next(client):
+    answer = client.get('/api/v1/sites?per_page=10').get_json()
+    assert len(answer['data']) == 10
+    assert answer['next'] is None
+
+
+@pytest.mark.parametrize('values', [
+    ['Site 01', [2]],
+    ['Site 01', {'id': 2}],
+    [['Site 01'], 2],
+    ['Site 01', 'two'],
+    ['Site 01', True],
+    ['Site 01'],
+])
+@pytest.mark.parametrize('path', ['/api/v1/sites', '/site_data'])
+def test_tampered_cursor_is_a_bad_request(client, path, values):
+    assert client.get(path, query_string={'cursor': encode_cursor(values)}).status_code == 400
+
+
+@pytest.mark.parametrize('path', ['/api/v1/reports', '/daily_problem_report'])
+def test_tampered_report_cursor_is_a_bad_request(client, add_reports, path):
+    add_reports(3)
+    for cursor in (encode_cursor(['2026-01-02', [1]]), encode_cursor([5, 1]), '%%%'):
+        assert client.get(path, query_string={'cursor': cursor}).status_code == 400
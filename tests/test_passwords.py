@@ -0,0 +1,49 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+import passwords
+from extensions import db
+from models import User
+
+
+def stored_hash(app, username):
+    with app.app_context():
+        return db.session.execute(db.select(User.password_hash).filter_by(username=username)).scalar_one()
+
+
+def login(client, username, password):
+    return client.post('/login', data={'username': username, 'password': password})
+
+
+def test_saturated_pool_answers_503(app, monkeypatch):
+    app.config['PASSWORD_VERIFY_TIMEOUT'] = 0.1
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(passwords, '_executor', pool)
+    release = threading.Event()
+    pool.submit(release.wait)  # another login holding the only slot
+    try:
+        response = login(app.test_client(), 'admin', 'adminpass')
+        assert response.status_code == 503
+        assert b'The server is busy signing other users in' in response.data
+    finally:
+        release.set()
+        pool.shutdown()
+    monkeypatch.setattr(passwords, '_executor', None)  # a fresh pool on the next login
+    assert login(app.test_client(), 'admin', 'adminpass').status_code == 302
+
+
+def test_old_scheme_rehashed_on_login(app):
+    with app.app_context():
+        user = User(username='legacy', group='NOC Team',
+                    password_hash=generate_password_hash('legacypass', method='pbkdf2:sha256:500'))
+        db.session.add(user)
+        db.session.commit()
+
+    assert login(app.test_client(), 'legacy', 'wrongpass').status_code == 200
+    assert stored_hash(app, 'legacy').startswith('pbkdf2:sha256:500$')
+
+    assert login(app.test_client(), 'legacy', 'legacypass').status_code == 302
+    assert stored_hash(app, 'legacy').startswith(app.config['PASSWORD_HASH_METHOD'] + '$')
+    assert login(app.test_client(), 'legacy', 'legacypass').status_code == 302
@@ -0,0 +1,17 @@
+import pytest
+
+N = 20
+
+
+@pytest.mark.parametrize('url', ['/daily_problem_report', '/export_reports', '/export_reports?format=csv'])
+def test_statement_count_does_not_grow_with_reports(client, add_reports, query_counter, url):
+    counts = []
+    for _ in range(2):
+        add_reports(N)  # N reports, then 2N
+        client.get(url).get_data()  # settles the per-process caches after the write
+        with query_counter() as queries:
+            response = client.get(url)
+            response.get_data()  # exports stream their rows
+        assert response.status_code == 200
+        counts.append(queries.count)
+    assert counts[0] == counts[1]
@@ -0,0 +1,51 @@
+from datetime import date
+
+import pytest
+
+import archive
+from filters import _prefix_upper
+
+
+@pytest.mark.parametrize('view', ['edit', 'clone'])
+def test_edit_and_clone_pages_render(client, add_reports, view):
+    add_reports(1)
+    response = client.get(f'/daily_problem_report/{view}/1')
+    assert response.status_code == 200
+    assert b'ticket_id' in response.data
+
+
+@pytest.mark.parametrize('view', ['edit', 'clone'])
+def test_invalid_edit_and_clone_posts_render_the_form(client, add_reports, view):
+    add_reports(1)
+    response = client.post(f'/daily_problem_report/{view}/1', data={'ticket_id': ''})
+    assert response.status_code == 200
+
+
+def test_report_filters(client, add_reports):
+    add_reports(12)
+    response = client.get('/daily_problem_report?status=DOWN&ticket=T1')
+    assert response.status_code == 200
+    assert response.data.count(b'data-report-row=') == 3  # T1, T10 and T11
+
+
+def test_ticket_prefix_at_the_top_of_unicode(client, add_reports):
+    add_reports(3)
+    assert _prefix_upper('T1' + chr(0x10FFFF)) == 'T2'
+    assert _prefix_upper(chr(0x10FFFF)) is None
+    assert _prefix_upper('T' + chr(0xD7FF)) == 'T' + chr(0xE000)
+    for ticket in ('T1' + chr(0x10FFFF), chr(0x10FFFF)):
+        assert client.get('/daily_problem_report', query_string={'ticket': ticket}).status_code == 200
+        assert client.get('/api/v1/reports', query_string={'ticket': ticket}).status_code == 200
+
+
+def test_reason_filter_says_archive_is_skipped(app, client, add_reports):
+    add_reports(25)
+    assert b'are not searched' not in client.get('/daily_problem_report?reason=fiber').data
+    with app.app_context():
+        assert archive.archive_reports(date(2026, 1, 6)) == 5
+
+    assert b'are not searched' in client.get('/daily_problem_report?reason=fiber').data
+    assert b'are not searched' not in client.get('/daily_problem_report?status=DOWN').data
+    answer = client.get('/api/v1/reports?reason=fiber').get_json()
+    assert answer['archive_skipped'] == '2026-01-05'
+    assert 'archive_skipped' not in client.get('/api/v1/reports?reason=fiber&since=2026-01-10').get_json()
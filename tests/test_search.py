@@ -0,0 +1,42 @@
+from sqlalchemy import text
+
+from extensions import db
+from models import Site
+from search import search_index_ready
+
+
+def site_fts_exists():
+    return db.session.execute(text("SELECT count(*) FROM sqlite_master WHERE name = 'site_fts'")).scalar() == 1
+
+
+def test_index_follows_edits(app, client):
+    with app.app_context():
+        assert search_index_ready()
+        db.session.get(Site, 5).site_location = 'Alexandria'
+        db.session.commit()
+    response = client.get('/site_data?search=alex')
+    assert b'Alexandria' in response.data
+    assert b'Site 04' not in response.data
+
+
+def test_search_without_index_is_read_only(app, client):
+    with app.app_context():
+        db.session.execute(text('DROP TABLE site_fts'))
+        db.session.commit()
+    response = client.get('/site_data?search=SD-3')
+    assert response.status_code == 200
+    assert b'Site 03' in response.data
+    with app.app_context():
+        assert not site_fts_exists()
+
+
+def test_postgres_query_binds_every_token(app):
+    from sqlalchemy import select
+    from sqlalchemy.dialects import postgresql
+    from search import _pg_search
+
+    with app.app_context():
+        query, _ = _pg_search(select(Site.id), ['cairo', '10.0'])
+        params = query.compile(dialect=postgresql.dialect()).params
+    tsqueries = {name: value for name, value in params.items() if name.startswith('tsq_')}
+    assert tsqueries == {'tsq_0': "'cairo':*", 'tsq_1': "'10.0':*", 'tsq_any': "'cairo':* | '10.0':*"}
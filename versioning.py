@@ -0,0 +1,107 @@
+from datetime import datetime
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Site, IspLink, ProblemReport, ArchivedReport, User, DataVersion
+
+# Model -> version counter that changes whenever one of its rows does
+TRACKED = {
+    Site: 'site',
+    IspLink: 'site',  # links are part of a site's row
+    ProblemReport: 'problem_report',
+    ArchivedReport: 'problem_report_archive',
+    User: 'user',  # logins and roles, see identity.py
+}
+
+# Called after commit with the set of counters that commit bumped
+_listeners = []
+
+_table = DataVersion.__table__
+
+
+def on_change(func):
+    _listeners.append(func)
+    return func
+
+
+def bump_version(*names, session=None):
+    """Increment the named counters inside the current transaction.
+
+    ORM writes are picked up automatically by the flush hook below;
+    set-based UPDATE/DELETE/INSERT statements bypass the flush and have to
+    call this themselves.
+    """
+    session = session or db.session
+    conn = session.connection()
+    now = datetime.utcnow()
+    for name in sorted(set(names)):
+        result = conn.execute(
+            update(_table).where(_table.c.name == name)
+            .values(version=_table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(_table).values(name=name, version=1, updated_at=now))
+    session.info.setdefault('changed_versions', set()).update(names)
+
+
+def current_versions(*names):
+    rows = db.session.execute(select(_table.c.name, _table.c.version).where(_table.c.name.in_(names)))
+    versions = dict(rows.all())
+    return tuple(versions.get(name, 0) for name in names)
+
+
+def version_stamp(*names):
+    return '-'.join(str(v) for v in current_versions(*names))
+
+
+def last_modified(*names):
+    # Most recent write to any of the named tables, or None if never written
+    return db.session.execute(
+        select(db.func.max(_table.c.updated_at)).where(_table.c.name.in_(names))
+    ).scalar()
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_row_versions(session, flush_context, instances):
+    # Per-row counterpart of the counters above, read by fragments.py. Adding or
+    # removing an ISP link changes the site's isp_links collection; editing one
+    # only dirties the link, so its site is bumped from there.
+    rows = set()
+    for obj in session.dirty:
+        if isinstance(obj, (Site, ProblemReport)) and session.is_modified(obj):
+            rows.add(obj)
+        elif isinstance(obj, IspLink) and obj.site is not None and session.is_modified(obj):
+            rows.add(obj.site)
+    for obj in rows:
+        if obj not in session.new and obj not in session.deleted:
+            obj.row_version = (obj.row_version or 0) + 1
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_flushed(session, flush_context):
+    names = set()
+    for obj in session.new | session.deleted:
+        name = TRACKED.get(type(obj))
+        if name:
+            names.add(name)
+    for obj in session.dirty:
+        name = TRACKED.get(type(obj))
+        if name and session.is_modified(obj, include_collections=False):
+            names.add(name)
+    if names:
+        bump_version(*names, session=session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify(session):
+    names = session.info.pop('changed_versions', None)
+    if names:
+        for listener in _listeners:
+            listener(names)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop('changed_versions', None)